@@ -0,0 +1,163 @@
+"""Benchmarks of the simulation hot paths.
+
+The classes follow the asv conventions: ``time_*`` methods are timed,
+``peakmem_*`` methods report the peak resident memory and ``track_*``
+methods return throughputs. ``run_benchmarks.py`` runs the same classes
+without asv.
+"""
+
+import copy
+import io
+import time
+
+import numpy as np
+
+from benchmarks.workloads import (
+    FRAGMENTORS,
+    NOISE_INJECTORS,
+    SEED,
+    count_peaks,
+    make_library,
+    quiet,
+    simulate,
+)
+from smiter.synthetic_mzml import write_scans
+
+# gradient length in seconds of the workloads without a gradient_length param
+GRADIENT_LENGTH = 120.0
+
+
+class GenerateScans(object):
+    """Scan generation by generate_scans."""
+
+    params = (
+        [100, 1000],
+        [5, 20],
+        [0.03, 0.3],
+        [GRADIENT_LENGTH, 600.0],
+        list(FRAGMENTORS),
+    )
+    param_names = [
+        "molecules",
+        "coelution",
+        "ms_rt_diff",
+        "gradient_length",
+        "fragmentor",
+    ]
+    timeout = 600
+
+    def setup(self, n_molecules, coelution, ms_rt_diff, gradient_length, fragmentor):
+        quiet()
+        make_library(n_molecules, coelution, gradient_length)
+
+    def time_generate_scans(
+        self, n_molecules, coelution, ms_rt_diff, gradient_length, fragmentor
+    ):
+        simulate(n_molecules, coelution, gradient_length, ms_rt_diff, fragmentor)
+
+    def peakmem_generate_scans(
+        self, n_molecules, coelution, ms_rt_diff, gradient_length, fragmentor
+    ):
+        simulate(n_molecules, coelution, gradient_length, ms_rt_diff, fragmentor)
+
+    def _throughput(
+        self, n_molecules, coelution, ms_rt_diff, gradient_length, fragmentor
+    ):
+        start = time.perf_counter()
+        scans = simulate(
+            n_molecules, coelution, gradient_length, ms_rt_diff, fragmentor
+        )
+        seconds = time.perf_counter() - start
+        n_spectra, n_peaks = count_peaks(scans)
+        return n_spectra / seconds, n_peaks / seconds
+
+    def track_scans_per_second(self, *params):
+        return self._throughput(*params)[0]
+
+    track_scans_per_second.unit = "scans/s"
+
+    def track_peaks_per_second(self, *params):
+        return self._throughput(*params)[1]
+
+    track_peaks_per_second.unit = "peaks/s"
+
+
+class WriteScans(object):
+    """mzML writing of generated scans."""
+
+    params = ([100, 1000], ["native", "psims"])
+    param_names = ["molecules", "writer"]
+    timeout = 600
+
+    def setup(self, n_molecules, writer):
+        quiet()
+        self.scans = simulate(n_molecules, 5, GRADIENT_LENGTH, 0.03)
+        self.n_spectra, self.n_peaks = count_peaks(self.scans)
+
+    def time_write_scans(self, n_molecules, writer):
+        write_scans(io.BytesIO(), self.scans, writer=writer)
+
+    def peakmem_write_scans(self, n_molecules, writer):
+        write_scans(io.BytesIO(), self.scans, writer=writer)
+
+    def track_peaks_per_second(self, n_molecules, writer):
+        start = time.perf_counter()
+        write_scans(io.BytesIO(), self.scans, writer=writer)
+        return self.n_peaks / (time.perf_counter() - start)
+
+    track_peaks_per_second.unit = "peaks/s"
+
+
+class InjectNoise(object):
+    """Noise injection into MS1 and MS2 scans."""
+
+    params = list(NOISE_INJECTORS)
+    param_names = ["noise_injector"]
+
+    def setup(self, noise_injector):
+        quiet()
+        scans = simulate(100, 5, GRADIENT_LENGTH, 0.03)
+        self.spectra = [ms1 for ms1, _ in scans] + [
+            ms2 for _, ms2_scans in scans for ms2 in ms2_scans
+        ]
+        self.noise_injector = NOISE_INJECTORS[noise_injector]()
+        self.n_peaks = sum(len(spectrum.mz) for spectrum in self.spectra)
+
+    def _inject(self):
+        np.random.seed(SEED)
+        for spectrum in copy.deepcopy(self.spectra):
+            self.noise_injector.inject_noise(spectrum)
+
+    def time_inject_noise(self, noise_injector):
+        self._inject()
+
+    def track_peaks_per_second(self, noise_injector):
+        start = time.perf_counter()
+        self._inject()
+        return self.n_peaks / (time.perf_counter() - start)
+
+    track_peaks_per_second.unit = "peaks/s"
+
+
+class Fragment(object):
+    """Fragment spectra of all molecules of a workload."""
+
+    params = list(FRAGMENTORS)
+    param_names = ["fragmentor"]
+
+    def setup(self, fragmentor):
+        quiet()
+        peak_properties, _ = make_library(1000, 5, GRADIENT_LENGTH)
+        self.molecules = list(peak_properties)
+        self.fragmentor = FRAGMENTORS[fragmentor]()
+
+    def time_fragment(self, fragmentor):
+        for molecule in self.molecules:
+            self.fragmentor.fragment([molecule])
+
+    def track_spectra_per_second(self, fragmentor):
+        start = time.perf_counter()
+        self.time_fragment(fragmentor)
+        return len(self.molecules) / (time.perf_counter() - start)
+
+    track_spectra_per_second.unit = "spectra/s"
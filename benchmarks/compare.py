@@ -0,0 +1,99 @@
+"""Compare benchmark results to a baseline.
+
+Timings and peak memory regress if they grow, throughputs if they shrink,
+by more than the threshold. The exit code is 1 if any case regressed::
+
+    python -m benchmarks.compare baseline.json current.json --threshold 0.1
+"""
+
+import argparse
+import json
+import sys
+
+from benchmarks.run_benchmarks import RESULTS_FORMAT
+
+DEFAULT_THRESHOLD = 0.1
+
+
+def load_results(file: str) -> dict:
+    """Load results written by run_benchmarks.
+
+    Args:
+        file (str): results file
+
+    Raises:
+        Exception: if the file has another format
+
+    Returns:
+        dict: results with value and unit by case name
+    """
+    with open(file) as fin:
+        results = json.load(fin)
+    if results.get("format") != RESULTS_FORMAT:
+        raise Exception(f"{file} are no smiter benchmark results")
+    return results["results"]
+
+
+def compare(
+    baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD
+) -> list:
+    """Compare the cases present in both results.
+
+    Args:
+        baseline (dict): baseline results
+        current (dict): current results
+        threshold (float, optional): tolerated relative change
+
+    Returns:
+        list: case name, baseline value, current value, ratio and status
+            (regressed, improved or unchanged) of every case
+    """
+    rows = []
+    for name in sorted(set(baseline) & set(current)):
+        before = baseline[name]["value"]
+        after = current[name]["value"]
+        ratio = after / before if before != 0 else float("inf")
+        # throughputs are better if higher, timings and memory if lower
+        higher_is_better = name.split(".", 1)[1].startswith("track_")
+        change = ratio if higher_is_better else 1 / ratio if ratio != 0 else 0
+        if change < 1 - threshold:
+            status = "regressed"
+        elif change > 1 + threshold:
+            status = "improved"
+        else:
+            status = "unchanged"
+        rows.append((name, before, after, ratio, status))
+    return rows
+
+
+def main(args: list = None) -> int:
+    """Print the comparison of two result files.
+
+    Args:
+        args (list, optional): command line arguments
+
+    Returns:
+        int: 1 if any case regressed, 0 otherwise
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(args)
+    baseline = load_results(args.baseline)
+    current = load_results(args.current)
+    rows = compare(baseline, current, threshold=args.threshold)
+    width = max([len(row[0]) for row in rows] + [9])
+    print(f"{'benchmark':<{width}}  {'baseline':>12}  {'current':>12}  ratio")
+    for name, before, after, ratio, status in rows:
+        flag = {"regressed": "  REGRESSED", "improved": "  improved"}.get(status, "")
+        print(f"{name:<{width}}  {before:>12.4g}  {after:>12.4g}  {ratio:.3f}{flag}")
+    for name in sorted(set(baseline) ^ set(current)):
+        print(
+            f"{name:<{width}}  only in {'baseline' if name in baseline else 'current'}"
+        )
+    return int(any(row[4] == "regressed" for row in rows))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Run the benchmarks without asv.
+
+Every parameter combination runs in a forked process, so memoized workloads
+and the peak memory of one case do not leak into the next. Results are
+written as JSON, compare them to a baseline with ``compare.py``::
+
+    python -m benchmarks.run_benchmarks -o baseline.json
+    # change code
+    python -m benchmarks.run_benchmarks -o current.json
+    python -m benchmarks.compare baseline.json current.json
+"""
+
+import argparse
+import inspect
+import itertools
+import json
+import multiprocessing
+import platform
+import re
+import resource
+import subprocess
+import time
+
+from benchmarks import bench_simulation
+
+RESULTS_FORMAT = "smiter benchmarks"
+
+# timed repetitions, the fastest is reported
+DEFAULT_REPEAT = 3
+
+
+def benchmark_classes() -> list:
+    """Get all benchmark classes.
+
+    Returns:
+        list: classes of :py:mod:`benchmarks.bench_simulation`
+    """
+    return [
+        cls
+        for _, cls in inspect.getmembers(bench_simulation, inspect.isclass)
+        if cls.__module__ == bench_simulation.__name__
+    ]
+
+
+def parameter_grid(cls, quick: bool = False) -> list:
+    """Get all parameter combinations of a benchmark class.
+
+    Args:
+        cls (type): benchmark class
+        quick (bool, optional): only use the first value of every parameter
+
+    Returns:
+        list: parameter tuples
+    """
+    params = getattr(cls, "params", [])
+    if len(params) == 0:
+        return [()]
+    if not isinstance(params, tuple):
+        params = (params,)
+    if quick:
+        params = [values[:1] for values in params]
+    return list(itertools.product(*params))
+
+
+def case_name(cls, method: str, params: tuple) -> str:
+    """Name a benchmark case like asv, e.g. Fragment.time_fragment(constant).
+
+    Args:
+        cls (type): benchmark class
+        method (str): benchmark method
+        params (tuple): parameter values
+
+    Returns:
+        str: case name
+    """
+    return f"{cls.__name__}.{method}({', '.join(str(p) for p in params)})"
+
+
+def _methods(cls) -> list:
+    return [
+        name
+        for name in dir(cls)
+        if name.startswith(("time_", "peakmem_", "track_"))
+        and callable(getattr(cls, name))
+    ]
+
+
+def _run_case(cls, params: tuple, repeat: int, connection):
+    results = {}
+    try:
+        benchmark = cls()
+        if hasattr(benchmark, "setup"):
+            benchmark.setup(*params)
+        for method in _methods(cls):
+            function = getattr(benchmark, method)
+            if method.startswith("time_"):
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    function(*params)
+                    timings.append(time.perf_counter() - start)
+                value, unit = min(timings), "seconds"
+            elif method.startswith("peakmem_"):
+                function(*params)
+                # kilobytes on Linux
+                value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+                unit = "bytes"
+            else:
+                value = max(function(*params) for _ in range(repeat))
+                unit = getattr(function, "unit", "")
+            results[case_name(cls, method, params)] = {"value": value, "unit": unit}
+    except NotImplementedError:
+        # asv convention for skipped parameter combinations
+        pass
+    connection.send(results)
+    connection.close()
+
+
+def run(pattern: str = None, quick: bool = False, repeat: int = DEFAULT_REPEAT) -> dict:
+    """Run all benchmark cases, each in a forked process.
+
+    Args:
+        pattern (str, optional): regex matched against the case names of the
+            class, e.g. GenerateScans
+        quick (bool, optional): only use the first value of every parameter
+        repeat (int, optional): repetitions of timing and throughput cases
+
+    Raises:
+        Exception: if a case process fails
+
+    Returns:
+        dict: results with value and unit by case name
+    """
+    context = multiprocessing.get_context("fork")
+    results = {}
+    for cls in benchmark_classes():
+        for params in parameter_grid(cls, quick=quick):
+            name = case_name(cls, "*", params)
+            if pattern is not None and re.search(pattern, name) is None:
+                continue
+            print(f"Run {name}", flush=True)
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_case, args=(cls, params, repeat, sender)
+            )
+            process.start()
+            sender.close()
+            try:
+                case_results = receiver.recv()
+            except EOFError:
+                case_results = None
+            process.join()
+            if case_results is None or process.exitcode != 0:
+                raise Exception(f"Benchmark {name} failed")
+            results.update(case_results)
+    return results
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main(args: list = None):
+    """Run the benchmarks and write the results.
+
+    Args:
+        args (list, optional): command line arguments
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", default="benchmarks.json")
+    parser.add_argument("-b", "--bench", default=None, help="Regex of case names.")
+    parser.add_argument("--quick", action="store_true", help="First params only.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args(args)
+    results = run(pattern=args.bench, quick=args.quick, repeat=args.repeat)
+    with open(args.output, "w") as fout:
+        json.dump(
+            {
+                "format": RESULTS_FORMAT,
+                "commit": _commit(),
+                "machine": platform.node(),
+                "python": platform.python_version(),
+                "results": results,
+            },
+            fout,
+            indent=2,
+        )
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Synthetic workloads of the benchmarks.
+
+Workloads are random tryptic peptides with elution windows spread uniformly
+over the gradient. The peak width is chosen such that on average
+``coelution`` molecules elute at the same time. Everything is derived from a
+fixed seed, so runs on different commits simulate the same molecules.
+"""
+
+import functools
+
+import numpy as np
+from loguru import logger
+
+from smiter.fasta import AMINO_ACIDS, peptide_formula
+from smiter.fragmentation_functions import (
+    AbstractFragmentor,
+    PeptideFragmentorPyteomics,
+)
+from smiter.lib import check_mzml_params
+from smiter.noise_functions import (
+    GaussNoiseInjector,
+    JamssNoiseInjector,
+    UniformNoiseInjector,
+)
+from smiter.synthetic_mzml import build_library, generate_scans
+
+SEED = 1312
+
+# peaks of the constant fragmentor
+CONSTANT_FRAGMENTS = 40
+
+
+class ConstantFragmentor(AbstractFragmentor):
+    """Fragmentor returning the same peaks for every molecule."""
+
+    def __init__(self, n_peaks: int = CONSTANT_FRAGMENTS):
+        """Initialize fragmentor.
+
+        Args:
+            n_peaks (int, optional): peaks per spectrum
+        """
+        self.peaks = np.column_stack(
+            [np.linspace(150, 1500, n_peaks), np.full(n_peaks, 100.0)]
+        )
+
+    def fragment(self, entities):
+        """Return the constant peaks.
+
+        Args:
+            entities (Union[list, str]): ignored
+
+        Returns:
+            np.ndarray: mz and intensity columns
+        """
+        return self.peaks.copy()
+
+
+FRAGMENTORS = {
+    "constant": ConstantFragmentor,
+    "pyteomics": PeptideFragmentorPyteomics,
+}
+
+NOISE_INJECTORS = {
+    "gauss": lambda: GaussNoiseInjector(variance=0.05, ppm_offset=0, ppm_var=5e-6),
+    "uniform": lambda: UniformNoiseInjector(
+        dropout=0.1, ppm_noise=5e-6, intensity_noise=0.1
+    ),
+    "jamss": lambda: JamssNoiseInjector(),
+}
+
+
+def quiet():
+    """Silence smiter logging, which would dominate small workloads."""
+    logger.disable("smiter")
+
+
+def make_peak_properties(
+    n_molecules: int, coelution: float, gradient_length: float, seed: int = SEED
+) -> dict:
+    """Generate peak properties of random tryptic peptides.
+
+    Args:
+        n_molecules (int): number of peptides
+        coelution (float): mean number of co-eluting peptides
+        gradient_length (float): gradient length in seconds
+        seed (int, optional): seed of the peptides and elution windows
+
+    Returns:
+        dict: peak properties keyed by peptide sequence
+    """
+    rng = np.random.RandomState(seed)
+    residues = np.array(list(AMINO_ACIDS))
+    peak_width = coelution * gradient_length / n_molecules
+    peak_properties = {}
+    while len(peak_properties) < n_molecules:
+        peptide = "".join(rng.choice(residues, rng.randint(7, 20))) + "K"
+        if peptide in peak_properties:
+            continue
+        peak_properties[peptide] = {
+            "trivial_name": peptide,
+            "chemical_formula": peptide_formula(peptide),
+            "charge": int(rng.choice([2, 3])),
+            "scan_start_time": float(rng.uniform(0, gradient_length - peak_width)),
+            "peak_width": peak_width,
+            "peak_function": "gauss",
+            "peak_params": {"sigma": peak_width / 10},
+            "peak_scaling_factor": float(rng.uniform(1e4, 1e6)),
+        }
+    return peak_properties
+
+
+@functools.lru_cache(maxsize=8)
+def make_library(n_molecules: int, coelution: float, gradient_length: float) -> tuple:
+    """Build and memoize peak properties and library of a workload.
+
+    Args:
+        n_molecules (int): number of peptides
+        coelution (float): mean number of co-eluting peptides
+        gradient_length (float): gradient length in seconds
+
+    Returns:
+        tuple: peak properties and library, see
+            :py:func:`smiter.synthetic_mzml.build_library`
+    """
+    peak_properties = make_peak_properties(n_molecules, coelution, gradient_length)
+    return peak_properties, build_library(peak_properties)
+
+
+def mzml_params(gradient_length: float, ms_rt_diff: float) -> dict:
+    """Get the mzML params of a workload.
+
+    Args:
+        gradient_length (float): gradient length in seconds
+        ms_rt_diff (float): seconds per scan
+
+    Returns:
+        dict: checked mzML params
+    """
+    return check_mzml_params(
+        {
+            "gradient_length": gradient_length,
+            "ms_rt_diff": ms_rt_diff,
+            "min_intensity": 0,
+            "dynamic_exclusion": 10,
+            "max_ms2_spectra": 10,
+            "mzml_writer": "native",
+        }
+    )
+
+
+def simulate(
+    n_molecules: int,
+    coelution: float,
+    gradient_length: float,
+    ms_rt_diff: float,
+    fragmentor: str = "constant",
+    noise_injector: str = "uniform",
+) -> list:
+    """Generate the scans of a workload.
+
+    Args:
+        n_molecules (int): number of peptides
+        coelution (float): mean number of co-eluting peptides
+        gradient_length (float): gradient length in seconds
+        ms_rt_diff (float): seconds per scan
+        fragmentor (str, optional): key of :py:data:`FRAGMENTORS`
+        noise_injector (str, optional): key of :py:data:`NOISE_INJECTORS`
+
+    Returns:
+        list: scans returned by generate_scans
+    """
+    peak_properties, library = make_library(n_molecules, coelution, gradient_length)
+    np.random.seed(SEED)
+    scans, _ = generate_scans(
+        library["isotopologue_lib"],
+        peak_properties,
+        library["interval_tree"],
+        FRAGMENTORS[fragmentor](),
+        NOISE_INJECTORS[noise_injector](),
+        mzml_params(gradient_length, ms_rt_diff),
+    )
+    return scans
+
+
+def count_peaks(scans: list) -> tuple:
+    """Count spectra and peaks of generated scans.
+
+    Args:
+        scans (list): scans returned by generate_scans
+
+    Returns:
+        tuple: number of spectra and of peaks
+    """
+    n_spectra = 0
+    n_peaks = 0
+    for ms1, ms2_scans in scans:
+        n_spectra += 1 + len(ms2_scans)
+        n_peaks += len(ms1.mz) + sum(len(ms2.mz) for ms2 in ms2_scans)
+    return n_spectra, n_peaks
@@ -1,27 +1,91 @@
-"""Top-level package for SMITER."""
+"""Top-level package for SMITER.
+
+Submodules are imported on first attribute access (PEP 562), so
+``import smiter`` does not load pyqms, psims or scipy. smiter logs nothing
+until :py:func:`setup_logging` is called, the console script does so.
+"""
 
 __author__ = """Manuel Kösters"""
 __email__ = "manuel.koesters@dcb.unibe.ch"
 __version__ = "0.1.0"
 
-import os
+import importlib
 import sys
-import tempfile
 
 from loguru import logger
 
-import smiter.synthetic_mzml
-
-config = {
-    "handlers": [
-        {"sink": sys.stdout, "level": "INFO"},
-        {
-            "sink": os.path.join(tempfile.gettempdir(), "smiter.log"),
-            "compression": "gz",
-            "rotation": "100 MB",
-            "level": "DEBUG",
-            "backtrace": True,
-        },
-    ],
-}
-logger.configure(**config)
+SUBMODULES = (
+    "checkpoint",
+    "cli",
+    "estimate",
+    "fasta",
+    "fragmentation_functions",
+    "hooks",
+    "lib",
+    "metrics",
+    "mzml_writer",
+    "mzmlb_writer",
+    "noise_functions",
+    "numpress",
+    "output_sinks",
+    "parallel_gzip",
+    "peak_distribution",
+    "peak_table",
+    "provenance",
+    "replicates",
+    "rt_prediction",
+    "sharding",
+    "simulation",
+    "stage_cache",
+    "summary",
+    "sweep",
+    "synthetic_mzml",
+    "xic",
+)
+
+logger.disable("smiter")
+
+
+def __getattr__(name: str):
+    if name in SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(SUBMODULES))
+
+
+def setup_logging(
+    level: str = "INFO", sink=None, log_file: str = None, replace: bool = True
+) -> list:
+    """Enable smiter logging and add a console sink.
+
+    Args:
+        level (str, optional): level of the console sink
+        sink (optional): console sink, any loguru sink, sys.stderr if None
+        log_file (str, optional): additional gzip rotated DEBUG log file
+        replace (bool, optional): remove all other loguru handlers first,
+            including loguru's default stderr handler
+
+    Returns:
+        list: ids of the added handlers
+    """
+    if sink is None:
+        sink = sys.stderr
+    handlers = [{"sink": sink, "level": level}]
+    if log_file is not None:
+        handlers.append(
+            {
+                "sink": log_file,
+                "compression": "gz",
+                "rotation": "100 MB",
+                "level": "DEBUG",
+                "backtrace": True,
+            }
+        )
+    if replace:
+        logger.remove()
+    handler_ids = [logger.add(**handler) for handler in handlers]
+    logger.enable("smiter")
+    return handler_ids
@@ -0,0 +1,137 @@
+"""Checkpoints of scan generation.
+
+:py:func:`smiter.synthetic_mzml.generate_scans` periodically saves its
+engine state (retention time, next spectrum id, dynamic exclusion tracker
+and stats, chimeric counters, molecule stats, XIC and provenance buffers and
+the numpy and random states) before starting a new MS1 cycle. Scans finished
+since the previous checkpoint are appended to ``<file>.checkpoint.scans``
+and flushed, its size after flushing is the output offset recorded in the
+state file ``<file>.checkpoint``. On resume the scans file is truncated to
+that offset, so scans of a crashed cycle are discarded, and generation
+continues with the restored state. The written mzML is identical to the one
+of an uninterrupted run.
+"""
+
+import os
+import pathlib
+import pickle
+import random
+import tempfile
+import time
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+if TYPE_CHECKING:  # pragma: no cover
+    # synthetic_mzml imports this module
+    from smiter.synthetic_mzml import Scan
+
+CHECKPOINT_SUFFIX = ".checkpoint"
+SCANS_SUFFIX = ".checkpoint.scans"
+
+
+class ScanCheckpoint(object):
+    """Checkpoint files of one simulated run."""
+
+    def __init__(
+        self,
+        file: Union[str, pathlib.PurePath],
+        interval: float = 600,
+        input_key: str = None,
+    ):
+        """Initialize checkpoint.
+
+        Args:
+            file (Union[str, pathlib.PurePath]): path of the simulated run,
+                checkpoint files are written next to it
+            interval (float, optional): minimal seconds between checkpoints,
+                0 never saves, e.g. to only resume
+            input_key (str, optional): content key of the simulation inputs,
+                resuming checkpoints of other inputs raises
+        """
+        self.state_path = pathlib.Path(f"{file}{CHECKPOINT_SUFFIX}")
+        self.scans_path = pathlib.Path(f"{file}{SCANS_SUFFIX}")
+        self.interval = interval
+        self.input_key = input_key
+        self._last_save = time.monotonic()
+        self._n_saved = 0
+        self._offset = 0
+
+    def due(self) -> bool:
+        """Return True if the interval passed since the last checkpoint."""
+        if self.interval <= 0:
+            return False
+        return time.monotonic() - self._last_save >= self.interval
+
+    def save(self, state: dict, scans: List[Tuple["Scan", List["Scan"]]]):
+        """Append new scans and atomically replace the state file.
+
+        Args:
+            state (dict): engine state of generate_scans
+            scans (List[Tuple[Scan, List[Scan]]]): all finished scans
+        """
+        with open(self.scans_path, "ab") as fout:
+            fout.seek(self._offset)
+            fout.truncate()
+            for scan in scans[self._n_saved :]:
+                pickle.dump(scan, fout, protocol=4)
+            fout.flush()
+            os.fsync(fout.fileno())
+            self._offset = fout.tell()
+        self._n_saved = len(scans)
+        state = dict(
+            state,
+            input_key=self.input_key,
+            n_scans=self._n_saved,
+            scans_offset=self._offset,
+            numpy_random_state=np.random.get_state(),
+            random_state=random.getstate(),
+        )
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fout:
+            pickle.dump(state, fout, protocol=4)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp_path, self.state_path)
+        self._last_save = time.monotonic()
+        logger.info(f"Checkpoint {self._n_saved} scans at {state['t']:.2f}")
+
+    def load(self) -> Optional[dict]:
+        """Restore the last checkpoint.
+
+        Restores the numpy and random states and truncates the scans file to
+        the recorded offset.
+
+        Raises:
+            Exception: if the checkpoint belongs to other inputs
+
+        Returns:
+            Optional[dict]: engine state with the restored scans, None
+                without checkpoint
+        """
+        if not self.state_path.exists():
+            logger.info(f"No checkpoint {self.state_path}, start from scratch")
+            return None
+        with open(self.state_path, "rb") as fin:
+            state = pickle.load(fin)
+        if state["input_key"] != self.input_key:
+            raise Exception(
+                f"Checkpoint {self.state_path} belongs to other inputs or params"
+            )
+        with open(self.scans_path, "r+b") as fin:
+            fin.truncate(state["scans_offset"])
+            scans = [pickle.load(fin) for _ in range(state["n_scans"])]
+        np.random.set_state(state["numpy_random_state"])
+        random.setstate(state["random_state"])
+        self._n_saved = state["n_scans"]
+        self._offset = state["scans_offset"]
+        self._last_save = time.monotonic()
+        logger.info(f"Resume {self._n_saved} scans at {state['t']:.2f}")
+        return dict(state, scans=scans)
+
+    def remove(self):
+        """Delete the checkpoint files, e.g. after the run finished."""
+        for path in (self.state_path, self.scans_path):
+            if path.exists():
+                path.unlink()
@@ -4,13 +4,200 @@ import sys
 import click
 
 
-@click.command()
-def main(args=None):
+@click.group(invoke_without_command=True)
+@click.pass_context
+def main(ctx, args=None):
     """Console script for smiter."""
-    click.echo("Replace this message by putting your code into smiter.cli.main")
-    click.echo("See click documentation at https://click.palletsprojects.com/")
+    from smiter import setup_logging
+
+    # stdout is kept free for streamed mzML and JSON output
+    setup_logging(sink=sys.stderr)
+    if ctx.invoked_subcommand is None:
+        click.echo(ctx.get_help())
     return 0
 
 
+@main.command()
+@click.argument("fasta_file", type=click.Path(exists=True, dir_okay=False))
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option(
+    "--gradient-length", default=7200.0, show_default=True, help="Gradient length."
+)
+@click.option("--jobs", default=1, show_default=True, help="Number of processes.")
+@click.option("--seed", default=None, type=int, help="Seed of random peak properties.")
+@click.option(
+    "--missed-cleavages", default=0, show_default=True, help="Max missed cleavages."
+)
+@click.option("--min-length", default=10, show_default=True, help="Min peptide length.")
+@click.option("--max-length", default=30, show_default=True, help="Max peptide length.")
+def fasta(
+    fasta_file,
+    output,
+    gradient_length,
+    jobs,
+    seed,
+    missed_cleavages,
+    min_length,
+    max_length,
+):
+    """Write peak properties of all tryptic peptides in FASTA_FILE to OUTPUT.
+
+    OUTPUT is written as Parquet if it ends with .parquet, else as csv.
+    """
+    from smiter.fasta import fasta_to_peak_table
+    from smiter.summary import write_molecule_summary
+
+    table = fasta_to_peak_table(
+        fasta_file,
+        gradient_length,
+        n_jobs=jobs,
+        missed_cleavages=missed_cleavages,
+        min_length=min_length,
+        max_length=max_length,
+        seed=seed,
+    )
+    write_molecule_summary(output, table.to_peak_properties())
+    click.echo(f"Wrote {len(table)} peptides to {output}")
+
+
+@main.command()
+@click.argument("config_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--jobs", default=None, type=int, help="Number of writer threads.")
+@click.option("--seed", default=None, type=int, help="Seed of the simulation.")
+@click.option("--stream", is_flag=True, help="Write the mzML to stdout.")
+@click.option(
+    "--cache-dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Directory of the stage cache.",
+)
+@click.option(
+    "--checkpoint-interval",
+    default=None,
+    type=float,
+    help="Seconds between checkpoints of scan generation.",
+)
+@click.option(
+    "--resume", is_flag=True, help="Continue from the checkpoint next to the mzML."
+)
+@click.option(
+    "--metrics", is_flag=True, help="Write stage times and counts next to the mzML."
+)
+@click.option(
+    "--profile",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Write cProfile stats of the run to this file.",
+)
+@click.option(
+    "--debug", is_flag=True, help="Log every scan generation event to stderr."
+)
+def simulate(
+    config_file,
+    jobs,
+    seed,
+    stream,
+    cache_dir,
+    checkpoint_interval,
+    resume,
+    metrics,
+    profile,
+    debug,
+):
+    """Run the simulation described by the TOML or YAML CONFIG_FILE."""
+    from loguru import logger
+
+    from smiter import setup_logging
+    from smiter.simulation import load_config, run_simulation
+
+    config = load_config(config_file)
+    if checkpoint_interval is not None:
+        config["mzml_params"]["checkpoint_interval"] = checkpoint_interval
+    if resume:
+        config["mzml_params"]["resume"] = True
+    if metrics:
+        config["mzml_params"]["metrics_report"] = True
+    output = None
+    if stream:
+        output = click.get_binary_stream("stdout")
+    if debug:
+        from smiter.hooks import enable_debug_logging
+
+        setup_logging(level="DEBUG", sink=sys.stderr)
+        enable_debug_logging()
+    if profile is None:
+        run_simulation(
+            config, n_jobs=jobs, seed=seed, stream=output, cache_dir=cache_dir
+        )
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.runcall(
+        run_simulation,
+        config,
+        n_jobs=jobs,
+        seed=seed,
+        stream=output,
+        cache_dir=cache_dir,
+    )
+    profiler.dump_stats(profile)
+    logger.info(f"Wrote profile {profile}, view it with python -m pstats {profile}")
+
+
+@main.command()
+@click.argument("config_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--jobs", default=1, show_default=True, help="Number of processes.")
+@click.option("--seed", default=None, type=int, help="Seed of the simulations.")
+@click.option(
+    "--cache-dir",
+    default=None,
+    type=click.Path(file_okay=False),
+    help="Directory of the stage cache.",
+)
+def sweep(config_file, jobs, seed, cache_dir):
+    """Simulate the parameter grid in the sweep table of CONFIG_FILE."""
+    from smiter.simulation import load_config, run_simulation_sweep
+
+    manifest = run_simulation_sweep(
+        load_config(config_file), n_jobs=jobs, seed=seed, cache_dir=cache_dir
+    )
+    click.echo(f"Wrote sweep manifest {manifest}")
+
+
+@main.command()
+@click.argument("config_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--json", "as_json", is_flag=True, help="Print the estimate as JSON.")
+def estimate(config_file, as_json):
+    """Estimate scans, output size, memory and runtime of CONFIG_FILE."""
+    import json
+
+    from smiter.estimate import estimate as estimate_costs
+    from smiter.peak_table import read_peak_table
+    from smiter.simulation import load_config
+
+    config = load_config(config_file)
+    costs = estimate_costs(
+        read_peak_table(config["peak_properties"]), config["mzml_params"]
+    )
+    if as_json:
+        click.echo(json.dumps(costs, indent=2))
+        return
+    click.echo(f"Molecules:       {costs['molecules']}")
+    click.echo(
+        f"Co-eluting:      {costs['mean_coeluting']:.1f} mean, "
+        f"{costs['max_coeluting']} max"
+    )
+    click.echo(f"MS1 scans:       {costs['ms1_scans']}")
+    click.echo(f"MS2 scans:       {costs['ms2_scans']}")
+    click.echo(f"Peaks per MS1:   {costs['mean_ms1_peaks']:.0f}")
+    click.echo(f"File size:       {costs['file_size'] / 2**30:.2f} GiB")
+    click.echo(f"Memory:          {costs['memory'] / 2**30:.2f} GiB")
+    stages = ", ".join(
+        f"{stage} {seconds:.0f} s" for stage, seconds in costs["runtime"].items()
+    )
+    click.echo(f"Runtime:         {costs['total_runtime']:.0f} s ({stages})")
+
+
 if __name__ == "__main__":
     sys.exit(main())  # pragma: no cover
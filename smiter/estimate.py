@@ -0,0 +1,226 @@
+"""Dry-run cost estimates of simulations.
+
+Only retention time windows of the peak table and mzML params are used, no
+isotopologue library or fragment spectra are built. The number of co-eluting
+molecules is found for every ``ms_rt_diff`` time slot by binary search in the
+sorted start and end times. Acquisition cycles are then walked slot by slot
+like :py:func:`smiter.synthetic_mzml.generate_scans` does: one MS1 scan
+followed by MS2 scans of pending precursors. Every eluting molecule requests
+a fragmentation when it starts eluting and again after each
+``dynamic_exclusion`` seconds, pending requests are capped by the number of
+eluting molecules. Peak counts, file size and memory follow from per peak
+and per scan sizes, runtime from the throughputs in :py:data:`THROUGHPUT`.
+Estimates ignore min_intensity and are therefore upper bounds for sparse
+peaks.
+"""
+
+from typing import Dict, Tuple, Union
+
+import numpy as np
+
+from smiter.lib import check_mzml_params
+from smiter.peak_table import PeakTable
+
+# throughputs measured with the native writer on one core: molecules per
+# second for the isotopologue library, MS1 cycles, eluting molecules summed
+# over MS1 scans and MS2 scans per second for scan generation, peaks and
+# spectra per second for writing
+THROUGHPUT = {
+    "library": 350.0,
+    "scans": 14000.0,
+    "eluting": 6700.0,
+    "ms2": 5000.0,
+    "write_peaks": 850000.0,
+    "write_spectra": 18000.0,
+}
+
+# isotopologue peaks of a tryptic peptide in the pyqms library
+DEFAULT_ISOTOPOLOGUES = 13
+
+# b and y ions of a tryptic peptide
+DEFAULT_FRAGMENTS = 40
+
+# encoded bytes of one value before base64, numpress ratios are typical,
+# zlib hardly shrinks noisy float arrays and is ignored
+ENCODED_BYTES = {
+    "float64": 8.0,
+    "float32": 4.0,
+    "numpress_linear": 3.0,
+    "numpress_pic": 2.0,
+    "numpress_slof": 2.0,
+}
+
+# XML and index of one spectrum without its binary arrays
+SPECTRUM_XML_BYTES = 2400
+
+# memory of the interpreter and imported libraries, of a held scan without
+# its arrays, of a molecule (peak properties, isotopologues and stats) and of
+# one entry in the molecule scan lists
+BASE_MEMORY = 250 * 2**20
+SCAN_MEMORY = 700
+MOLECULE_MEMORY = 4000
+SCAN_ENTRY_MEMORY = 36
+
+# bytes of one peak in memory, mz and intensity as float64
+PEAK_MEMORY = 16
+
+
+def _elution_windows(
+    peak_properties: Union[Dict[str, dict], PeakTable],
+) -> Tuple[np.ndarray, np.ndarray]:
+    if isinstance(peak_properties, PeakTable):
+        starts = np.asarray(peak_properties.columns["scan_start_time"], dtype=float)
+        widths = np.asarray(peak_properties.columns["peak_width"], dtype=float)
+    else:
+        properties = peak_properties.values()
+        starts = np.fromiter(
+            (p["scan_start_time"] for p in properties), float, len(peak_properties)
+        )
+        widths = np.fromiter(
+            (p["peak_width"] for p in properties), float, len(peak_properties)
+        )
+    return starts, starts + widths
+
+
+def coelution(starts: np.ndarray, ends: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Count molecules eluting at the given times.
+
+    A molecule elutes at t if start <= t < end, like in the interval tree of
+    :py:func:`smiter.synthetic_mzml.generate_interval_tree`.
+
+    Args:
+        starts (np.ndarray): elution starts
+        ends (np.ndarray): elution ends
+        times (np.ndarray): times
+
+    Returns:
+        np.ndarray: number of eluting molecules at every time
+    """
+    started = np.searchsorted(np.sort(starts), times, side="right")
+    ended = np.searchsorted(np.sort(ends), times, side="right")
+    return started - ended
+
+
+def _fragmentation_requests(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    n_slots: int,
+    ms_rt_diff: float,
+    dynamic_exclusion: float,
+) -> np.ndarray:
+    # cumulative fragmentation requests at the start of every slot, one when
+    # a molecule starts eluting and one per dynamic_exclusion seconds after
+    # that while it still elutes
+    def _slots(times):
+        return np.clip(np.ceil(times / ms_rt_diff), 0, n_slots).astype(np.int64)
+
+    start_slots = _slots(starts)
+    repeat_slots = _slots(starts + dynamic_exclusion)
+    end_slots = _slots(np.maximum(ends, starts + dynamic_exclusion))
+    impulses = np.bincount(start_slots, minlength=n_slots + 1)[:n_slots]
+    repeating = np.cumsum(
+        np.bincount(repeat_slots, minlength=n_slots + 1)
+        - np.bincount(end_slots, minlength=n_slots + 1)
+    )[:n_slots]
+    return np.cumsum(impulses + repeating * ms_rt_diff / dynamic_exclusion)
+
+
+def estimate(
+    peak_properties: Union[Dict[str, dict], PeakTable],
+    mzml_params: Dict[str, Union[int, float, str]],
+    isotopologues: float = DEFAULT_ISOTOPOLOGUES,
+    fragments: float = DEFAULT_FRAGMENTS,
+    throughput: Dict[str, float] = None,
+) -> dict:
+    """Estimate scans, peaks, output size, memory and runtime of a simulation.
+
+    Args:
+        peak_properties (Union[Dict[str, dict], PeakTable]): peak properties
+            of all molecules, only scan_start_time and peak_width are used
+        mzml_params (Dict[str, Union[int, float, str]]): simulation params
+        isotopologues (float, optional): MS1 peaks per eluting molecule
+        fragments (float, optional): peaks per MS2 scan
+        throughput (Dict[str, float], optional): stage throughputs replacing
+            those in :py:data:`THROUGHPUT`, e.g. measured by the benchmarks
+
+    Returns:
+        dict: scan and peak counts, co-elution stats, file_size and memory in
+            bytes and runtime in seconds by stage
+    """
+    mzml_params = check_mzml_params(mzml_params)
+    throughput = dict(THROUGHPUT, **(throughput or {}))
+    gradient_length = float(mzml_params["gradient_length"])
+    ms_rt_diff = float(mzml_params["ms_rt_diff"])
+    dynamic_exclusion = float(mzml_params["dynamic_exclusion"])
+    max_ms2_spectra = int(mzml_params["max_ms2_spectra"])
+    starts, ends = _elution_windows(peak_properties)
+    n_slots = int(np.ceil(gradient_length / ms_rt_diff))
+    eluting = coelution(starts, ends, np.arange(n_slots) * ms_rt_diff)
+    always_eligible = dynamic_exclusion < ms_rt_diff
+    # plain lists are indexed much faster than arrays in the cycle loop
+    slot_eluting = eluting.tolist()
+    if not always_eligible:
+        requests = _fragmentation_requests(
+            starts, ends, n_slots, ms_rt_diff, dynamic_exclusion
+        ).tolist()
+    ms1_slots = []
+    n_ms2 = 0
+    pending = 0.0
+    served = 0.0
+    slot = 0
+    while slot < n_slots:
+        ms1_slots.append(slot)
+        if always_eligible:
+            pending = slot_eluting[slot]
+        else:
+            pending = min(requests[slot] - served, slot_eluting[slot])
+        ms2 = int(min(max_ms2_spectra, pending, n_slots - slot - 1))
+        if not always_eligible:
+            # requests beyond the eluting molecules expire unserved
+            served = requests[slot] - pending + ms2
+        n_ms2 += ms2
+        slot += 1 + ms2
+    ms1_eluting = eluting[ms1_slots]
+    # eluting molecules summed over all MS1 scans
+    ms1_molecules = int(ms1_eluting.sum())
+
+    n_ms1 = len(ms1_slots)
+    ms1_peaks = float(ms1_molecules * isotopologues)
+    ms2_peaks = float(n_ms2 * fragments)
+    value_bytes = (
+        ENCODED_BYTES[str(mzml_params["mz_encoding"])]
+        + ENCODED_BYTES[str(mzml_params["intensity_encoding"])]
+    )
+    file_size = (ms1_peaks + ms2_peaks) * value_bytes * 4 / 3 + (
+        n_ms1 + n_ms2
+    ) * SPECTRUM_XML_BYTES
+    # all scans are held in memory until they are written
+    memory = (
+        BASE_MEMORY
+        + (ms1_peaks + ms2_peaks) * PEAK_MEMORY
+        + (n_ms1 + n_ms2) * SCAN_MEMORY
+        + len(starts) * MOLECULE_MEMORY
+        + ms1_molecules * SCAN_ENTRY_MEMORY
+    )
+    runtime = {
+        "library": len(starts) / throughput["library"],
+        "scans": n_ms1 / throughput["scans"]
+        + ms1_molecules / throughput["eluting"]
+        + n_ms2 / throughput["ms2"],
+        "write": (ms1_peaks + ms2_peaks) / throughput["write_peaks"]
+        + (n_ms1 + n_ms2) / throughput["write_spectra"],
+    }
+    return {
+        "molecules": len(starts),
+        "ms1_scans": n_ms1,
+        "ms2_scans": n_ms2,
+        "mean_coeluting": ms1_molecules / n_ms1 if n_ms1 > 0 else 0.0,
+        "max_coeluting": int(ms1_eluting.max()) if n_ms1 > 0 else 0,
+        "ms1_peaks": ms1_peaks,
+        "ms2_peaks": ms2_peaks,
+        "mean_ms1_peaks": ms1_peaks / n_ms1 if n_ms1 > 0 else 0.0,
+        "file_size": float(file_size),
+        "memory": float(memory),
+        "runtime": runtime,
+        "total_runtime": sum(runtime.values()),
+    }
@@ -0,0 +1,241 @@
+"""Peak properties of tryptic peptides from FASTA files.
+
+Proteins are streamed from the FASTA file and digested in chunks on a
+process pool. Peptides are deduplicated before their chemical formulas are
+computed from cached residue compositions, so pyqms is only used once per
+amino acid. The result is a :py:class:`smiter.peak_table.PeakTable`.
+"""
+
+import functools
+import itertools
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from pyqms.chemical_composition import ChemicalComposition
+from pyteomics import fasta
+
+from smiter.peak_table import PARAM_PREFIX, PeakTable
+from smiter.rt_prediction import AbstractRTPredictor, assign_retention_times
+
+# cleave after K and R, also before P
+TRYPSIN = r"[KR]"
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+DEFAULT_CHUNK_SIZE = 1000
+
+WATER = {"H": 2, "O": 1}
+
+
+def iter_proteins(fasta_file: str) -> Iterator[str]:
+    """Stream protein sequences from a FASTA file.
+
+    Args:
+        fasta_file (str): path to the FASTA file
+
+    Yields:
+        str: protein sequence
+    """
+    with fasta.read(fasta_file) as reader:
+        for _, sequence in reader:
+            yield sequence
+
+
+def digest(
+    sequences: List[str],
+    rule: str = TRYPSIN,
+    missed_cleavages: int = 0,
+    min_length: int = 10,
+    max_length: int = 30,
+) -> List[str]:
+    """Digest proteins into unique peptides.
+
+    Args:
+        sequences (List[str]): protein sequences
+        rule (str, optional): cleavage rule, regex matching the residue
+            before each cleavage site
+        missed_cleavages (int, optional): maximal number of missed cleavages
+        min_length (int, optional): minimal peptide length
+        max_length (int, optional): maximal peptide length
+
+    Returns:
+        List[str]: unique peptides in order of appearance
+    """
+    pattern = re.compile(rule)
+    peptides: Dict[str, None] = {}
+    for sequence in sequences:
+        sites = sorted(
+            {0, len(sequence)} | {m.end() for m in pattern.finditer(sequence)}
+        )
+        for i, start in enumerate(sites[:-1]):
+            for end in sites[i + 1 : i + missed_cleavages + 2]:
+                if min_length <= end - start <= max_length:
+                    peptides[sequence[start:end]] = None
+    return list(peptides)
+
+
+@functools.lru_cache(maxsize=None)
+def residue_compositions() -> Dict[str, Dict[str, int]]:
+    """Get the elemental composition of every amino acid residue.
+
+    Returns:
+        Dict[str, Dict[str, int]]: composition without water by amino acid
+    """
+    cc = ChemicalComposition()
+    compositions = {}
+    for aa in AMINO_ACIDS:
+        cc.use(aa)
+        composition = dict(cc)
+        for element, count in WATER.items():
+            composition[element] -= count
+        compositions[aa] = composition
+    return compositions
+
+
+def _hill_notation(composition: Dict[str, int]) -> str:
+    # ChemicalComposition.hill_notation_unimod without a pyqms instance
+    majors = [element for element in ("C", "H") if composition.get(element, 0)]
+    others = sorted(
+        element
+        for element, count in composition.items()
+        if element not in ("C", "H") and count
+    )
+    return "".join(f"{element}({composition[element]})" for element in majors + others)
+
+
+def peptide_formula(peptide: str) -> Optional[str]:
+    """Get the formula of a peptide in pyqms Hill notation.
+
+    Args:
+        peptide (str): peptide sequence
+
+    Returns:
+        Optional[str]: formula like +C(10)H(15)N(3)O(5), None for unknown residues
+    """
+    residues = residue_compositions()
+    composition = Counter(WATER)
+    for aa, n in Counter(peptide).items():
+        if aa not in residues:
+            return None
+        for element, count in residues[aa].items():
+            composition[element] += n * count
+    return "+" + _hill_notation(composition)
+
+
+def _formulas(peptides: List[str]) -> List[Optional[str]]:
+    return [peptide_formula(peptide) for peptide in peptides]
+
+
+def _chunks(iterable: Iterable, chunk_size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def fasta_to_peak_table(
+    fasta_file: str,
+    gradient_length: float,
+    n_jobs: int = 1,
+    rule: str = TRYPSIN,
+    missed_cleavages: int = 0,
+    min_length: int = 10,
+    max_length: int = 30,
+    charges: Tuple[int, ...] = (2, 3, 4),
+    charge_probabilities: Tuple[float, ...] = (0.6, 0.3, 0.1),
+    peak_width_range: Tuple[float, float] = (0.3, 0.5),
+    scaling_factor_range: Tuple[float, float] = (1e4, 2e6),
+    peak_function: str = "gauss_tail",
+    peak_params: Dict[str, float] = None,
+    seed: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    rt_predictor: AbstractRTPredictor = None,
+) -> PeakTable:
+    """Digest all proteins of a FASTA file and draw random peak properties.
+
+    Retention times are predicted with rt_predictor or drawn uniformly over
+    the gradient, charges, peak widths and scaling factors are drawn from the
+    given distributions.
+
+    Args:
+        fasta_file (str): path to the FASTA file
+        gradient_length (float): gradient length, upper bound of start times
+        n_jobs (int, optional): processes digesting proteins and computing
+            formulas
+        rule (str, optional): cleavage rule, see :py:func:`digest`
+        missed_cleavages (int, optional): maximal number of missed cleavages
+        min_length (int, optional): minimal peptide length
+        max_length (int, optional): maximal peptide length
+        charges (Tuple[int, ...], optional): possible charges
+        charge_probabilities (Tuple[float, ...], optional): probability of
+            each charge
+        peak_width_range (Tuple[float, float], optional): uniform peak width
+            range
+        scaling_factor_range (Tuple[float, float], optional): uniform peak
+            scaling factor range
+        peak_function (str, optional): peak function of all peptides
+        peak_params (Dict[str, float], optional): peak function parameters,
+            defaults to sigma=2
+        seed (int, optional): seed of the random properties
+        chunk_size (int, optional): proteins and peptides per task
+        rt_predictor (AbstractRTPredictor, optional): predictor of start
+            times from peptide sequences
+
+    Returns:
+        PeakTable: validated peak table with one row per unique peptide
+    """
+    logger.info(f"Digest proteins of {fasta_file} on {n_jobs} processes")
+    unique_peptides: Dict[str, None] = {}
+    executor = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    try:
+        map_function = executor.map if executor is not None else map
+        digest_chunk = functools.partial(
+            digest,
+            rule=rule,
+            missed_cleavages=missed_cleavages,
+            min_length=min_length,
+            max_length=max_length,
+        )
+        for chunk_peptides in map_function(
+            digest_chunk, _chunks(iter_proteins(fasta_file), chunk_size)
+        ):
+            unique_peptides.update(dict.fromkeys(chunk_peptides))
+        peptides = list(unique_peptides)
+        logger.info(f"Compute formulas of {len(peptides)} unique peptides")
+        formulas = list(
+            itertools.chain.from_iterable(
+                map_function(_formulas, _chunks(peptides, chunk_size))
+            )
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    known = np.array([formula is not None for formula in formulas], dtype=bool)
+    if not known.all():
+        logger.info(f"Skip {(~known).sum()} peptides with unknown residues")
+    names = np.array(peptides, dtype=str)[known]
+    n_rows = len(names)
+    random_state = np.random.RandomState(seed)
+    columns = {
+        "chemical_formula": np.array(formulas, dtype=object)[known].astype(str),
+        "trivial_name": names,
+        "scan_start_time": random_state.uniform(0, gradient_length, n_rows),
+        "peak_scaling_factor": random_state.uniform(*scaling_factor_range, n_rows),
+        "charge": random_state.choice(charges, n_rows, p=charge_probabilities),
+        "peak_width": random_state.uniform(*peak_width_range, n_rows),
+        "peak_function": np.full(n_rows, peak_function),
+    }
+    if peak_params is None:
+        peak_params = {"sigma": 2.0}
+    for key, value in peak_params.items():
+        columns[PARAM_PREFIX + key] = np.full(n_rows, float(value))
+    peak_table = PeakTable(columns)
+    if rt_predictor is not None:
+        assign_retention_times(peak_table, rt_predictor)
+    return peak_table.validate()
@@ -2,6 +2,8 @@
 
 Upon calling the callabe, a list/np.array of mz and intensities should be returned.
 Arguments should be passed via *args and **kwargs
+pandas, pyteomics, pyqms and peptide_fragmentor are imported by the fragmentors
+using them, so importing this module stays cheap.
 """
 from abc import ABC, abstractmethod
 from typing import Dict, List, Tuple, Union
@@ -12,17 +14,12 @@ import os
 import csv
 
 import numpy as np
-import pandas as pd
-import pyqms
 from loguru import logger
-from pyteomics import mass
 
 import smiter
-from peptide_fragmentor import PeptideFragment0r
 from smiter.ext.nucleoside_fragment_kb import (
     KB_FRAGMENTATION_INFO as pyrnams_nucleoside_fragment_kb,
 )
-from smiter.lib import calc_mz
 
 try:
     from smiter.ext.nucleoside_fragment_kb import KB_FRAGMENTATION_INFO
@@ -56,15 +53,18 @@ class PeptideFragmentor(AbstractFragmentor):
         logger.info("Initialize PeptideFragmentor")
         self.args = args
         self.kwargs = kwargs
+        from peptide_fragmentor import PeptideFragment0r
+
         self.fragger = PeptideFragment0r()
 
-    # @profile
     def fragment(self, entities):
         """Summary.
 
         Args:
             entity (TYPE): Description
         """
+        import pandas as pd
+
         if isinstance(entities, str):
             entities = [entities]
         frames = []
@@ -82,8 +82,9 @@ class PeptideFragmentorPyteomics(AbstractFragmentor):
     def __init__(self, *args, **kwargs):
         pass
 
-    # @profile
     def _fragments(self, peptide, types=("b", "y"), maxcharge=1):
+        from pyteomics import mass
+
         for i in range(1, len(peptide) - 1):
             for ion_type in types:
                 for charge in range(1, maxcharge + 1):
@@ -96,7 +97,6 @@ class PeptideFragmentorPyteomics(AbstractFragmentor):
                             peptide[i:], ion_type=ion_type, charge=charge
                         )
 
-    # @profile
     def fragment(self, entities):
         mz = []
         for e in entities:
@@ -124,7 +124,11 @@ class NucleosideFragmentor(AbstractFragmentor):
             raise_error_for_non_existing_fragments
         )
         nuc_to_fragments: Dict[str, List[float]] = {}
-        cc = pyqms.chemical_composition.ChemicalComposition()
+        from pyqms.chemical_composition import ChemicalComposition
+
+        from smiter.lib import calc_mz
+
+        cc = ChemicalComposition()
         for nuc_name, nuc_dict in nucleoside_fragment_kb.items():
             nuc_to_fragments[nuc_name] = []
             for frag_name, frag_cc_dict in nucleoside_fragment_kb[nuc_name][
@@ -212,3 +216,51 @@ class LipidFragmentor(AbstractFragmentor):
         m = sorted(list(set(m)))
         # logger.debug(m)
         return np.array([(mass, 1) for mass in m])
+
+
+class CachedFragmentor(AbstractFragmentor):
+    """Memoize the fragment spectra of another fragmentor.
+
+    Spectra are cached by the tuple of fragmented molecules and copies are
+    returned, since scan generation rescales fragment intensities in place.
+    """
+
+    def __init__(self, fragmentor: AbstractFragmentor):
+        """Initialize cache.
+
+        Args:
+            fragmentor (AbstractFragmentor): fragmentor computing missing spectra
+        """
+        self.fragmentor = fragmentor
+        self.cache: Dict[tuple, np.ndarray] = {}
+        self.hits = 0
+
+    def warm(self, molecules: List[str]):
+        """Fragment every molecule on its own, the case of non chimeric scans.
+
+        Args:
+            molecules (List[str]): molecules to fragment
+        """
+        for mol in molecules:
+            if (mol,) not in self.cache:
+                self.cache[(mol,)] = np.asarray(self.fragmentor.fragment([mol]))
+
+    def fragment(self, entities: Union[list, str]) -> np.ndarray:
+        """Get the fragment spectrum of the co-isolated molecules.
+
+        Args:
+            entities (Union[list, str]): molecule or molecules
+
+        Returns:
+            np.ndarray: mz and intensity of all fragments
+        """
+        if isinstance(entities, str):
+            entities = [entities]
+        key = tuple(entities)
+        peaks = self.cache.get(key, None)
+        if peaks is None:
+            peaks = np.asarray(self.fragmentor.fragment(list(entities)))
+            self.cache[key] = peaks
+        else:
+            self.hits += 1
+        return peaks.copy()
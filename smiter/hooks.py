@@ -0,0 +1,171 @@
+"""Instrumentation hooks of scan generation.
+
+:py:func:`smiter.synthetic_mzml.generate_scans` calls the listeners
+registered for these hooks:
+
+* ``on_cycle(scan, eluting)``: after the MS1 scan of a cycle, with the
+  (molecule, mz, intensity) tuples of all eluting molecules sorted by
+  intensity
+* ``on_ms2_selected(t, molecule, isolated)``: before a precursor is
+  fragmented, with all molecules in its isolation window
+* ``on_ms2_skipped(t, molecule, reason)``: if a precursor is skipped due to
+  ``"dynamic_exclusion"`` or because it left its ``"rt_window"``
+* ``on_scan_written(scan)``: for every MS1 and MS2 scan added to the output
+
+Hooks without listeners are None, generate_scans binds them to locals once,
+so disabled hooks cost a single ``is None`` check. Listeners are registered
+on the module level :py:data:`hooks` or on a :py:class:`Hooks` instance
+passed to generate_scans::
+
+    from smiter.hooks import hooks
+
+    def log_cycle(scan, eluting):
+        print(scan.retention_time, len(eluting))
+
+    hooks.register("on_cycle", log_cycle)
+"""
+
+import contextlib
+from typing import Callable, Dict, Iterator, Optional
+
+from loguru import logger
+
+HOOK_NAMES = ("on_cycle", "on_ms2_selected", "on_ms2_skipped", "on_scan_written")
+
+
+def _dispatcher(listeners: list) -> Optional[Callable]:
+    if len(listeners) == 0:
+        return None
+    if len(listeners) == 1:
+        return listeners[0]
+
+    def _dispatch(*args):
+        for listener in listeners:
+            listener(*args)
+
+    return _dispatch
+
+
+class Hooks(object):
+    """Listeners of the scan generation hooks.
+
+    Attributes:
+        on_cycle (Callable): dispatcher of all on_cycle listeners, None
+            without listeners, the same holds for all names in
+            :py:data:`HOOK_NAMES`
+    """
+
+    on_cycle: Optional[Callable]
+    on_ms2_selected: Optional[Callable]
+    on_ms2_skipped: Optional[Callable]
+    on_scan_written: Optional[Callable]
+
+    def __init__(self):
+        """Initialize hooks without listeners."""
+        self._listeners = {name: [] for name in HOOK_NAMES}
+        for name in HOOK_NAMES:
+            setattr(self, name, None)
+
+    def _check(self, name: str):
+        if name not in self._listeners:
+            raise Exception(f"Unknown hook {name}, choose one of {HOOK_NAMES}")
+
+    def register(self, name: str, listener: Callable) -> Callable:
+        """Add a listener.
+
+        Args:
+            name (str): hook name
+            listener (Callable): called with the hook arguments
+
+        Raises:
+            Exception: for unknown hooks
+
+        Returns:
+            Callable: the listener
+        """
+        self._check(name)
+        self._listeners[name] = self._listeners[name] + [listener]
+        setattr(self, name, _dispatcher(self._listeners[name]))
+        return listener
+
+    def unregister(self, name: str, listener: Callable):
+        """Remove a listener.
+
+        Args:
+            name (str): hook name
+            listener (Callable): registered listener
+
+        Raises:
+            Exception: for unknown hooks
+        """
+        self._check(name)
+        self._listeners[name] = [
+            registered
+            for registered in self._listeners[name]
+            if registered is not listener
+        ]
+        setattr(self, name, _dispatcher(self._listeners[name]))
+
+    def clear(self):
+        """Remove all listeners."""
+        for name in HOOK_NAMES:
+            self._listeners[name] = []
+            setattr(self, name, None)
+
+    @contextlib.contextmanager
+    def listen(self, name: str, listener: Callable) -> Iterator[Callable]:
+        """Register a listener for the duration of a with block.
+
+        Args:
+            name (str): hook name
+            listener (Callable): called with the hook arguments
+        """
+        self.register(name, listener)
+        try:
+            yield listener
+        finally:
+            self.unregister(name, listener)
+
+
+# listeners of all generate_scans calls without own hooks
+hooks = Hooks()
+
+
+def enable_debug_logging(target: Hooks = None) -> dict:
+    """Log every scan generation event at DEBUG level.
+
+    The messages are only emitted with a DEBUG sink, e.g. after
+    ``smiter.setup_logging(level="DEBUG")``.
+
+    Args:
+        target (Hooks, optional): hooks to register on, :py:data:`hooks` if
+            None
+
+    Returns:
+        dict: registered listeners by hook name, e.g. to unregister them
+    """
+    if target is None:
+        target = hooks
+    listeners: Dict[str, Callable] = {
+        "on_cycle": lambda scan, eluting: logger.debug(
+            "MS1 scan {} at {:.2f}: {} molecules eluting",
+            scan.id,
+            scan.retention_time,
+            len(eluting),
+        ),
+        "on_ms2_selected": lambda t, molecule, isolated: logger.debug(
+            "Fragment {} at {:.2f} with {} isolated molecules",
+            molecule,
+            t,
+            len(isolated),
+        ),
+        "on_ms2_skipped": lambda t, molecule, reason: logger.debug(
+            "Skip {} at {:.2f} due to {}", molecule, t, reason
+        ),
+        "on_scan_written": lambda scan: logger.debug(
+            "Append MS{} scan {} with {} peaks", scan.ms_level, scan.id, len(scan.mz)
+        ),
+    }
+    for name, listener in listeners.items():
+        target.register(name, listener)
+    return listeners
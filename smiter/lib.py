@@ -1,14 +1,26 @@
 """Core functionality."""
-import csv
-from io import TextIOWrapper
+
+import os
+import pathlib
 from tempfile import _TemporaryFileWrapper
+from typing import TYPE_CHECKING, Dict, Tuple, Union
 
+import numpy as np
 from loguru import logger
 
+from smiter.mzml_writer import ENCODINGS
 from smiter.params.default_params import default_mzml_params, default_peak_properties
 
+if TYPE_CHECKING:  # pragma: no cover
+    # peak_table imports scipy and pyarrow
+    from smiter.peak_table import PeakTable
+
 PROTON = 1.00727646677
 
+# names of smiter.peak_distribution.distributions, not imported to keep scipy
+# out of this module
+PEAK_FUNCTIONS = ("gauss", "gamma", "gauss_tail")
+
 
 def calc_mz(mass: float, charge: int):
     """Calculate m/z.
@@ -23,8 +35,127 @@ def calc_mz(mass: float, charge: int):
     return calc_mz
 
 
+def split_path(file: Union[str, pathlib.PurePath]) -> Tuple[pathlib.Path, str, str]:
+    """Split a path into parent, stem and suffix, keeping .gz in the suffix.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): e.g. /data/run.mzML.gz
+
+    Returns:
+        Tuple[pathlib.Path, str, str]: e.g. /data, run and .mzML.gz
+    """
+    path = pathlib.Path(file)
+    name = path.name
+    gz_suffix = ""
+    if name.endswith(".gz"):
+        name, gz_suffix = name[:-3], ".gz"
+    stem, suffix = os.path.splitext(name)
+    return path.parent, stem, suffix + gz_suffix
+
+
+# rules checked for every value that is set: min (inclusive unless
+# exclusive_min), integer, nonzero and choices
+MZML_PARAMS_SCHEMA: Dict[str, dict] = {
+    "gradient_length": {"min": 0},
+    "min_intensity": {"min": 0},
+    "max_intensity": {"min": 0},
+    "isolation_window_width": {"min": 0},
+    "ion_target": {"min": 0},
+    "ms_rt_diff": {"min": 0, "exclusive_min": True},
+    "dynamic_exclusion": {"min": 0},
+    "max_ms2_spectra": {"min": 0, "integer": True},
+    "mz_lower_limit": {"min": 0},
+    "mz_upper_limit": {"min": 0},
+    "mzml_writer": {"choices": ["psims", "native", "mzmlb"]},
+    "writer_jobs": {"min": 1, "integer": True},
+    "mz_encoding": {"choices": list(ENCODINGS)},
+    "intensity_encoding": {"choices": list(ENCODINGS)},
+    "binary_compression": {"choices": ["zlib", "none"]},
+    "xic_output": {"choices": ["none", "chromatograms", "sidecar", "both"]},
+    "mzml_shards": {"min": 1, "integer": True},
+    "checkpoint_interval": {"min": 0},
+}
+
+PEAK_PROPERTIES_SCHEMA: Dict[str, dict] = {
+    "charge": {"integer": True, "nonzero": True},
+    "scan_start_time": {"min": 0},
+    "peak_width": {"min": 0, "exclusive_min": True},
+    "peak_scaling_factor": {"min": 0},
+    "peak_function": {"choices": list(PEAK_FUNCTIONS) + [None]},
+}
+
+# offending molecules listed per error
+_MAX_REPORTED = 20
+
+
+def _float_column(values: list) -> np.ndarray:
+    """Convert values to float64, non-numeric values become NaN.
+
+    Args:
+        values (list): values of one field
+
+    Returns:
+        np.ndarray: converted values
+    """
+    try:
+        column = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        column = np.full(len(values), np.nan)
+        for n, value in enumerate(values):
+            try:
+                column[n] = float(value)
+            except (TypeError, ValueError):
+                pass
+    # strings like "1" are converted by numpy but rejected here
+    is_number = np.array(
+        [
+            isinstance(v, (int, float, np.number)) and not isinstance(v, bool)
+            for v in values
+        ],
+        dtype=bool,
+    )
+    column[~is_number] = np.nan
+    return column
+
+
+def _schema_errors(field: str, values: list, rules: dict) -> Dict[str, np.ndarray]:
+    """Check all values of a field at once.
+
+    Args:
+        field (str): name of the field
+        values (list): values of the field, None values are skipped
+        rules (dict): rules of the field, see :py:data:`MZML_PARAMS_SCHEMA`
+
+    Returns:
+        Dict[str, np.ndarray]: mask of offending values by error message
+    """
+    errors = {}
+    is_set = np.array([v is not None for v in values], dtype=bool)
+    if "choices" in rules:
+        valid = np.array([v in rules["choices"] for v in values], dtype=bool)
+        errors[f"{field} is not one of {rules['choices']}"] = ~valid
+        return errors
+    column = _float_column(values)
+    not_numeric = is_set & np.isnan(column)
+    errors[f"{field} is not a number"] = not_numeric
+    numeric = is_set & ~not_numeric
+    if "min" in rules:
+        if rules.get("exclusive_min", False):
+            below = column <= rules["min"]
+            message = f"{field} has to be > {rules['min']}"
+        else:
+            below = column < rules["min"]
+            message = f"{field} has to be >= {rules['min']}"
+        errors[message] = numeric & below
+    if rules.get("integer", False):
+        errors[f"{field} is not an integer"] = numeric & (np.round(column) != column)
+    if rules.get("nonzero", False):
+        errors[f"{field} has to be non-zero"] = numeric & (column == 0)
+    return errors
+
+
 def check_mzml_params(mzml_params: dict) -> dict:
-    """Summary.
+    """Fill defaults and validate all mzML parameters at once.
 
     Args:
         mzml_params (dict): Description
@@ -33,105 +164,108 @@ def check_mzml_params(mzml_params: dict) -> dict:
         dict: Description
 
     Raises:
-        Exception: Description
+        Exception: listing every missing or invalid parameter
     """
     logger.info("Checking mzML params")
+    errors = []
     for default_param, default_value in default_mzml_params.items():
         # param not set and default param required
         if (mzml_params.get(default_param, None) is None) and (default_value is None):
-            raise Exception(f"mzml parameter {default_param} is required by not set!")
+            errors.append(f"mzml parameter {default_param} is required by not set!")
         elif mzml_params.get(default_param, None) is None:
             mzml_params[default_param] = default_value
+    for param, rules in MZML_PARAMS_SCHEMA.items():
+        for message, mask in _schema_errors(
+            param, [mzml_params.get(param, None)], rules
+        ).items():
+            if mask.any():
+                errors.append(f"mzml parameter {message}: {mzml_params[param]!r}")
+    if len(errors) > 0:
+        raise Exception("Invalid mzML parameters:\n" + "\n".join(errors))
     return mzml_params
 
 
-def check_peak_properties(peak_properties: dict) -> dict:
-    """Summary.
+def check_peak_properties(peak_properties: Union[dict, "PeakTable"]) -> dict:
+    """Fill defaults and validate the peak properties of all molecules.
+
+    Fields are gathered into columns and checked against
+    :py:data:`PEAK_PROPERTIES_SCHEMA` in one pass, all offending molecules
+    are reported together. Only missing fields are written to the
+    molecule dicts.
 
     Args:
-        peak_properties (dict): Description
+        peak_properties (Union[dict, PeakTable]): Description
 
     Returns:
         dict: Description
 
     Raises:
-        Exception: Description
+        Exception: listing every offending field with its molecules
     """
     logger.info("Checking peak properties")
-    for mol, properties in peak_properties.items():
-        for default_param, default_value in default_peak_properties.items():
-            if (properties.get(default_param, None) is None) and (
-                default_value is None
-            ):
-                raise Exception(
-                    f"mzml parameter {default_param} is required by not set!"
-                )
-            elif properties.get(default_param, None) is None:
-                properties[default_param] = default_value
+    if not isinstance(peak_properties, dict):
+        return peak_properties.validate().to_peak_properties()
+    molecules = np.array(list(peak_properties), dtype=object)
+    properties = list(peak_properties.values())
+    errors = {}
+    for default_param, default_value in default_peak_properties.items():
+        missing = np.array(
+            [p.get(default_param, None) is None for p in properties], dtype=bool
+        )
+        if not missing.any():
+            continue
+        if default_value is None:
+            errors[f"{default_param} is required by not set"] = missing
+        else:
+            for n in np.flatnonzero(missing):
+                properties[n][default_param] = default_value
+    for field, rules in PEAK_PROPERTIES_SCHEMA.items():
+        values = [p.get(field, None) for p in properties]
+        if all(v is None for v in values):
+            continue
+        errors.update(_schema_errors(field, values, rules))
+    summary = []
+    for message, mask in errors.items():
+        offending = molecules[mask]
+        if len(offending) == 0:
+            continue
+        shown = ", ".join(str(mol) for mol in offending[:_MAX_REPORTED])
+        if len(offending) > _MAX_REPORTED:
+            shown += f", ... ({len(offending)} molecules)"
+        summary.append(f"{message} for {shown}")
+    if len(summary) > 0:
+        raise Exception("Invalid peak properties:\n" + "\n".join(summary))
     return peak_properties
 
 
 def csv_to_peak_properties(csv_file):
+    """Read peak properties from a csv file.
+
+    Per row peak functions and parameters are supported, see
+    :py:mod:`smiter.peak_table` for the columns and Parquet/Arrow input.
+
+    Args:
+        csv_file (str): path to the csv file
+
+    Returns:
+        dict: peak properties by trivial name
+    """
+    from smiter.peak_table import read_peak_table
+
     logger.info(f"Read peak properties from {csv_file}")
-    peak_properties = {}
-    with open(csv_file) as fin:
-        reader = csv.DictReader(fin)
-        for line_dict in reader:
-            cc = line_dict["chemical_formula"]
-            tn = line_dict["trivial_name"]
-            peak_properties[tn] = {
-                "trivial_name": line_dict["trivial_name"],
-                "chemical_formula": cc,
-                "charge": int(line_dict.get("charge", 2)),
-                "scan_start_time": float(line_dict["scan_start_time"]),
-                # currently only gaussian peaks from csv
-                "peak_function": "gauss_tail",
-                # "peak_function": "gauss",
-                "peak_params": {"sigma": float(line_dict.get("sigma", 2))},
-                "peak_scaling_factor": float(line_dict["peak_scaling_factor"]),
-                "peak_width": float(line_dict.get("peak_width", 30)),
-            }
-    return peak_properties
+    return read_peak_table(csv_file, file_format="csv").to_peak_properties()
 
 
 def peak_properties_to_csv(peak_properties, csv_file):
-    logger.info(f"Write peak properties to {csv_file}")
-    if not isinstance(csv_file, TextIOWrapper):
-        csv_file = open(csv_file, "w")
-    csv_filename = csv_file.name
-    fieldnames = [
-        "chemical_formula",
-        "trivial_name",
-        "charge",
-        "scan_start_time",
-        "peak_width",
-        "peak_scaling_factor",
-        "peak_function",
-        "peak_params",
-    ]
-    writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-    writer.writeheader()
-    for trivial_name, attribs in peak_properties.items():
-        line = {
-            "chemical_formula": peak_properties[trivial_name].get(
-                "chemical_formula", ""
-            ),
-            # "trivial_name": peak_properties[cc].get("trivial_name", ""),
-            "trivial_name": trivial_name,
-            "charge": peak_properties[trivial_name].get("charge", 2),
-            "scan_start_time": peak_properties[trivial_name]["scan_start_time"],
-            "peak_function": peak_properties[trivial_name]["peak_function"],
-            "peak_params": ",".join(
-                [
-                    f"{key}={val}"
-                    for key, val in peak_properties[trivial_name]["peak_params"].items()
-                ]
-            ),
-            "peak_scaling_factor": peak_properties[trivial_name].get(
-                "peak_scaling_factor", 1e3
-            ),
-            "peak_width": peak_properties[trivial_name]["peak_width"],
-        }
-        writer.writerow(line)
-    csv_file.close()
-    return csv_filename
+    """Write peak properties to csv.
+
+    Args:
+        peak_properties (dict): peak properties by trivial name
+        csv_file (Union[str, TextIOWrapper]): path or text file object
+
+    Returns:
+        str: name of the csv file
+    """
+    from smiter.summary import write_molecule_summary
+
+    return write_molecule_summary(csv_file, peak_properties, file_format="csv")
@@ -0,0 +1,142 @@
+"""Metrics of simulation runs.
+
+A :py:class:`MetricsCollector` is passed through
+:py:func:`smiter.synthetic_mzml.write_mzml` and records the wall and CPU time
+of every pipeline stage, counts like scans, peaks, chimeric spectra, dynamic
+exclusion skips and fragment cache hits, and the peak resident memory. The
+report is a plain dict, written as JSON next to the mzML if the
+metrics_report mzML param is set::
+
+    {
+        "stages": {"library": {"wall_seconds": 1.2, "cpu_seconds": 1.1, "calls": 1}},
+        "counts": {"ms1_scans": 240000, "ms2_peaks": 1200000, ...},
+        "throughput": {"scans_per_second": 5100.0, "peaks_per_second": 8e5},
+        "peak_rss": 812646400,
+        ...
+    }
+"""
+
+import contextlib
+import json
+import pathlib
+import sys
+import time
+from typing import Dict, Iterator, Union
+
+from loguru import logger
+
+from smiter.lib import split_path
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+METRICS_SUFFIX = ".metrics.json"
+
+
+def peak_rss() -> int:
+    """Get the peak resident memory of this process.
+
+    Returns:
+        int: bytes, 0 where the resource module is missing
+    """
+    if resource is None:  # pragma: no cover
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def metrics_path(file: Union[str, pathlib.PurePath]) -> str:
+    """Get the report path, e.g. run.metrics.json for run.mzML.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): path of the simulated run
+
+    Returns:
+        str: report path
+    """
+    parent, stem, _ = split_path(file)
+    return str(parent / f"{stem}{METRICS_SUFFIX}")
+
+
+class MetricsCollector(object):
+    """Wall and CPU time per stage and counts of one or more runs."""
+
+    def __init__(self):
+        """Initialize empty metrics."""
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counts: Dict[str, int] = {}
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a stage, repeated stages are summed.
+
+        Args:
+            name (str): stage name
+        """
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.stages.setdefault(
+                name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0}
+            )
+            stats["wall_seconds"] += time.perf_counter() - wall
+            stats["cpu_seconds"] += time.process_time() - cpu
+            stats["calls"] += 1
+
+    def count(self, name: str, n: int = 1):
+        """Add to a counter.
+
+        Args:
+            name (str): counter name
+            n (int, optional): increment
+        """
+        self.counts[name] = self.counts.get(name, 0) + int(n)
+
+    def report(self, **extra) -> dict:
+        """Get all metrics.
+
+        Args:
+            **extra: additional JSON serializable entries, e.g. mzml_params
+
+        Returns:
+            dict: stages, counts, throughput of scan generation, peak_rss in
+                bytes and total_wall_seconds since the collector was created
+        """
+        scans = self.counts.get("ms1_scans", 0) + self.counts.get("ms2_scans", 0)
+        peaks = self.counts.get("ms1_peaks", 0) + self.counts.get("ms2_peaks", 0)
+        seconds = self.stages.get("scans", {}).get("wall_seconds", 0.0)
+        throughput = {}
+        if seconds > 0:
+            throughput = {
+                "scans_per_second": scans / seconds,
+                "peaks_per_second": peaks / seconds,
+            }
+        return dict(
+            stages=self.stages,
+            counts=self.counts,
+            throughput=throughput,
+            peak_rss=peak_rss(),
+            total_wall_seconds=time.perf_counter() - self._start,
+            **extra,
+        )
+
+    def write(self, file: Union[str, pathlib.PurePath], **extra) -> str:
+        """Write the report as JSON.
+
+        Args:
+            file (Union[str, pathlib.PurePath]): report path
+            **extra: additional entries, see :py:meth:`report`
+
+        Returns:
+            str: report path
+        """
+        with open(file, "w") as fout:
+            json.dump(self.report(**extra), fout, indent=2, default=str)
+        logger.info(f"Wrote metrics report {file}")
+        return str(file)
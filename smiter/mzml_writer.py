@@ -0,0 +1,804 @@
+"""Native mzML writer based on pre-rendered XML templates.
+
+The psims based writer resolves every cvParam against the controlled
+vocabulary for each spectrum. Since SMITER only writes a handful of spectrum
+layouts, all constant XML fragments are rendered once and every spectrum is
+emitted by filling values into a byte template. Index offsets and the SHA-1
+checksum are computed while writing, so the resulting file is an indexedmzML
+written in a single pass, also to non-seekable streams like pipes.
+"""
+
+import base64
+import contextlib
+import hashlib
+import io
+import re
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Deque, Dict, Iterable, List, Optional, Tuple, Union
+from xml.sax.saxutils import quoteattr, unescape
+
+import numpy as np
+
+import smiter
+from smiter import numpress
+
+ID_FORMAT = "controllerType=0 controllerNumber=1 scan={i}"
+
+DATA_PROCESSING_ID = "smiter_processing"
+INSTRUMENT_CONFIGURATION_ID = "IC1"
+
+# rendered spectra kept in flight per worker thread
+REORDER_BUFFER_FACTOR = 8
+
+# bytes at the end of an indexedmzML searched for indexListOffset/fileChecksum
+INDEX_TAIL_SIZE = 1024
+
+_INDEX_LIST_OFFSET_RE = re.compile(rb"<indexListOffset>(\d+)</indexListOffset>")
+_INDEX_RE = re.compile(rb'<index name="(\w+)">(.*?)</index>', re.S)
+_OFFSET_RE = re.compile(rb'<offset idRef="([^"]*)">(\d+)</offset>')
+_CHECKSUM_RE = re.compile(rb"<fileChecksum>([0-9a-fA-F]*)</fileChecksum>")
+
+
+def _cv(accession: str, name: str, value: str = "", unit: Tuple[str, str] = None):
+    """Render a single cvParam element.
+
+    Args:
+        accession (str): cv accession, e.g. MS:1000511
+        name (str): cv term name
+        value (str, optional): value attribute
+        unit (Tuple[str, str], optional): unit accession and unit name
+
+    Returns:
+        str: rendered cvParam
+    """
+    cv_ref = accession.split(":")[0]
+    if cv_ref == "MS":
+        cv_ref = "PSI-MS"
+    unit_str = ""
+    if unit is not None:
+        unit_cv_ref = "UO" if unit[0].startswith("UO") else "PSI-MS"
+        unit_str = (
+            f' unitCvRef="{unit_cv_ref}" unitAccession="{unit[0]}" unitName="{unit[1]}"'
+        )
+    return (
+        f'<cvParam cvRef="{cv_ref}" accession="{accession}" name="{name}" '
+        f'value="{value}"{unit_str}/>'
+    )
+
+
+UNIT_SECOND = ("UO:0000010", "second")
+UNIT_MZ = ("MS:1000040", "m/z")
+UNIT_COUNTS = ("MS:1000131", "number of detector counts")
+UNIT_EV = ("UO:0000266", "electronvolt")
+
+ARRAY_TYPES = {
+    "mz": _cv("MS:1000514", "m/z array", unit=UNIT_MZ),
+    "i": _cv("MS:1000515", "intensity array", unit=UNIT_COUNTS),
+    "time": _cv("MS:1000595", "time array", unit=UNIT_SECOND),
+}
+
+# encoding name: (dtype, dtype cvParam, numpress algorithm)
+ENCODINGS: Dict[str, Tuple[np.dtype, str, Optional[str]]] = {
+    "float64": (np.dtype("<f8"), _cv("MS:1000523", "64-bit float"), None),
+    "float32": (np.dtype("<f4"), _cv("MS:1000521", "32-bit float"), None),
+    "numpress_linear": (np.dtype("<f8"), _cv("MS:1000523", "64-bit float"), "linear"),
+    "numpress_pic": (np.dtype("<f8"), _cv("MS:1000523", "64-bit float"), "pic"),
+    "numpress_slof": (np.dtype("<f8"), _cv("MS:1000523", "64-bit float"), "slof"),
+}
+
+# (numpress algorithm, compression): compression cvParam
+COMPRESSIONS = {
+    (None, "zlib"): _cv("MS:1000574", "zlib compression"),
+    (None, "none"): _cv("MS:1000576", "no compression"),
+    ("linear", "none"): _cv("MS:1002312", "MS-Numpress linear prediction compression"),
+    ("pic", "none"): _cv("MS:1002313", "MS-Numpress positive integer compression"),
+    ("slof", "none"): _cv("MS:1002314", "MS-Numpress short logged float compression"),
+    ("linear", "zlib"): _cv(
+        "MS:1002746",
+        "MS-Numpress linear prediction compression followed by zlib compression",
+    ),
+    ("pic", "zlib"): _cv(
+        "MS:1002747",
+        "MS-Numpress positive integer compression followed by zlib compression",
+    ),
+    ("slof", "zlib"): _cv(
+        "MS:1002748",
+        "MS-Numpress short logged float compression followed by zlib compression",
+    ),
+}
+
+# default layout matches the psims backend: 64-bit m/z and 32-bit intensities
+DEFAULT_ENCODINGS = {"mz": "float64", "i": "float32", "time": "float64"}
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>\n'
+_INDEXED_MZML_OPEN = '<indexedmzML xmlns="http://psi.hupo.org/ms/mzml" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://psi.hupo.org/ms/mzml http://psidev.info/files/ms/mzML/xsd/mzML1.1.2_idx.xsd">\n'
+
+_HEADER = (
+    """  <mzML xmlns="http://psi.hupo.org/ms/mzml" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://psi.hupo.org/ms/mzml http://psidev.info/files/ms/mzML/xsd/mzML1.1.0.xsd" version="1.1.0">
+    <cvList count="2">
+      <cv id="PSI-MS" fullName="PSI-MS" URI="https://raw.githubusercontent.com/HUPO-PSI/psi-ms-CV/master/psi-ms.obo"/>
+      <cv id="UO" fullName="UNIT-ONTOLOGY" URI="http://ontologies.berkeleybop.org/uo.obo"/>
+    </cvList>
+    <fileDescription>
+      <fileContent>
+        """
+    + _cv("MS:1000579", "MS1 spectrum")
+    + """
+        """
+    + _cv("MS:1000580", "MSn spectrum")
+    + """
+      </fileContent>
+    </fileDescription>
+    <softwareList count="1">
+      <software id="smiter" version="{version}">
+        """
+    + _cv("MS:1000799", "custom unreleased software tool", "SMITER")
+    + """
+      </software>
+    </softwareList>
+    <instrumentConfigurationList count="1">
+      <instrumentConfiguration id="{ic_id}">
+        """
+    + _cv("MS:1000031", "instrument model")
+    + """
+      </instrumentConfiguration>
+    </instrumentConfigurationList>
+    <dataProcessingList count="1">
+      <dataProcessing id="{dp_id}">
+        <processingMethod order="0" softwareRef="smiter">
+          """
+    + _cv("MS:1000544", "Conversion to mzML")
+    + """
+        </processingMethod>
+      </dataProcessing>
+    </dataProcessingList>
+    <run id="{run_id}" defaultInstrumentConfigurationRef="{ic_id}">
+"""
+)
+
+_SPECTRUM_LIST_OPEN = (
+    '      <spectrumList count="{count}" defaultDataProcessingRef="{dp_id}">\n'
+)
+_SPECTRUM_LIST_CLOSE = "      </spectrumList>\n"
+
+_SPECTRUM_OPEN = (
+    '        <spectrum index="{index}" id="{id}" defaultArrayLength="{length}">\n'
+)
+
+_MS1_PARAMS = (
+    "          "
+    + _cv("MS:1000579", "MS1 spectrum")
+    + "\n          "
+    + _cv("MS:1000511", "ms level", "1")
+    + "\n          "
+    + _cv("MS:1000130", "positive scan")
+    + "\n          "
+    + _cv("MS:1000127", "centroid spectrum")
+    + "\n          "
+    + _cv("MS:1000285", "total ion current", "{tic}")
+    + "\n          "
+    + _cv("MS:1000504", "base peak m/z", "{base_peak_mz}", UNIT_MZ)
+    + "\n          "
+    + _cv("MS:1000505", "base peak intensity", "{base_peak_i}", UNIT_COUNTS)
+    + "\n"
+)
+
+_MSN_PARAMS = (
+    "          "
+    + _cv("MS:1000580", "MSn spectrum")
+    + "\n          "
+    + _cv("MS:1000511", "ms level", "{ms_level}")
+    + "\n          "
+    + _cv("MS:1000130", "positive scan")
+    + "\n          "
+    + _cv("MS:1000127", "centroid spectrum")
+    + "\n          "
+    + _cv("MS:1000285", "total ion current", "{tic}")
+    + "\n"
+)
+
+_SCAN_LIST = (
+    """          <scanList count="1">
+            """
+    + _cv("MS:1000795", "no combination")
+    + """
+            <scan>
+              """
+    + _cv("MS:1000016", "scan start time", "{rt}", UNIT_SECOND)
+    + """
+            </scan>
+          </scanList>
+"""
+)
+
+_PRECURSOR_LIST = (
+    """          <precursorList count="1">
+            <precursor spectrumRef="{precursor_id}">
+              <selectedIonList count="1">
+                <selectedIon>
+                  """
+    + _cv("MS:1000744", "selected ion m/z", "{precursor_mz}", UNIT_MZ)
+    + """
+                  """
+    + _cv("MS:1000042", "peak intensity", "{precursor_i}", UNIT_COUNTS)
+    + """
+                  """
+    + _cv("MS:1000041", "charge state", "{precursor_charge}")
+    + """
+                </selectedIon>
+              </selectedIonList>
+              <activation>
+                """
+    + _cv("MS:1000422", "beam-type collision-induced dissociation")
+    + """
+                """
+    + _cv("MS:1000045", "collision energy", "25.0", UNIT_EV)
+    + """
+              </activation>
+            </precursor>
+          </precursorList>
+"""
+)
+
+_BINARY_ARRAY_LIST_OPEN = '{indent}<binaryDataArrayList count="2">\n'
+_BINARY_ARRAY_LIST_CLOSE = "{indent}</binaryDataArrayList>\n"
+_BINARY_ARRAY = (
+    '{indent}  <binaryDataArray encodedLength="{{encoded_length}}">\n'
+    "{indent}    {array_type}\n"
+    "{indent}    {compression}\n"
+    "{indent}    {dtype}\n"
+    "{indent}    <binary>{{binary}}</binary>\n"
+    "{indent}  </binaryDataArray>\n"
+)
+
+_SPECTRUM_CLOSE = "        </spectrum>\n"
+
+_CHROMATOGRAM_LIST_OPEN = (
+    '      <chromatogramList count="{count}" defaultDataProcessingRef="{dp_id}">\n'
+)
+_CHROMATOGRAM_LIST_CLOSE = "      </chromatogramList>\n"
+_CHROMATOGRAM_OPEN = (
+    '        <chromatogram index="{index}" id={id} defaultArrayLength="{length}">\n'
+    "          {chromatogram_type}\n"
+)
+_CHROMATOGRAM_CLOSE = "        </chromatogram>\n"
+
+CHROMATOGRAM_TYPES = {
+    "total ion current": _cv("MS:1000235", "total ion current chromatogram"),
+    "selected ion current": _cv("MS:1000627", "selected ion current chromatogram"),
+}
+
+_RUN_CLOSE = "    </run>\n  </mzML>\n"
+
+
+def _fmt(value) -> str:
+    """Format a numeric cvParam value the way psims does.
+
+    Args:
+        value (TYPE): int or float like value
+
+    Returns:
+        str: formatted value
+    """
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    return repr(float(value))
+
+
+def encode_array(array, encoding: str = "float64", compression: str = "zlib") -> bytes:
+    """Encode an array as base64 string as used in mzML binary elements.
+
+    Args:
+        array (np.ndarray): values to encode
+        encoding (str, optional): float64, float32, numpress_linear,
+            numpress_pic or numpress_slof
+        compression (str, optional): zlib or none, applied after numpress
+
+    Returns:
+        bytes: base64 encoded array
+    """
+    dtype, _, numpress_algorithm = ENCODINGS[encoding]
+    if numpress_algorithm is None:
+        raw = np.asarray(array, dtype=dtype).tobytes()
+    else:
+        raw = numpress.ENCODERS[numpress_algorithm](np.asarray(array, dtype=dtype))
+    if compression == "zlib":
+        raw = zlib.compress(raw)
+    return base64.b64encode(raw)
+
+
+def decode_array(
+    binary: bytes, encoding: str = "float64", compression: str = "zlib"
+) -> np.ndarray:
+    """Decode an array encoded by :py:func:`encode_array`.
+
+    Args:
+        binary (bytes): base64 encoded array
+        encoding (str, optional): encoding used to write the array
+        compression (str, optional): compression used to write the array
+
+    Returns:
+        np.ndarray: decoded values
+    """
+    dtype, _, numpress_algorithm = ENCODINGS[encoding]
+    raw = base64.b64decode(binary)
+    if compression == "zlib":
+        raw = zlib.decompress(raw)
+    if numpress_algorithm is None:
+        return np.frombuffer(raw, dtype=dtype).astype(np.float64)
+    return numpress.DECODERS[numpress_algorithm](raw)
+
+
+def encoding_accuracy_report(
+    scans: List[Tuple[object, List[object]]],
+    encodings: Dict[str, str] = None,
+    compression: str = "zlib",
+) -> Dict[str, dict]:
+    """Round-trip all arrays of the given scans and summarize the error.
+
+    Args:
+        scans (List[Tuple[object, List[object]]]): MS1 scans and their products
+        encodings (Dict[str, str], optional): encoding for mz and i arrays
+        compression (str, optional): zlib or none
+
+    Returns:
+        Dict[str, dict]: for mz and i the encoding, the maximal absolute and
+            relative error, the number of encoded bytes and the compression
+            ratio compared to uncompressed 64-bit floats
+    """
+    _encodings = dict(DEFAULT_ENCODINGS)
+    if encodings is not None:
+        _encodings.update(encodings)
+    report = {}
+    for array_name in ("mz", "i"):
+        max_abs_error = 0.0
+        max_rel_error = 0.0
+        n_values = 0
+        n_bytes = 0
+        for scan, products in scans:
+            for spec in [scan] + list(products):
+                array = np.asarray(getattr(spec, array_name), dtype=np.float64)
+                binary = encode_array(array, _encodings[array_name], compression)
+                decoded = decode_array(binary, _encodings[array_name], compression)
+                n_values += len(array)
+                n_bytes += len(binary)
+                if len(array) == 0:
+                    continue
+                abs_error = np.abs(decoded - array)
+                max_abs_error = max(max_abs_error, float(abs_error.max()))
+                nonzero = array != 0
+                if nonzero.any():
+                    rel_error = abs_error[nonzero] / np.abs(array[nonzero])
+                    max_rel_error = max(max_rel_error, float(rel_error.max()))
+        report[array_name] = {
+            "encoding": _encodings[array_name],
+            "compression": compression,
+            "max_abs_error": max_abs_error,
+            "max_rel_error": max_rel_error,
+            "encoded_bytes": n_bytes,
+            "compression_ratio": (n_values * 8 * 4 / 3) / n_bytes if n_bytes else 0.0,
+        }
+    return report
+
+
+class MzMLTemplateWriter(object):
+    """Write indexed mzML files from pre-rendered templates.
+
+    Mirrors the document produced by the psims backend of
+    :py:func:`smiter.synthetic_mzml.write_scans` but writes bytes directly.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, BinaryIO],
+        encodings: Dict[str, str] = None,
+        compression: str = "zlib",
+        run_id: str = "simulated_run",
+        n_jobs: int = 1,
+    ):
+        """Initialize writer.
+
+        Args:
+            file (Union[str, BinaryIO]): path or binary file object
+            encodings (Dict[str, str], optional): encoding for mz, i and time
+                arrays, see :py:data:`ENCODINGS`
+            compression (str, optional): binary compression, zlib or none
+            run_id (str, optional): id of the run element
+            n_jobs (int, optional): number of threads used to encode spectra
+        """
+        self._close_file = False
+        self.file = self._open(file)
+        self.encodings = dict(DEFAULT_ENCODINGS)
+        if encodings is not None:
+            self.encodings.update(encodings)
+        self.compression = compression
+        self.run_id = run_id
+        self.n_jobs = n_jobs
+        self.offset = 0
+        self.spectrum_offsets: List[Tuple[str, int]] = []
+        self.chromatogram_offsets: List[Tuple[str, int]] = []
+        self._hash = hashlib.sha1()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._reorder_buffer: Deque[Future] = deque()
+        self._templates = self._render_templates()
+
+    def _open(self, file: Union[str, BinaryIO]) -> BinaryIO:
+        """Open the output file.
+
+        Args:
+            file (Union[str, BinaryIO]): path or file object
+
+        Returns:
+            BinaryIO: binary file object
+        """
+        if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+            self._close_file = True
+            return open(file, "wb")
+        if isinstance(file, io.TextIOBase):
+            return file.buffer
+        return file
+
+    def _render_templates(self) -> Dict[str, str]:
+        """Render all constant parts of the document once.
+
+        Returns:
+            Dict[str, str]: templates by name
+        """
+        templates = {
+            "bdal_open": _BINARY_ARRAY_LIST_OPEN.format(indent=" " * 10),
+            "bdal_close": _BINARY_ARRAY_LIST_CLOSE.format(indent=" " * 10),
+        }
+        for array_name in ARRAY_TYPES:
+            templates[f"array_{array_name}"] = _BINARY_ARRAY.format(
+                indent=" " * 10,
+                array_type=ARRAY_TYPES[array_name],
+                compression=COMPRESSIONS[
+                    (ENCODINGS[self.encodings[array_name]][2], self.compression)
+                ],
+                dtype=ENCODINGS[self.encodings[array_name]][1],
+            )
+        templates["ms1"] = _SPECTRUM_OPEN + _MS1_PARAMS + _SCAN_LIST
+        templates["msn"] = _SPECTRUM_OPEN + _MSN_PARAMS + _SCAN_LIST + _PRECURSOR_LIST
+        return templates
+
+    def __enter__(self):
+        """Enter context."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Finish document and close file if opened by the writer."""
+        if exc_type is None:
+            self.close()
+            return
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self._close_file:
+            self.file.close()
+
+    def _write(self, data: bytes):
+        self.file.write(data)
+        self._hash.update(data)
+        self.offset += len(data)
+
+    def _encode(self, array, array_name: str) -> bytes:
+        return encode_array(array, self.encodings[array_name], self.compression)
+
+    def _binary_arrays(self, arrays: List[Tuple[str, np.ndarray]]) -> str:
+        """Render a binaryDataArrayList.
+
+        Args:
+            arrays (List[Tuple[str, np.ndarray]]): array name and values
+
+        Returns:
+            str: rendered binaryDataArrayList
+        """
+        parts = [self._templates["bdal_open"]]
+        for array_name, array in arrays:
+            binary = self._encode(array, array_name)
+            parts.append(
+                self._templates[f"array_{array_name}"].format(
+                    encoded_length=len(binary), binary=binary.decode("ascii")
+                )
+            )
+        parts.append(self._templates["bdal_close"])
+        return "".join(parts)
+
+    def _chromatogram_arrays(self, arrays: List[Tuple[str, np.ndarray]]) -> str:
+        """Render the binaryDataArrayList of a chromatogram.
+
+        Args:
+            arrays (List[Tuple[str, np.ndarray]]): array name and values
+
+        Returns:
+            str: rendered binaryDataArrayList
+        """
+        return self._binary_arrays(arrays)
+
+    def write_header(self, spectrum_count: int):
+        """Write everything up to the opening spectrumList element.
+
+        Args:
+            spectrum_count (int): number of spectra that will be written
+        """
+        header = (
+            _XML_DECLARATION
+            + _INDEXED_MZML_OPEN
+            + _HEADER.format(
+                version=smiter.__version__,
+                ic_id=INSTRUMENT_CONFIGURATION_ID,
+                dp_id=DATA_PROCESSING_ID,
+                run_id=self.run_id,
+            )
+            + _SPECTRUM_LIST_OPEN.format(count=spectrum_count, dp_id=DATA_PROCESSING_ID)
+        )
+        self._write(header.encode("utf-8"))
+
+    def _render_spectrum(
+        self, scan, index: int, precursor_id: str = None
+    ) -> Tuple[str, bytes]:
+        """Render a single MS1 or MSn spectrum including its encoded arrays.
+
+        Rendering does not touch any writer state, so it can run in worker
+        threads.
+
+        Args:
+            scan (Scan): scan to render, MSn scans need precursor attributes
+            index (int): position of the spectrum in the spectrum list
+            precursor_id (str, optional): native id of the precursor spectrum
+
+        Returns:
+            Tuple[str, bytes]: native id and spectrum xml
+        """
+        spec_id = ID_FORMAT.format(i=scan.id)
+        mz = scan.mz
+        i = scan.i
+        values = {
+            "index": index,
+            "id": spec_id,
+            "length": len(mz),
+            "rt": _fmt(scan.retention_time),
+            "tic": _fmt(np.sum(i)) if len(i) > 0 else "0.0",
+        }
+        if precursor_id is None:
+            if len(i) > 0:
+                index_of_max_i = np.argmax(i)
+                values["base_peak_mz"] = _fmt(mz[index_of_max_i])
+                values["base_peak_i"] = _fmt(i[index_of_max_i])
+            else:
+                values["base_peak_mz"] = 0
+                values["base_peak_i"] = 0
+            template = self._templates["ms1"]
+        else:
+            values["ms_level"] = getattr(scan, "ms_level", None) or 2
+            values["precursor_id"] = precursor_id
+            values["precursor_mz"] = _fmt(scan.precursor_mz)
+            values["precursor_i"] = _fmt(scan.precursor_i)
+            values["precursor_charge"] = int(scan.precursor_charge)
+            template = self._templates["msn"]
+        xml = (
+            template.format(**values)
+            + self._binary_arrays([("mz", mz), ("i", i)])
+            + _SPECTRUM_CLOSE
+        )
+        return spec_id, xml.encode("utf-8")
+
+    def _write_rendered_spectrum(self, spec_id: str, xml: bytes):
+        # index offsets point to the opening tag, not the indentation
+        self.spectrum_offsets.append((spec_id, self.offset + xml.find(b"<")))
+        self._write(xml)
+
+    def write_spectrum_xml(self, spec_id: str, xml: bytes):
+        """Write an already rendered spectrum, e.g. copied from another file.
+
+        Args:
+            spec_id (str): native id of the spectrum
+            xml (bytes): spectrum element, its index attribute has to match
+                the position in this spectrum list
+        """
+        self.drain()
+        self._write_rendered_spectrum(spec_id, xml)
+
+    def write_spectrum(self, scan, precursor_id: str = None):
+        """Write a single MS1 or MSn spectrum.
+
+        Args:
+            scan (Scan): scan to write, MSn scans need precursor attributes
+            precursor_id (str, optional): native id of the precursor spectrum
+        """
+        self._write_rendered_spectrum(
+            *self._render_spectrum(scan, len(self.spectrum_offsets), precursor_id)
+        )
+
+    def write_spectra(self, spectra: Iterable[Tuple[object, Optional[str]]]):
+        """Write spectra, encoding them on a thread pool if n_jobs > 1.
+
+        zlib releases the GIL, so rendering spectra in threads scales with the
+        number of cores. Rendered spectra are kept in a bounded reorder buffer
+        and written in input order, the output is byte-identical to calling
+        :py:meth:`write_spectrum` for every spectrum.
+
+        Args:
+            spectra (Iterable[Tuple[object, Optional[str]]]): scans and the
+                native id of their precursor (None for MS1 scans)
+        """
+        for scan, precursor_id in spectra:
+            self.submit_spectrum(scan, precursor_id=precursor_id)
+        self.drain()
+
+    def submit_spectrum(self, scan, precursor_id: str = None):
+        """Queue a spectrum, encoding it on the thread pool if n_jobs > 1.
+
+        Spectra are written in submission order, call :py:meth:`drain` to
+        wait until all submitted spectra are written.
+
+        Args:
+            scan (Scan): scan to write, MSn scans need precursor attributes
+            precursor_id (str, optional): native id of the precursor spectrum
+        """
+        if self.n_jobs <= 1:
+            self.write_spectrum(scan, precursor_id=precursor_id)
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.n_jobs)
+        index = len(self.spectrum_offsets) + len(self._reorder_buffer)
+        self._reorder_buffer.append(
+            self._executor.submit(self._render_spectrum, scan, index, precursor_id)
+        )
+        if len(self._reorder_buffer) >= self.n_jobs * REORDER_BUFFER_FACTOR:
+            self._write_rendered_spectrum(*self._reorder_buffer.popleft().result())
+
+    def drain(self):
+        """Write all submitted spectra and stop the thread pool."""
+        while len(self._reorder_buffer) > 0:
+            self._write_rendered_spectrum(*self._reorder_buffer.popleft().result())
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def write_chromatograms(
+        self, chromatograms: List[Tuple[str, np.ndarray, np.ndarray, str]]
+    ):
+        """Close the spectrum list and write all chromatograms.
+
+        Args:
+            chromatograms (List[Tuple[str, np.ndarray, np.ndarray, str]]): id,
+                time array, intensity array and chromatogram type for each
+                chromatogram
+        """
+        self.drain()
+        parts = [_SPECTRUM_LIST_CLOSE]
+        if len(chromatograms) > 0:
+            parts.append(
+                _CHROMATOGRAM_LIST_OPEN.format(
+                    count=len(chromatograms), dp_id=DATA_PROCESSING_ID
+                )
+            )
+        self._write("".join(parts).encode("utf-8"))
+        for chrom_id, time_array, intensity_array, chrom_type in chromatograms:
+            xml = (
+                _CHROMATOGRAM_OPEN.format(
+                    index=len(self.chromatogram_offsets),
+                    id=quoteattr(chrom_id),
+                    length=len(time_array),
+                    chromatogram_type=CHROMATOGRAM_TYPES[chrom_type],
+                )
+                + self._chromatogram_arrays(
+                    [("time", time_array), ("i", intensity_array)]
+                )
+                + _CHROMATOGRAM_CLOSE
+            )
+            self._write_rendered_chromatogram(chrom_id, xml.encode("utf-8"))
+        if len(chromatograms) > 0:
+            self._write(_CHROMATOGRAM_LIST_CLOSE.encode("utf-8"))
+
+    def _write_rendered_chromatogram(self, chrom_id: str, xml: bytes):
+        self.chromatogram_offsets.append((chrom_id, self.offset + xml.find(b"<")))
+        self._write(xml)
+
+    def close(self):
+        """Write run closing tags, index and checksum."""
+        self._write(_RUN_CLOSE.encode("utf-8"))
+        index_list_offset = self.offset
+        parts = ['  <indexList count="2">\n']
+        for name, offsets in (
+            ("spectrum", self.spectrum_offsets),
+            ("chromatogram", self.chromatogram_offsets),
+        ):
+            parts.append(f'    <index name="{name}">\n')
+            for ref_id, offset in offsets:
+                parts.append(
+                    f"      <offset idRef={quoteattr(ref_id)}>{offset}</offset>\n"
+                )
+            parts.append("    </index>\n")
+        parts.append("  </indexList>\n")
+        parts.append(f"  <indexListOffset>{index_list_offset}</indexListOffset>\n")
+        parts.append("  <fileChecksum>")
+        self._write("".join(parts).encode("utf-8"))
+        # checksum covers everything up to and including the opening tag
+        checksum = self._hash.hexdigest()
+        self._write(f"{checksum}</fileChecksum>\n</indexedmzML>\n".encode("utf-8"))
+        self.file.flush()
+        if self._close_file:
+            self.file.close()
+
+
+def _open_binary(file: Union[str, BinaryIO]):
+    if hasattr(file, "read"):
+        return contextlib.nullcontext(file)
+    return open(file, "rb")
+
+
+def _read_tail(fin: BinaryIO) -> Tuple[int, bytes]:
+    fin.seek(0, io.SEEK_END)
+    size = fin.tell()
+    start = max(0, size - INDEX_TAIL_SIZE)
+    fin.seek(start)
+    return start, fin.read()
+
+
+def read_index(file: Union[str, BinaryIO]) -> Dict[str, Dict[str, int]]:
+    """Read the offset index of an indexedmzML file.
+
+    Only the end of the file and the indexList are read, so looking up a
+    spectrum by id does not require parsing the run.
+
+    Args:
+        file (Union[str, BinaryIO]): path to an indexedmzML file or seekable
+            binary file object, e.g. a
+            :py:class:`smiter.parallel_gzip.GzipBlockReader`
+
+    Raises:
+        Exception: if the file has no indexListOffset
+
+    Returns:
+        Dict[str, Dict[str, int]]: byte offset by id for the spectrum and
+            chromatogram index
+    """
+    with _open_binary(file) as fin:
+        _, tail = _read_tail(fin)
+        match = _INDEX_LIST_OFFSET_RE.search(tail)
+        if match is None:
+            raise Exception(f"{file} is not an indexedmzML file")
+        fin.seek(int(match.group(1)))
+        index_list = fin.read()
+    index = {}
+    for name, body in _INDEX_RE.findall(index_list):
+        index[name.decode("utf-8")] = {
+            unescape(ref_id.decode("utf-8"), {"&quot;": '"'}): int(offset)
+            for ref_id, offset in _OFFSET_RE.findall(body)
+        }
+    return index
+
+
+def verify_checksum(file: Union[str, BinaryIO], chunk_size: int = 2**20) -> bool:
+    """Check the SHA-1 fileChecksum of an indexedmzML file.
+
+    Args:
+        file (Union[str, BinaryIO]): path to an indexedmzML file or seekable
+            binary file object
+        chunk_size (int, optional): bytes read at once
+
+    Raises:
+        Exception: if the file has no fileChecksum
+
+    Returns:
+        bool: True if the checksum matches the file content
+    """
+    with _open_binary(file) as fin:
+        tail_start, tail = _read_tail(fin)
+        match = _CHECKSUM_RE.search(tail)
+        if match is None:
+            raise Exception(f"{file} has no fileChecksum")
+        # checksum covers everything up to and including the opening tag
+        remaining = tail_start + match.start(1)
+        file_hash = hashlib.sha1()
+        fin.seek(0)
+        while remaining > 0:
+            chunk = fin.read(min(chunk_size, remaining))
+            if len(chunk) == 0:
+                break
+            file_hash.update(chunk)
+            remaining -= len(chunk)
+    return file_hash.hexdigest() == match.group(1).decode("ascii").lower()
@@ -0,0 +1,329 @@
+"""mzMLb writer.
+
+mzMLb (Bhamber et al., 2021) stores the mzML document without binary data as
+a byte dataset in an HDF5 file. Binary arrays are appended to chunked,
+compressed HDF5 datasets and referenced from the XML by dataset name, offset
+and length, which allows chunked random access and parallel reads.
+"""
+
+import io
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+import smiter
+from smiter.mzml_writer import (
+    _HEADER,
+    _RUN_CLOSE,
+    _SPECTRUM_LIST_OPEN,
+    _XML_DECLARATION,
+    ARRAY_TYPES,
+    COMPRESSIONS,
+    DATA_PROCESSING_ID,
+    ENCODINGS,
+    INSTRUMENT_CONFIGURATION_ID,
+    MzMLTemplateWriter,
+    _cv,
+)
+
+try:
+    import h5py
+except ImportError:  # pragma: no cover
+    h5py = None
+
+MZMLB_VERSION = "mzMLb 1.0"
+
+ARRAY_ACCESSIONS = {"mz": "MS:1000514", "i": "MS:1000515", "time": "MS:1000595"}
+
+# number of values per HDF5 chunk, for arrays and the xml bytes alike
+DEFAULT_CHUNK_SIZE = 2**16
+
+_EXTERNAL_BINARY_ARRAY = (
+    '{indent}  <binaryDataArray encodedLength="0">\n'
+    "{indent}    {array_type}\n"
+    "{indent}    {compression}\n"
+    "{indent}    {dtype}\n"
+    "{indent}    "
+    + _cv("MS:1002841", "external HDF5 dataset", "{{dataset}}")
+    + "\n{indent}    "
+    + _cv("MS:1002842", "external offset", "{{offset}}")
+    + "\n{indent}    "
+    + _cv("MS:1002843", "external array length", "{{length}}")
+    + "\n{indent}    <binary/>\n"
+    "{indent}  </binaryDataArray>\n"
+)
+
+
+class _ChunkedDataset(object):
+    """Append only one dimensional HDF5 dataset.
+
+    Appended values are buffered and written in blocks of at least one chunk,
+    since resizing the dataset for every spectrum is slow.
+    """
+
+    def __init__(
+        self, h5_file, name: str, dtype, chunk_size: int, compression: str = "zlib"
+    ):
+        """Initialize dataset.
+
+        Args:
+            h5_file (h5py.File): file to create the dataset in
+            name (str): dataset name
+            dtype (TYPE): numpy dtype of the values
+            chunk_size (int): number of values per chunk
+            compression (str, optional): zlib or none
+        """
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.length = 0
+        self._pending: List[np.ndarray] = []
+        self._pending_length = 0
+        self.dataset = h5_file.create_dataset(
+            name,
+            shape=(0,),
+            maxshape=(None,),
+            dtype=self.dtype,
+            chunks=(chunk_size,),
+            compression="gzip" if compression == "zlib" else None,
+        )
+
+    def append(self, values) -> int:
+        """Append values to the dataset.
+
+        Args:
+            values (np.ndarray): values to append
+
+        Returns:
+            int: offset of the first appended value
+        """
+        offset = self.length
+        values = np.asarray(values, dtype=self.dtype)
+        self._pending.append(values)
+        self._pending_length += len(values)
+        self.length += len(values)
+        if self._pending_length >= self.chunk_size:
+            self.flush()
+        return offset
+
+    def flush(self):
+        """Write all buffered values."""
+        if self._pending_length == 0:
+            self._pending = []
+            return
+        data = np.concatenate(self._pending)
+        start = self.dataset.shape[0]
+        self.dataset.resize((start + len(data),))
+        self.dataset[start:] = data
+        self._pending = []
+        self._pending_length = 0
+
+
+class MzMLbWriter(MzMLTemplateWriter):
+    """Write mzMLb files.
+
+    Uses the templates of :py:class:`smiter.mzml_writer.MzMLTemplateWriter`,
+    but binary elements reference external HDF5 datasets. Compression is done
+    by the HDF5 gzip filter, so only float64 and float32 encodings are
+    supported and spectra are always written by a single thread.
+    """
+
+    # h5py.File returned by _open
+    file: Any
+
+    def __init__(
+        self,
+        file: Union[str, BinaryIO],
+        encodings: Dict[str, str] = None,
+        compression: str = "zlib",
+        run_id: str = "simulated_run",
+        n_jobs: int = 1,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        """Initialize writer.
+
+        Args:
+            file (Union[str, BinaryIO]): path or readable and seekable binary
+                file object
+            encodings (Dict[str, str], optional): encoding for mz, i and time
+                arrays, float64 or float32
+            compression (str, optional): HDF5 compression, zlib or none
+            run_id (str, optional): id of the run element
+            n_jobs (int, optional): ignored, arrays are written serially
+            chunk_size (int, optional): number of values per HDF5 chunk
+        """
+        if h5py is None:
+            raise Exception("h5py is required to write mzMLb files")
+        for array_name, encoding in (encodings or {}).items():
+            if ENCODINGS[encoding][2] is not None:
+                raise Exception(
+                    f"Encoding {encoding} of {array_name} is not supported by mzMLb"
+                )
+        self.chunk_size = chunk_size
+        self._datasets: Dict[Tuple[str, str], _ChunkedDataset] = {}
+        self._spectrum_end: Optional[int] = None
+        self._chromatogram_end: Optional[int] = None
+        super().__init__(
+            file,
+            encodings=encodings,
+            compression=compression,
+            run_id=run_id,
+            n_jobs=1,
+        )
+        self._xml = _ChunkedDataset(
+            self.file, "mzML", np.uint8, chunk_size, compression
+        )
+        self._xml.dataset.attrs["version"] = MZMLB_VERSION
+
+    def _open(self, file: Union[str, BinaryIO]):
+        """Open the HDF5 file.
+
+        Args:
+            file (Union[str, BinaryIO]): path or file object
+
+        Returns:
+            h5py.File: opened file
+        """
+        if isinstance(file, io.TextIOWrapper):
+            file = file.buffer
+        # the HDF5 handle is always closed, h5py leaves file objects open
+        self._close_file = True
+        return h5py.File(file, "w")
+
+    def _render_templates(self) -> Dict[str, str]:
+        """Render all constant parts of the document once.
+
+        Returns:
+            Dict[str, str]: templates by name
+        """
+        templates = super()._render_templates()
+        for array_name in ARRAY_TYPES:
+            templates[f"array_{array_name}"] = _EXTERNAL_BINARY_ARRAY.format(
+                indent=" " * 10,
+                array_type=ARRAY_TYPES[array_name],
+                compression=COMPRESSIONS[(None, "none")],
+                dtype=ENCODINGS[self.encodings[array_name]][1],
+            )
+        return templates
+
+    def _dataset(self, kind: str, array_name: str) -> _ChunkedDataset:
+        """Get or create the dataset holding arrays of the given type.
+
+        Dataset names follow the mzMLb convention, e.g.
+        spectrum_MS_1000514_float64.
+
+        Args:
+            kind (str): spectrum or chromatogram
+            array_name (str): mz, i or time
+
+        Returns:
+            _ChunkedDataset: dataset
+        """
+        key = (kind, array_name)
+        if key not in self._datasets:
+            dtype = ENCODINGS[self.encodings[array_name]][0]
+            name = "{0}_{1}_{2}".format(
+                kind, ARRAY_ACCESSIONS[array_name].replace(":", "_"), dtype.name
+            )
+            self._datasets[key] = _ChunkedDataset(
+                self.file, name, dtype, self.chunk_size, self.compression
+            )
+        return self._datasets[key]
+
+    def _write(self, data: bytes):
+        self._xml.append(np.frombuffer(data, dtype=np.uint8))
+        self.offset += len(data)
+
+    def _binary_arrays(
+        self, arrays: List[Tuple[str, np.ndarray]], kind: str = "spectrum"
+    ) -> str:
+        """Append arrays to their datasets and render the references.
+
+        Args:
+            arrays (List[Tuple[str, np.ndarray]]): array name and values
+            kind (str, optional): spectrum or chromatogram
+
+        Returns:
+            str: rendered binaryDataArrayList
+        """
+        parts = [self._templates["bdal_open"]]
+        for array_name, array in arrays:
+            dataset = self._dataset(kind, array_name)
+            offset = dataset.append(array)
+            parts.append(
+                self._templates[f"array_{array_name}"].format(
+                    dataset=dataset.name, offset=offset, length=len(array)
+                )
+            )
+        parts.append(self._templates["bdal_close"])
+        return "".join(parts)
+
+    def _chromatogram_arrays(self, arrays: List[Tuple[str, np.ndarray]]) -> str:
+        """Append chromatogram arrays to their datasets and render the references.
+
+        Args:
+            arrays (List[Tuple[str, np.ndarray]]): array name and values
+
+        Returns:
+            str: rendered binaryDataArrayList
+        """
+        return self._binary_arrays(arrays, kind="chromatogram")
+
+    def write_header(self, spectrum_count: int):
+        """Write everything up to the opening spectrumList element.
+
+        Args:
+            spectrum_count (int): number of spectra that will be written
+        """
+        header = (
+            _XML_DECLARATION
+            + _HEADER.format(
+                version=smiter.__version__,
+                ic_id=INSTRUMENT_CONFIGURATION_ID,
+                dp_id=DATA_PROCESSING_ID,
+                run_id=self.run_id,
+            )
+            + _SPECTRUM_LIST_OPEN.format(count=spectrum_count, dp_id=DATA_PROCESSING_ID)
+        )
+        self._write(header.encode("utf-8"))
+
+    def _write_rendered_spectrum(self, spec_id: str, xml: bytes):
+        super()._write_rendered_spectrum(spec_id, xml)
+        self._spectrum_end = self.offset
+
+    def _write_rendered_chromatogram(self, chrom_id: str, xml: bytes):
+        super()._write_rendered_chromatogram(chrom_id, xml)
+        self._chromatogram_end = self.offset
+
+    def _write_index(self, name: str, offsets: List[Tuple[str, int]], end: int):
+        """Write the offset and id datasets of an index.
+
+        The offset dataset holds one entry more than there are elements, the
+        last one pointing to the end of the last element.
+
+        Args:
+            name (str): spectrum or chromatogram
+            offsets (List[Tuple[str, int]]): id and offset of every element
+            end (int): offset after the last element
+        """
+        positions = [offset for _, offset in offsets]
+        positions.append(end if end is not None else self.offset)
+        self.file.create_dataset(
+            f"mzML_{name}Index", data=np.array(positions, dtype=np.int64)
+        )
+        ids = b"".join(ref_id.encode("utf-8") + b"\x00" for ref_id, _ in offsets)
+        self.file.create_dataset(
+            f"mzML_{name}Index_idRef", data=np.frombuffer(ids, dtype=np.uint8)
+        )
+
+    def close(self):
+        """Write run closing tags, flush all datasets and write the index."""
+        self._write(_RUN_CLOSE.encode("utf-8"))
+        self._xml.flush()
+        for dataset in self._datasets.values():
+            dataset.flush()
+        self._write_index("spectrum", self.spectrum_offsets, self._spectrum_end)
+        self._write_index(
+            "chromatogram", self.chromatogram_offsets, self._chromatogram_end
+        )
+        self.file.close()
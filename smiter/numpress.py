@@ -0,0 +1,263 @@
+"""MS-Numpress encoders and decoders.
+
+numpy implementation of the linear, pic and slof algorithms of MS-Numpress
+(Teleman et al., 2014), compatible with the reference C++ implementation.
+If pynumpress is installed, it is used for encoding instead.
+"""
+
+import math
+import struct
+
+import numpy as np
+
+try:
+    import pynumpress
+except ImportError:  # pragma: no cover
+    pynumpress = None
+
+
+def optimal_linear_fixed_point(data: np.ndarray) -> float:
+    """Calculate the fixed point for numpress linear encoding.
+
+    Args:
+        data (np.ndarray): values to encode
+
+    Returns:
+        float: fixed point
+    """
+    if len(data) == 0:
+        return 0.0
+    if len(data) == 1:
+        return math.floor(0x7FFFFFFF / data[0])
+    max_double = max(data[0], data[1])
+    if len(data) > 2:
+        extrapol = data[1:-1] + (data[1:-1] - data[:-2])
+        diff = data[2:] - extrapol
+        max_double = max(max_double, np.max(np.ceil(np.abs(diff) + 1)))
+    return math.floor(0x7FFFFFFF / max_double)
+
+
+def optimal_slof_fixed_point(data: np.ndarray) -> float:
+    """Calculate the fixed point for numpress slof encoding.
+
+    Args:
+        data (np.ndarray): values to encode
+
+    Returns:
+        float: fixed point
+    """
+    if len(data) == 0:
+        return 0.0
+    max_double = max(1, np.max(np.log(data + 1)))
+    return math.floor(0xFFFF / max_double)
+
+
+def _encode_ints(values: np.ndarray) -> np.ndarray:
+    """Encode 32 bit integers as truncated half bytes.
+
+    Each integer is stored as a count half byte followed by its significant
+    half bytes, least significant first. Leading 0x0 (count 0-8) or 0xf
+    (count 9-15) half bytes are dropped.
+
+    Args:
+        values (np.ndarray): int64 values within the int32 or uint32 range
+
+    Returns:
+        np.ndarray: half bytes (uint8)
+    """
+    x = values.astype(np.int64) & 0xFFFFFFFF
+    shifts = np.arange(8, dtype=np.int64) * 4
+    nibbles = ((x[:, None] >> shifts[None, :]) & 0xF).astype(np.uint8)
+    # count leading zero / 0xf half bytes, starting at the most significant one
+    from_top = nibbles[:, ::-1]
+    leading_zeros = np.argmax(from_top != 0x0, axis=1)
+    leading_zeros[(from_top == 0x0).all(axis=1)] = 8
+    leading_ones = np.argmax(from_top != 0xF, axis=1)
+    leading_ones[(from_top == 0xF).all(axis=1)] = 7
+    top = from_top[:, 0]
+    count = np.zeros(len(x), dtype=np.int64)
+    head = np.zeros(len(x), dtype=np.uint8)
+    zero_mask = top == 0x0
+    ones_mask = top == 0xF
+    count[zero_mask] = leading_zeros[zero_mask]
+    head[zero_mask] = leading_zeros[zero_mask]
+    count[ones_mask] = leading_ones[ones_mask]
+    head[ones_mask] = leading_ones[ones_mask] + 8
+
+    half_bytes = np.concatenate([head[:, None], nibbles], axis=1)
+    keep = np.arange(9)[None, :] < (9 - count)[:, None]
+    return half_bytes[keep]
+
+
+def _pack_half_bytes(half_bytes: np.ndarray) -> bytes:
+    if len(half_bytes) % 2 != 0:
+        half_bytes = np.append(half_bytes, np.uint8(0))
+    return (
+        ((half_bytes[0::2] << 4) | (half_bytes[1::2] & 0xF)).astype(np.uint8).tobytes()
+    )
+
+
+def _decode_ints(data: bytes, start: int = 0) -> list:
+    """Decode half byte truncated integers written by :py:func:`_encode_ints`.
+
+    Args:
+        data (bytes): encoded data
+        start (int, optional): byte offset of the first integer
+
+    Returns:
+        list: decoded signed 32 bit integers
+    """
+    half_bytes = []
+    for byte in data[start:]:
+        half_bytes.append(byte >> 4)
+        half_bytes.append(byte & 0xF)
+    results = []
+    pos = 0
+    n_half_bytes = len(half_bytes)
+    while pos < n_half_bytes:
+        # a single trailing zero half byte is padding
+        if pos == n_half_bytes - 1 and half_bytes[pos] == 0:
+            break
+        head = half_bytes[pos]
+        pos += 1
+        if head <= 8:
+            n = head
+            value = 0
+        else:
+            n = head - 8
+            value = 0
+            for i in range(n):
+                value |= 0xF0000000 >> (4 * i)
+        for i in range(8 - n):
+            value |= half_bytes[pos] << (4 * i)
+            pos += 1
+        if value > 0x7FFFFFFF:
+            value -= 0x100000000
+        results.append(value)
+    return results
+
+
+def encode_linear(data: np.ndarray, fixed_point: float = None) -> bytes:
+    """Encode smooth data (m/z, retention time) by linear prediction.
+
+    Args:
+        data (np.ndarray): values to encode
+        fixed_point (float, optional): scaling factor, optimal if not given
+
+    Returns:
+        bytes: encoded data
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if fixed_point is None:
+        fixed_point = optimal_linear_fixed_point(data)
+    if pynumpress is not None:
+        return bytes(pynumpress.encode_linear(data, fixed_point))
+    result = struct.pack(">d", fixed_point)
+    if len(data) == 0:
+        return result
+    ints = np.floor(data * fixed_point + 0.5).astype(np.int64)
+    result += struct.pack("<I", ints[0] & 0xFFFFFFFF)
+    if len(data) == 1:
+        return result
+    result += struct.pack("<I", ints[1] & 0xFFFFFFFF)
+    diff = ints[2:] - (ints[1:-1] + (ints[1:-1] - ints[:-2]))
+    if len(diff) > 0 and (diff.max() > 0x7FFFFFFF or diff.min() < -0x80000000):
+        raise ValueError("Cannot encode data, fixed point too large")
+    return result + _pack_half_bytes(_encode_ints(diff))
+
+
+def decode_linear(data: bytes) -> np.ndarray:
+    """Decode data written by :py:func:`encode_linear`.
+
+    Args:
+        data (bytes): encoded data
+
+    Returns:
+        np.ndarray: decoded values
+    """
+    data = bytes(data)
+    fixed_point = struct.unpack(">d", data[:8])[0]
+    if len(data) < 12:
+        return np.array([], dtype=np.float64)
+    ints = [0, struct.unpack("<I", data[8:12])[0], 0]
+    result = [ints[1]]
+    if len(data) >= 16:
+        ints[2] = struct.unpack("<I", data[12:16])[0]
+        result.append(ints[2])
+        for diff in _decode_ints(data, 16):
+            ints[0] = ints[1]
+            ints[1] = ints[2]
+            ints[2] = ints[1] + (ints[1] - ints[0]) + diff
+            result.append(ints[2])
+    return np.array(result, dtype=np.float64) / fixed_point
+
+
+def encode_pic(data: np.ndarray) -> bytes:
+    """Encode positive values (ion counts) by rounding to integers.
+
+    Values above 2^32 - 1 can not be represented and are clipped.
+
+    Args:
+        data (np.ndarray): values to encode
+
+    Returns:
+        bytes: encoded data
+    """
+    data = np.clip(np.asarray(data, dtype=np.float64), 0, 0xFFFFFFFF)
+    if pynumpress is not None:
+        return bytes(pynumpress.encode_pic(data))
+    if len(data) == 0:
+        return b""
+    ints = np.floor(data + 0.5).astype(np.int64)
+    return _pack_half_bytes(_encode_ints(ints))
+
+
+def decode_pic(data: bytes) -> np.ndarray:
+    """Decode data written by :py:func:`encode_pic`.
+
+    Args:
+        data (bytes): encoded data
+
+    Returns:
+        np.ndarray: decoded values
+    """
+    ints = np.array(_decode_ints(bytes(data)), dtype=np.int64) & 0xFFFFFFFF
+    return ints.astype(np.float64)
+
+
+def encode_slof(data: np.ndarray, fixed_point: float = None) -> bytes:
+    """Encode positive values (ion counts) as short logged floats.
+
+    Args:
+        data (np.ndarray): values to encode
+        fixed_point (float, optional): scaling factor, optimal if not given
+
+    Returns:
+        bytes: encoded data
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if fixed_point is None:
+        fixed_point = optimal_slof_fixed_point(data)
+    if pynumpress is not None:
+        return bytes(pynumpress.encode_slof(data, fixed_point))
+    x = np.floor(np.log(data + 1) * fixed_point + 0.5).astype("<u2")
+    return struct.pack(">d", fixed_point) + x.tobytes()
+
+
+def decode_slof(data: bytes) -> np.ndarray:
+    """Decode data written by :py:func:`encode_slof`.
+
+    Args:
+        data (bytes): encoded data
+
+    Returns:
+        np.ndarray: decoded values
+    """
+    data = bytes(data)
+    fixed_point = struct.unpack(">d", data[:8])[0]
+    x = np.frombuffer(data[8:], dtype="<u2")
+    return np.exp(x / fixed_point) - 1
+
+
+ENCODERS = {"linear": encode_linear, "pic": encode_pic, "slof": encode_slof}
+DECODERS = {"linear": decode_linear, "pic": decode_pic, "slof": decode_slof}
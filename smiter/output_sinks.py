@@ -0,0 +1,328 @@
+"""Output sinks fed with simulated scans.
+
+Every sink receives each MS1 scan together with its MSn scans, so several
+output formats can be written from the same scans without decoding and
+re-encoding an mzML file.
+"""
+
+import io
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, BinaryIO, Dict, List, Tuple, Union, cast
+
+import numpy as np
+from loguru import logger
+
+from smiter.mzml_writer import ID_FORMAT, MzMLTemplateWriter
+from smiter.mzmlb_writer import MzMLbWriter
+from smiter.parallel_gzip import ParallelGzipWriter, is_gzip_path
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+if TYPE_CHECKING:  # pragma: no cover
+    # synthetic_mzml imports this module
+    from smiter.synthetic_mzml import Scan
+
+
+class AbstractSink(ABC):
+    """Base class of output sinks."""
+
+    def open(self, spectrum_count: int):
+        """Prepare writing.
+
+        Args:
+            spectrum_count (int): number of spectra that will be written
+        """
+        pass
+
+    @abstractmethod
+    def write(self, scan: "Scan", products: List["Scan"]):
+        """Write an MS1 scan and its MSn scans.
+
+        Args:
+            scan (Scan): MS1 scan
+            products (List[Scan]): MSn scans of the MS1 scan
+        """
+        pass  # pragma: no cover
+
+    @abstractmethod
+    def close(self):
+        """Finish writing."""
+        pass  # pragma: no cover
+
+
+def _open_text(file: Union[str, io.TextIOBase]) -> Tuple[io.TextIOBase, bool]:
+    if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+        return open(file, "w"), True
+    return file, False
+
+
+class MGFSink(AbstractSink):
+    """Write MSn spectra as Mascot generic format."""
+
+    def __init__(self, file: Union[str, io.TextIOBase]):
+        """Initialize sink.
+
+        Args:
+            file (Union[str, io.TextIOBase]): path or text file object
+        """
+        self.file, self._close_file = _open_text(file)
+
+    def write(self, scan: "Scan", products: List["Scan"]):
+        """Write the MSn scans of an MS1 scan.
+
+        Args:
+            scan (Scan): MS1 scan, not written
+            products (List[Scan]): MSn scans
+        """
+        parts = []
+        for prod in products:
+            parts.append(
+                "BEGIN IONS\n"
+                f"TITLE={ID_FORMAT.format(i=prod.id)}\n"
+                f"PEPMASS={float(prod.precursor_mz)!r} {float(prod.precursor_i)!r}\n"
+                f"CHARGE={int(prod.precursor_charge)}+\n"
+                f"RTINSECONDS={float(prod.retention_time)!r}\n"
+                f"SCANS={prod.id}\n"
+            )
+            parts.extend(
+                f"{mz!r} {i!r}\n"
+                for mz, i in zip(
+                    np.asarray(prod.mz, dtype=np.float64).tolist(),
+                    np.asarray(prod.i, dtype=np.float64).tolist(),
+                )
+            )
+            parts.append("END IONS\n\n")
+        self.file.write("".join(parts))
+
+    def close(self):
+        """Close file if opened by the sink."""
+        if self._close_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class ColumnarSink(AbstractSink):
+    """Collect all spectra in columns.
+
+    Peaks of all spectra are concatenated into flat mz and i arrays,
+    peaks of spectrum n are ``mz[peak_offset[n]:peak_offset[n + 1]]``.
+    Subclasses write the columns returned by :py:meth:`columns`.
+    """
+
+    def __init__(self):
+        """Initialize sink."""
+        self._scan_id: List[int] = []
+        self._ms_level: List[int] = []
+        self._retention_time: List[float] = []
+        self._precursor_scan_id: List[int] = []
+        self._precursor_mz: List[float] = []
+        self._precursor_i: List[float] = []
+        self._precursor_charge: List[int] = []
+        self._mz: List[np.ndarray] = []
+        self._i: List[np.ndarray] = []
+
+    def _append(self, spec: "Scan", precursor_scan_id: int):
+        self._scan_id.append(spec.id)
+        self._retention_time.append(spec.retention_time)
+        self._mz.append(np.asarray(spec.mz, dtype=np.float64))
+        self._i.append(np.asarray(spec.i, dtype=np.float32))
+        self._precursor_scan_id.append(precursor_scan_id)
+        if precursor_scan_id < 0:
+            self._ms_level.append(1)
+            self._precursor_mz.append(np.nan)
+            self._precursor_i.append(np.nan)
+            self._precursor_charge.append(0)
+        else:
+            self._ms_level.append(getattr(spec, "ms_level", None) or 2)
+            self._precursor_mz.append(spec.precursor_mz)
+            self._precursor_i.append(spec.precursor_i)
+            self._precursor_charge.append(spec.precursor_charge)
+
+    def write(self, scan: "Scan", products: List["Scan"]):
+        """Collect an MS1 scan and its MSn scans.
+
+        Args:
+            scan (Scan): MS1 scan
+            products (List[Scan]): MSn scans of the MS1 scan
+        """
+        self._append(scan, -1)
+        for prod in products:
+            self._append(prod, scan.id)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Get collected spectra as columns.
+
+        Returns:
+            Dict[str, np.ndarray]: per spectrum columns, peak_offset with one
+                entry more than there are spectra and the flat mz and i arrays
+        """
+        lengths = np.array([len(mz) for mz in self._mz], dtype=np.int64)
+        peak_offset = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=peak_offset[1:])
+        return {
+            "scan_id": np.array(self._scan_id, dtype=np.int64),
+            "ms_level": np.array(self._ms_level, dtype=np.int8),
+            "retention_time": np.array(self._retention_time, dtype=np.float64),
+            "precursor_scan_id": np.array(self._precursor_scan_id, dtype=np.int64),
+            "precursor_mz": np.array(self._precursor_mz, dtype=np.float64),
+            "precursor_i": np.array(self._precursor_i, dtype=np.float64),
+            "precursor_charge": np.array(self._precursor_charge, dtype=np.int16),
+            "peak_offset": peak_offset,
+            "mz": np.concatenate(self._mz) if self._mz else np.array([]),
+            "i": np.concatenate(self._i) if self._i else np.array([], np.float32),
+        }
+
+
+class NpzSink(ColumnarSink):
+    """Write columnar spectra to a compressed npz file."""
+
+    def __init__(self, file: Union[str, BinaryIO]):
+        """Initialize sink.
+
+        Args:
+            file (Union[str, BinaryIO]): path or binary file object
+        """
+        super().__init__()
+        self.file = file
+
+    def close(self):
+        """Write all columns."""
+        np.savez_compressed(self.file, **self.columns())
+
+
+class ParquetSink(ColumnarSink):
+    """Write columnar spectra to a Parquet file, one row per spectrum.
+
+    mz and i are stored as list columns, readable e.g. by pandas.
+    """
+
+    def __init__(self, file: Union[str, BinaryIO], compression: str = "zstd"):
+        """Initialize sink.
+
+        Args:
+            file (Union[str, BinaryIO]): path or binary file object
+            compression (str, optional): Parquet compression codec
+        """
+        if pa is None:
+            raise Exception("pyarrow is required to write Parquet files")
+        super().__init__()
+        self.file = file
+        self.compression = compression
+
+    def close(self):
+        """Write all columns."""
+        columns = self.columns()
+        offsets = pa.array(columns.pop("peak_offset"))
+        mz = pa.LargeListArray.from_arrays(offsets, pa.array(columns.pop("mz")))
+        i = pa.LargeListArray.from_arrays(offsets, pa.array(columns.pop("i")))
+        table = pa.table({**columns, "mz": mz, "i": i})
+        pq.write_table(table, self.file, compression=self.compression)
+
+
+class MzMLSink(AbstractSink):
+    """Write mzML or mzMLb files.
+
+    Uses the native writers of :py:mod:`smiter.mzml_writer` and
+    :py:mod:`smiter.mzmlb_writer`. Paths ending with .gz are compressed by
+    :py:class:`smiter.parallel_gzip.ParallelGzipWriter`.
+    """
+
+    def __init__(
+        self,
+        file: Union[str, BinaryIO],
+        writer: str = "native",
+        n_jobs: int = 1,
+        encodings: Dict[str, str] = None,
+        compression: str = "zlib",
+        gzip_block_index: bool = False,
+    ):
+        """Initialize sink.
+
+        Args:
+            file (Union[str, BinaryIO]): path or binary file object
+            writer (str, optional): native or mzmlb
+            n_jobs (int, optional): threads encoding binary arrays and
+                compressing .gz output
+            encodings (Dict[str, str], optional): encoding of the mz and i arrays
+            compression (str, optional): zlib or none
+            gzip_block_index (bool, optional): write a block index next to .gz
+                output
+        """
+        writer_classes = {"native": MzMLTemplateWriter, "mzmlb": MzMLbWriter}
+        if writer not in writer_classes:
+            raise Exception(
+                f"MzMLSink supports the writers {list(writer_classes)}, not {writer}"
+            )
+        self._gzip_writer = None
+        output = file
+        if is_gzip_path(file):
+            if writer == "mzmlb":
+                raise Exception(
+                    "mzMLb files are compressed by HDF5 and can not be gzipped"
+                )
+            self._gzip_writer = ParallelGzipWriter(
+                file, n_jobs=n_jobs, index_file=gzip_block_index or None
+            )
+            output = cast(BinaryIO, self._gzip_writer)
+        self.writer = writer_classes[writer](
+            output, encodings=encodings, compression=compression, n_jobs=n_jobs
+        )
+        self._time_array: List[float] = []
+        self._intensity_array: List[float] = []
+
+    def open(self, spectrum_count: int):
+        """Write the document header.
+
+        Args:
+            spectrum_count (int): number of spectra that will be written
+        """
+        self.writer.write_header(spectrum_count)
+
+    def write(self, scan: "Scan", products: List["Scan"]):
+        """Write an MS1 scan and its MSn scans.
+
+        Args:
+            scan (Scan): MS1 scan
+            products (List[Scan]): MSn scans of the MS1 scan
+        """
+        self.writer.submit_spectrum(scan)
+        self._time_array.append(scan.retention_time)
+        self._intensity_array.append(sum(scan.i))
+        precursor_id = ID_FORMAT.format(i=scan.id)
+        for prod in products:
+            self.writer.submit_spectrum(prod, precursor_id=precursor_id)
+
+    def close(self):
+        """Write the TIC, index and checksum."""
+        self.writer.write_chromatograms(
+            [("TIC", self._time_array, self._intensity_array, "total ion current")]
+        )
+        self.writer.close()
+        if self._gzip_writer is not None:
+            self._gzip_writer.close()
+
+
+def write_to_sinks(
+    scans: List[Tuple["Scan", List["Scan"]]], sinks: List[AbstractSink]
+) -> None:
+    """Feed scans to all sinks in a single pass.
+
+    Args:
+        scans (List[Tuple[Scan, List[Scan]]]): MS1 scans and their MSn scans
+        sinks (List[AbstractSink]): sinks to write to
+    """
+    logger.info(f"Write scans to {len(sinks)} sinks")
+    spectrum_count = len(scans) + sum([len(products) for _, products in scans])
+    for sink in sinks:
+        sink.open(spectrum_count)
+    for scan, products in scans:
+        for sink in sinks:
+            sink.write(scan, products)
+    for sink in sinks:
+        sink.close()
@@ -0,0 +1,297 @@
+"""Block-parallel gzip compression.
+
+Data is split into fixed size blocks and every block is compressed into an
+independent gzip member on a thread pool, similar to pigz. Concatenated gzip
+members form a valid gzip stream, so the output can be read by any gzip
+reader, including pymzml. An optional block index maps uncompressed to
+compressed offsets, which allows random access with
+:py:class:`GzipBlockReader`.
+"""
+
+import bisect
+import io
+import json
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Deque, List, Optional, Tuple, Union
+
+from smiter.mzml_writer import REORDER_BUFFER_FACTOR
+
+# uncompressed bytes per gzip member
+DEFAULT_BLOCK_SIZE = 2**20
+
+BLOCK_INDEX_SUFFIX = ".blocks.json"
+BLOCK_INDEX_FORMAT = "smiter gzip block index"
+
+# gzip header without mtime, flags or file name, so output is reproducible
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+
+
+def is_gzip_path(file) -> bool:
+    """Check if file is a path with .gz suffix.
+
+    Args:
+        file (TYPE): path or file object
+
+    Returns:
+        bool: True for gzip paths
+    """
+    if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+        return str(file).endswith(".gz")
+    return False
+
+
+def compress_block(data: bytes, compresslevel: int = 6) -> bytes:
+    """Compress data into a single gzip member.
+
+    Args:
+        data (bytes): uncompressed data
+        compresslevel (int, optional): zlib compression level
+
+    Returns:
+        bytes: gzip member
+    """
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return b"".join(
+        [
+            _GZIP_HEADER,
+            compressor.compress(data),
+            compressor.flush(),
+            struct.pack("<LL", zlib.crc32(data), len(data) & 0xFFFFFFFF),
+        ]
+    )
+
+
+class ParallelGzipWriter(io.RawIOBase):
+    """Writable binary stream compressing blocks on a thread pool."""
+
+    def __init__(
+        self,
+        file: Union[str, BinaryIO],
+        n_jobs: int = 1,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        compresslevel: int = 6,
+        index_file: Union[str, bool] = None,
+    ):
+        """Initialize writer.
+
+        Args:
+            file (Union[str, BinaryIO]): path or binary file object
+            n_jobs (int, optional): number of compression threads
+            block_size (int, optional): uncompressed bytes per gzip member
+            compresslevel (int, optional): zlib compression level
+            index_file (Union[str, bool], optional): path of the block index,
+                True to write it next to file with suffix
+                :py:data:`BLOCK_INDEX_SUFFIX`
+        """
+        super().__init__()
+        self._close_file = False
+        if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+            if index_file is True:
+                index_file = str(file) + BLOCK_INDEX_SUFFIX
+            file = open(file, "wb")
+            self._close_file = True
+        elif index_file is True:
+            raise Exception("index_file path is required for file objects")
+        self.file = file
+        self.name = getattr(file, "name", "")
+        self.n_jobs = n_jobs
+        self.block_size = block_size
+        self.compresslevel = compresslevel
+        self.index_file = index_file or None
+        # uncompressed offset, compressed offset and uncompressed length
+        self.blocks: List[Tuple[int, int, int]] = []
+        self.uncompressed_offset = 0
+        self.compressed_offset = 0
+        self._buffer = bytearray()
+        self._pending: Deque[Tuple[int, Future]] = deque()
+        self._executor = None
+        if n_jobs > 1:
+            self._executor = ThreadPoolExecutor(max_workers=n_jobs)
+
+    def writable(self) -> bool:
+        """Return True, the stream is writable."""
+        return True
+
+    def write(self, data) -> int:
+        """Buffer data and compress every complete block.
+
+        Args:
+            data (bytes-like): uncompressed data
+
+        Returns:
+            int: number of bytes written
+        """
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[: self.block_size])
+            del self._buffer[: self.block_size]
+            self._submit(block)
+        return len(data)
+
+    def _submit(self, block: bytes):
+        if self._executor is None:
+            self._write_member(len(block), compress_block(block, self.compresslevel))
+            return
+        self._pending.append(
+            (
+                len(block),
+                self._executor.submit(compress_block, block, self.compresslevel),
+            )
+        )
+        if len(self._pending) >= self.n_jobs * REORDER_BUFFER_FACTOR:
+            length, future = self._pending.popleft()
+            self._write_member(length, future.result())
+
+    def _write_member(self, length: int, member: bytes):
+        self.blocks.append((self.uncompressed_offset, self.compressed_offset, length))
+        self.file.write(member)
+        self.uncompressed_offset += length
+        self.compressed_offset += len(member)
+
+    def flush(self):
+        """Flush compressed blocks, the incomplete last block stays buffered."""
+        if not self.closed:
+            self.file.flush()
+
+    def write_block_index(self, index_file: str):
+        """Write the block index as json.
+
+        Args:
+            index_file (str): output path
+        """
+        with open(index_file, "w") as fout:
+            json.dump(
+                {
+                    "format": BLOCK_INDEX_FORMAT,
+                    "block_size": self.block_size,
+                    "uncompressed_size": self.uncompressed_offset,
+                    "compressed_size": self.compressed_offset,
+                    "blocks": self.blocks,
+                },
+                fout,
+            )
+
+    def close(self):
+        """Compress remaining data, write the block index and close file."""
+        if self.closed:
+            return
+        # an empty stream still needs one member to be valid gzip
+        if len(self._buffer) > 0 or len(self.blocks) + len(self._pending) == 0:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        while len(self._pending) > 0:
+            length, future = self._pending.popleft()
+            self._write_member(length, future.result())
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self.index_file is not None:
+            self.write_block_index(self.index_file)
+        super().close()
+        if self._close_file:
+            self.file.close()
+
+
+class GzipBlockReader(io.RawIOBase):
+    """Seekable reader for files written by :py:class:`ParallelGzipWriter`.
+
+    Only the gzip member containing the requested data is decompressed.
+    """
+
+    def __init__(self, file: str, index_file: str = None):
+        """Initialize reader.
+
+        Args:
+            file (str): path to the gzip file
+            index_file (str, optional): path to the block index, defaults to
+                file with suffix :py:data:`BLOCK_INDEX_SUFFIX`
+        """
+        super().__init__()
+        if index_file is None:
+            index_file = str(file) + BLOCK_INDEX_SUFFIX
+        with open(index_file) as fin:
+            index = json.load(fin)
+        if index.get("format") != BLOCK_INDEX_FORMAT:
+            raise Exception(f"{index_file} is not a gzip block index")
+        self.name = str(file)
+        self.file = open(file, "rb")
+        self.blocks = [tuple(block) for block in index["blocks"]]
+        self.size = index["uncompressed_size"]
+        self.compressed_size = index["compressed_size"]
+        self._starts = [block[0] for block in self.blocks]
+        self._position = 0
+        self._cached_block: Optional[int] = None
+        self._cached_data = b""
+
+    def readable(self) -> bool:
+        """Return True, the stream is readable."""
+        return True
+
+    def seekable(self) -> bool:
+        """Return True, the stream is seekable."""
+        return True
+
+    def tell(self) -> int:
+        """Return the uncompressed position."""
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Move to an uncompressed position.
+
+        Args:
+            offset (int): offset relative to whence
+            whence (int, optional): io.SEEK_SET, io.SEEK_CUR or io.SEEK_END
+
+        Returns:
+            int: new uncompressed position
+        """
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}")
+        self._position = max(0, self._position)
+        return self._position
+
+    def _block(self, block_index: int) -> bytes:
+        if self._cached_block != block_index:
+            _, compressed_offset, _ = self.blocks[block_index]
+            if block_index + 1 < len(self.blocks):
+                compressed_end = self.blocks[block_index + 1][1]
+            else:
+                compressed_end = self.compressed_size
+            self.file.seek(compressed_offset)
+            member = self.file.read(compressed_end - compressed_offset)
+            self._cached_data = zlib.decompress(member, 16 + zlib.MAX_WBITS)
+            self._cached_block = block_index
+        return self._cached_data
+
+    def readinto(self, buffer) -> int:
+        """Read up to len(buffer) uncompressed bytes into buffer.
+
+        Args:
+            buffer (bytearray): buffer to fill
+
+        Returns:
+            int: number of bytes read, 0 at the end of the file
+        """
+        n_read = 0
+        while n_read < len(buffer) and self._position < self.size:
+            block_index = bisect.bisect_right(self._starts, self._position) - 1
+            start = self._position - self.blocks[block_index][0]
+            data = self._block(block_index)[start : start + len(buffer) - n_read]
+            buffer[n_read : n_read + len(data)] = data
+            n_read += len(data)
+            self._position += len(data)
+        return n_read
+
+    def close(self):
+        """Close the underlying file."""
+        if not self.closed:
+            self.file.close()
+        super().close()
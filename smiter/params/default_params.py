@@ -8,7 +8,7 @@ default_peak_properties = {
     # "peak_function": "gauss",
 }
 
-default_mzml_params = {
+default_mzml_params: dict = {
     "gradient_length": None,
     "min_intensity": 100,
     "max_intensity": 1e10,  # what would be reasonable?
@@ -19,4 +19,24 @@ default_mzml_params = {
     "max_ms2_spectra": 10,
     "mz_lower_limit": 100,
     "mz_upper_limit": 1600,
+    "mzml_writer": "psims",  # psims, native or mzmlb
+    "writer_jobs": 1,  # threads encoding arrays (native writer) and gzipping .gz
+    # float64, float32, numpress_linear, numpress_pic or numpress_slof
+    "mz_encoding": "float64",
+    "intensity_encoding": "float32",
+    "binary_compression": "zlib",  # zlib or none
+    "gzip_block_index": False,  # block index for random access to .gz output
+    "mzml_shards": 1,  # number of retention time shards, see smiter.sharding
+    # ground truth XICs: none, chromatograms (in the mzML), sidecar or both
+    "xic_output": "none",
+    "xic_molecules": [],  # molecules to record XICs for, all if empty
+    # molecule summary path, .csv or .parquet, molecule_summary.csv next to
+    # the mzML if empty
+    "summary_file": "",
+    "peak_provenance": False,  # write contributing molecules of MS1 peaks
+    # seconds between checkpoints of scan generation, 0 disables them
+    "checkpoint_interval": 0,
+    "resume": False,  # continue from the checkpoint next to the mzML
+    # write stage times and counts to <stem>.metrics.json next to the mzML
+    "metrics_report": False,
 }
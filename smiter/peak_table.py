@@ -0,0 +1,462 @@
+"""Columnar peak property tables.
+
+Peak properties of large molecule lists are read in chunks straight into
+typed numpy columns instead of one dict per molecule. CSV is parsed with the
+csv module, Parquet and Arrow IPC (.arrow, .feather) files are read with
+pyarrow if installed.
+
+Peak function parameters are stored in float columns named
+``peak_params.<name>``, missing parameters are NaN. They are read from
+columns with the same name, from a ``peak_params`` column formatted as
+``sigma=2,a=5`` (as written by
+:py:func:`smiter.lib.peak_properties_to_csv`) or from a legacy ``sigma``
+column.
+"""
+
+import csv
+import pathlib
+from typing import BinaryIO, Dict, Iterator, List, Union
+
+import numpy as np
+from loguru import logger
+
+from smiter.params.default_params import default_peak_properties
+from smiter.peak_distribution import distributions
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+DEFAULT_CHUNK_SIZE = 100000
+
+PARAM_PREFIX = "peak_params."
+
+# column: (dtype, default), None means required
+PEAK_TABLE_COLUMNS = {
+    "chemical_formula": (str, None),
+    "trivial_name": (str, None),
+    "scan_start_time": (np.float64, None),
+    "peak_scaling_factor": (np.float64, None),
+    "charge": (np.int64, default_peak_properties["charge"]),
+    "peak_width": (np.float64, 30.0),
+    "peak_function": (str, "gauss_tail"),
+}
+
+# parameters used if a row has none, matches the former csv loader
+DEFAULT_PEAK_PARAMS = {"sigma": 2.0}
+
+# rows listed per offending column in validation errors
+_MAX_REPORTED_ROWS = 20
+
+
+def _is_param_column(name: str) -> bool:
+    return name.startswith(PARAM_PREFIX)
+
+
+def _fill_dtype(dtype):
+    # np.full with dtype=str would truncate the fill value to one character
+    return None if dtype is str else dtype
+
+
+def _parse_float(values: List[str]) -> np.ndarray:
+    """Convert strings to float64, empty and invalid values become NaN.
+
+    Args:
+        values (List[str]): stripped strings
+
+    Returns:
+        np.ndarray: parsed values
+    """
+    try:
+        return np.array([v if v != "" else "nan" for v in values], dtype=np.float64)
+    except ValueError:
+        parsed = np.full(len(values), np.nan)
+        for n, value in enumerate(values):
+            try:
+                parsed[n] = float(value)
+            except ValueError:
+                pass
+        return parsed
+
+
+def _parse_peak_params(values: List[str], first_row: int) -> Dict[str, np.ndarray]:
+    """Parse peak_params strings like sigma=2,a=5 into parameter columns.
+
+    Args:
+        values (List[str]): peak_params string of every row
+        first_row (int): row number of the first value, used in errors
+
+    Raises:
+        Exception: if a parameter is not formatted as name=number
+
+    Returns:
+        Dict[str, np.ndarray]: parameter columns by column name
+    """
+    params: Dict[str, np.ndarray] = {}
+    for n, value in enumerate(values):
+        for item in value.split(","):
+            item = item.strip()
+            if item == "":
+                continue
+            key, _, text = item.partition("=")
+            try:
+                number = float(text)
+            except ValueError:
+                raise Exception(
+                    f"Invalid peak_params {value!r} in row {first_row + n}, "
+                    "expected name=number pairs"
+                )
+            column = PARAM_PREFIX + key.strip()
+            if column not in params:
+                params[column] = np.full(len(values), np.nan)
+            params[column][n] = number
+    return params
+
+
+class PeakTable(object):
+    """Peak properties of many molecules as typed numpy columns.
+
+    Attributes:
+        columns (Dict[str, np.ndarray]): one array per column, see
+            :py:data:`PEAK_TABLE_COLUMNS` and ``peak_params.<name>`` columns
+        first_row (int): row number of the first row in the input file, used
+            in validation errors
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], first_row: int = 0):
+        """Initialize table.
+
+        Args:
+            columns (Dict[str, np.ndarray]): columns of equal length
+            first_row (int, optional): row number of the first row
+        """
+        self.columns = columns
+        self.first_row = first_row
+
+    def __len__(self) -> int:
+        """Return the number of rows."""
+        return len(self.columns["trivial_name"])
+
+    @property
+    def param_names(self) -> List[str]:
+        """Get the names of all peak function parameters."""
+        return [
+            name[len(PARAM_PREFIX) :] for name in self.columns if _is_param_column(name)
+        ]
+
+    @classmethod
+    def from_rows(cls, header: List[str], rows: List[List[str]], first_row: int = 0):
+        """Build a table from string rows, e.g. read by csv.reader.
+
+        Args:
+            header (List[str]): column names
+            rows (List[List[str]]): rows of string values
+            first_row (int, optional): row number of the first row
+
+        Returns:
+            PeakTable: typed table, missing optional columns are filled
+        """
+        raw: Dict[str, Union[list, np.ndarray]] = {}
+        for n, name in enumerate(header):
+            name = name.strip()
+            if name == "":
+                continue
+            raw[name] = [row[n].strip() if n < len(row) else "" for row in rows]
+        return cls.from_arrays(raw, len(rows), first_row=first_row)
+
+    @classmethod
+    def from_arrays(
+        cls, raw: Dict[str, Union[list, np.ndarray]], n_rows: int, first_row: int = 0
+    ):
+        """Build a table from untyped columns.
+
+        Args:
+            raw (Dict[str, Union[list, np.ndarray]]): values by column name,
+                missing values are empty strings, None or NaN
+            n_rows (int): number of rows
+            first_row (int, optional): row number of the first row
+
+        Raises:
+            Exception: if required columns are missing
+
+        Returns:
+            PeakTable: typed table, missing optional columns are filled
+        """
+        missing = [
+            name
+            for name, (_, default) in PEAK_TABLE_COLUMNS.items()
+            if default is None and name not in raw
+        ]
+        if len(missing) > 0:
+            raise Exception(f"Peak table is missing the required columns {missing}")
+        columns = {}
+        for name, (dtype, default) in PEAK_TABLE_COLUMNS.items():
+            values = raw.get(name, None)
+            if values is None:
+                columns[name] = np.full(n_rows, default, dtype=_fill_dtype(dtype))
+            elif dtype is str:
+                values = ["" if v is None else str(v).strip() for v in values]
+                if default is not None:
+                    values = [default if v == "" else v for v in values]
+                columns[name] = np.array(values, dtype=str)
+            else:
+                if isinstance(values, np.ndarray) and values.dtype.kind in "iuf":
+                    parsed = values.astype(np.float64)
+                    empty = np.isnan(parsed)
+                else:
+                    values = ["" if v is None else str(v).strip() for v in values]
+                    parsed = _parse_float(values)
+                    empty = np.array([v == "" for v in values], dtype=bool)
+                if default is not None:
+                    parsed[empty] = default
+                columns[name] = parsed
+        for name, values in raw.items():
+            if name == "peak_params":
+                columns.update(
+                    _parse_peak_params(
+                        ["" if v is None else str(v) for v in values], first_row
+                    )
+                )
+        for name, values in raw.items():
+            if _is_param_column(name) or name == "sigma":
+                column = name if _is_param_column(name) else PARAM_PREFIX + "sigma"
+                if column in columns:
+                    continue
+                if isinstance(values, np.ndarray) and values.dtype.kind in "iuf":
+                    columns[column] = values.astype(np.float64)
+                else:
+                    columns[column] = _parse_float(
+                        ["" if v is None else str(v).strip() for v in values]
+                    )
+        params = [name for name in columns if _is_param_column(name)]
+        if len(params) == 0:
+            for key, value in DEFAULT_PEAK_PARAMS.items():
+                columns[PARAM_PREFIX + key] = np.full(n_rows, value)
+        ignored = set(raw) - set(columns) - {"peak_params", "sigma"}
+        if len(ignored) > 0:
+            logger.debug(f"Ignore peak table columns {sorted(ignored)}")
+        return cls(columns, first_row=first_row)
+
+    @classmethod
+    def concatenate(cls, tables: List["PeakTable"]) -> "PeakTable":
+        """Concatenate tables, parameters missing in a table become NaN.
+
+        Args:
+            tables (List[PeakTable]): tables to concatenate
+
+        Returns:
+            PeakTable: concatenated table
+        """
+        names: List[str] = []
+        for table in tables:
+            names.extend(name for name in table.columns if name not in names)
+        columns = {}
+        for name in names:
+            parts = []
+            for table in tables:
+                if name in table.columns:
+                    parts.append(table.columns[name])
+                else:
+                    parts.append(np.full(len(table), np.nan))
+            columns[name] = np.concatenate(parts)
+        first_row = tables[0].first_row if tables else 0
+        return cls(columns, first_row=first_row)
+
+    def validate(self) -> "PeakTable":
+        """Check all rows at once.
+
+        Raises:
+            Exception: listing every offending column with its row numbers
+
+        Returns:
+            PeakTable: self
+        """
+        checks = {
+            "chemical_formula is empty": self.columns["chemical_formula"] == "",
+            "trivial_name is empty": self.columns["trivial_name"] == "",
+            "scan_start_time is missing or not numeric": np.isnan(
+                self.columns["scan_start_time"]
+            ),
+            "peak_scaling_factor is missing or not numeric": np.isnan(
+                self.columns["peak_scaling_factor"]
+            ),
+            "peak_width is not a positive number": ~(self.columns["peak_width"] > 0),
+            "charge is not a non-zero integer": ~np.isfinite(self.columns["charge"])
+            | (self.columns["charge"] == 0)
+            | (np.round(self.columns["charge"]) != self.columns["charge"]),
+            f"peak_function is not one of {list(distributions)}": ~np.isin(
+                self.columns["peak_function"], list(distributions)
+            ),
+        }
+        names, counts = np.unique(self.columns["trivial_name"], return_counts=True)
+        checks["trivial_name is not unique"] = np.isin(
+            self.columns["trivial_name"], names[counts > 1]
+        )
+        errors = []
+        for message, mask in checks.items():
+            rows = np.flatnonzero(mask) + self.first_row
+            if len(rows) == 0:
+                continue
+            shown = ", ".join(str(row) for row in rows[:_MAX_REPORTED_ROWS])
+            if len(rows) > _MAX_REPORTED_ROWS:
+                shown += f", ... ({len(rows)} rows)"
+            errors.append(f"{message} in rows {shown}")
+        if len(errors) > 0:
+            raise Exception("Invalid peak table:\n" + "\n".join(errors))
+        self.columns["charge"] = self.columns["charge"].astype(np.int64)
+        return self
+
+    def to_peak_properties(self) -> Dict[str, dict]:
+        """Convert to the peak_properties dict used by write_mzml.
+
+        Returns:
+            Dict[str, dict]: peak properties by trivial name
+        """
+        params = {name: self.columns[PARAM_PREFIX + name] for name in self.param_names}
+        rows = zip(
+            *[
+                self.columns[name].tolist()
+                for name in (
+                    "chemical_formula",
+                    "trivial_name",
+                    "charge",
+                    "scan_start_time",
+                    "peak_function",
+                    "peak_scaling_factor",
+                    "peak_width",
+                )
+            ]
+        )
+        peak_properties = {}
+        for n, row in enumerate(rows):
+            cc, tn, charge, start, function, scaling_factor, width = row
+            peak_properties[tn] = {
+                "trivial_name": tn,
+                "chemical_formula": cc,
+                "charge": int(charge),
+                "scan_start_time": start,
+                "peak_function": function,
+                "peak_params": {
+                    key: float(column[n])
+                    for key, column in params.items()
+                    if not np.isnan(column[n])
+                },
+                "peak_scaling_factor": scaling_factor,
+                "peak_width": width,
+            }
+        return peak_properties
+
+
+def _file_format(file: Union[str, pathlib.PurePath, BinaryIO]) -> str:
+    name = str(getattr(file, "name", file)).lower()
+    for suffix, file_format in (
+        (".parquet", "parquet"),
+        (".arrow", "arrow"),
+        (".feather", "arrow"),
+    ):
+        if name.endswith(suffix):
+            return file_format
+    return "csv"
+
+
+def _iter_csv(file, chunk_size: int) -> Iterator[PeakTable]:
+    with open(file, newline="") as fin:
+        reader = csv.reader(fin)
+        header = next(reader)
+        rows = []
+        # row numbers count the header as row 1, like spreadsheets
+        first_row = 2
+        for row in reader:
+            if len(row) == 0:
+                continue
+            rows.append(row)
+            if len(rows) == chunk_size:
+                yield PeakTable.from_rows(header, rows, first_row=first_row)
+                first_row += len(rows)
+                rows = []
+        if len(rows) > 0 or first_row == 2:
+            yield PeakTable.from_rows(header, rows, first_row=first_row)
+
+
+def _iter_record_batches(batches) -> Iterator[PeakTable]:
+    first_row = 0
+    for batch in batches:
+        raw = {}
+        for name, column in zip(batch.schema.names, batch.columns):
+            if pa.types.is_floating(column.type) or pa.types.is_integer(column.type):
+                raw[name] = column.to_numpy(zero_copy_only=False).astype(np.float64)
+            else:
+                raw[name] = column.to_pylist()
+        yield PeakTable.from_arrays(raw, batch.num_rows, first_row=first_row)
+        first_row += batch.num_rows
+
+
+def iter_peak_table(
+    file: Union[str, pathlib.PurePath, BinaryIO],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    file_format: str = None,
+) -> Iterator[PeakTable]:
+    """Read a peak table in validated chunks.
+
+    Args:
+        file (Union[str, pathlib.PurePath, BinaryIO]): csv, parquet, arrow or
+            feather file, binary file objects only for parquet and arrow
+        chunk_size (int, optional): rows per chunk, pyarrow inputs are read
+            in record batches of at most chunk_size rows
+        file_format (str, optional): csv, parquet or arrow, guessed from the
+            suffix if None
+
+    Raises:
+        Exception: if pyarrow is required but not installed
+
+    Yields:
+        PeakTable: validated chunk
+    """
+    if file_format is None:
+        file_format = _file_format(file)
+    if file_format == "csv":
+        chunks = _iter_csv(file, chunk_size)
+    elif pa is None:
+        raise Exception(f"pyarrow is required to read {file_format} peak tables")
+    elif file_format == "parquet":
+        chunks = _iter_record_batches(
+            pq.ParquetFile(file).iter_batches(batch_size=chunk_size)
+        )
+    elif file_format == "arrow":
+        reader = pa.ipc.open_file(file)
+        chunks = _iter_record_batches(
+            batch.slice(start, chunk_size)
+            for batch in (reader.get_batch(n) for n in range(reader.num_record_batches))
+            for start in range(0, batch.num_rows, chunk_size)
+        )
+    else:
+        raise Exception(f"Unknown peak table format {file_format}")
+    for chunk in chunks:
+        yield chunk.validate()
+
+
+def read_peak_table(
+    file: Union[str, pathlib.PurePath, BinaryIO],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    file_format: str = None,
+) -> PeakTable:
+    """Read a complete peak table, see :py:func:`iter_peak_table`.
+
+    Args:
+        file (Union[str, pathlib.PurePath, BinaryIO]): csv, parquet, arrow or
+            feather file
+        chunk_size (int, optional): rows per chunk
+        file_format (str, optional): csv, parquet or arrow
+
+    Returns:
+        PeakTable: validated table
+    """
+    logger.info(f"Read peak table from {file}")
+    table = PeakTable.concatenate(
+        list(iter_peak_table(file, chunk_size=chunk_size, file_format=file_format))
+    )
+    # trivial names have to be unique across chunks
+    return table.validate()
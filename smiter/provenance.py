@@ -0,0 +1,210 @@
+"""Ground truth provenance of MS1 peaks.
+
+For every MS1 peak the molecules contributing to it and their fraction of the
+noise free peak intensity are recorded in nested CSR arrays:
+
+* ``spec_id[n]`` is the id of the n-th MS1 spectrum, its peaks are
+  ``spectrum_offset[n]:spectrum_offset[n + 1]``
+* the contributions of peak k are ``peak_offset[k]:peak_offset[k + 1]`` in
+  ``molecule`` (int32 index into ``molecules``) and ``fraction`` (float32)
+
+Peak k of a spectrum is the k-th peak of the written MS1 spectrum. Noise
+injectors may shift, add or reorder peaks, so the written peaks are matched to
+the noise free peaks by :py:func:`match_peaks`. Peaks added by noise, e.g. the
+white noise of :py:class:`smiter.noise_functions.JamssNoiseInjector`, have no
+contributions.
+"""
+
+import pathlib
+from typing import BinaryIO, Dict, List, Tuple, Union
+
+import numpy as np
+
+
+def match_peaks(noise_free_mz: np.ndarray, mz: np.ndarray) -> np.ndarray:
+    """Match the peaks of a noisy spectrum to the noise free peaks.
+
+    Spectra with unchanged number of peaks keep their order. Otherwise every
+    noise free peak is matched to the closest noisy peak, if two noise free
+    peaks share it the closer one wins.
+
+    Args:
+        noise_free_mz (np.ndarray): sorted mz values before noise injection
+        mz (np.ndarray): mz values after noise injection
+
+    Returns:
+        np.ndarray: index of the noise free peak of each noisy peak, -1 for
+            peaks added by noise
+    """
+    if len(noise_free_mz) == len(mz):
+        return np.arange(len(mz))
+    match = np.full(len(mz), -1, dtype=np.int64)
+    if len(noise_free_mz) == 0 or len(mz) == 0:
+        return match
+    order = np.argsort(mz, kind="stable")
+    sorted_mz = mz[order]
+    right = np.searchsorted(sorted_mz, noise_free_mz).clip(max=len(mz) - 1)
+    left = (right - 1).clip(min=0)
+    use_left = np.abs(noise_free_mz - sorted_mz[left]) <= np.abs(
+        sorted_mz[right] - noise_free_mz
+    )
+    nearest = np.where(use_left, left, right)
+    distance = np.abs(sorted_mz[nearest] - noise_free_mz)
+    by_distance = np.argsort(distance, kind="stable")
+    # first occurrence in distance order is the closest noise free peak
+    _, first = np.unique(nearest[by_distance], return_index=True)
+    winners = by_distance[first]
+    match[order[nearest[winners]]] = winners
+    return match
+
+
+class ProvenanceBuffer(object):
+    """Growable CSR buffer of MS1 peak provenance."""
+
+    def __init__(self, capacity: int = 1024):
+        """Initialize buffer.
+
+        Args:
+            capacity (int, optional): initial number of peaks and contributions
+        """
+        self.molecules: List[str] = []
+        self._molecule_index: Dict[str, int] = {}
+        self._spec_id: List[int] = []
+        self._spectrum_offset: List[int] = [0]
+        self._n_peaks = 0
+        self._n_contributions = 0
+        self._peak_offset = np.zeros(capacity + 1, dtype=np.int64)
+        self._molecule = np.empty(capacity, dtype=np.int32)
+        self._fraction = np.empty(capacity, dtype=np.float32)
+
+    def __len__(self) -> int:
+        """Return the number of recorded peaks."""
+        return self._n_peaks
+
+    @staticmethod
+    def _grown(column: np.ndarray, size: int, required: int) -> np.ndarray:
+        if required <= len(column):
+            return column
+        grown = np.empty(max(required, 2 * len(column)), dtype=column.dtype)
+        grown[:size] = column[:size]
+        return grown
+
+    def add_spectrum(self, spec_id: int, contributions: List[List[Tuple[str, float]]]):
+        """Record the provenance of all peaks of an MS1 spectrum.
+
+        Args:
+            spec_id (int): id of the MS1 spectrum
+            contributions (List[List[Tuple[str, float]]]): molecule and noise
+                free intensity contributing to each peak, in output peak order
+        """
+        counts = np.array([len(peak) for peak in contributions], dtype=np.int64)
+        molecules = []
+        intensities = []
+        for peak in contributions:
+            for mol, intensity in peak:
+                index = self._molecule_index.get(mol, None)
+                if index is None:
+                    index = len(self.molecules)
+                    self._molecule_index[mol] = index
+                    self.molecules.append(mol)
+                molecules.append(index)
+                intensities.append(intensity)
+        weights = np.array(intensities, dtype=np.float64)
+        peak_index = np.repeat(np.arange(len(counts)), counts)
+        totals = np.bincount(peak_index, weights=weights, minlength=len(counts))[
+            peak_index
+        ]
+        fractions = np.divide(
+            weights, totals, out=np.zeros_like(weights), where=totals > 0
+        )
+
+        n_peaks = len(counts)
+        n_contributions = len(molecules)
+        self._peak_offset = self._grown(
+            self._peak_offset, self._n_peaks + 1, self._n_peaks + n_peaks + 1
+        )
+        self._molecule = self._grown(
+            self._molecule,
+            self._n_contributions,
+            self._n_contributions + n_contributions,
+        )
+        self._fraction = self._grown(
+            self._fraction,
+            self._n_contributions,
+            self._n_contributions + n_contributions,
+        )
+        self._peak_offset[self._n_peaks + 1 : self._n_peaks + n_peaks + 1] = (
+            self._n_contributions + np.cumsum(counts)
+        )
+        contribution_slice = slice(
+            self._n_contributions, self._n_contributions + n_contributions
+        )
+        self._molecule[contribution_slice] = molecules
+        self._fraction[contribution_slice] = fractions
+        self._n_peaks += n_peaks
+        self._n_contributions += n_contributions
+        self._spec_id.append(spec_id)
+        self._spectrum_offset.append(self._n_peaks)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Get the CSR arrays described in :py:mod:`smiter.provenance`.
+
+        Returns:
+            Dict[str, np.ndarray]: molecules, spec_id, spectrum_offset,
+                peak_offset, molecule and fraction
+        """
+        return {
+            "molecules": np.array(self.molecules, dtype=str),
+            "spec_id": np.array(self._spec_id, dtype=np.int64),
+            "spectrum_offset": np.array(self._spectrum_offset, dtype=np.int64),
+            "peak_offset": self._peak_offset[: self._n_peaks + 1],
+            "molecule": self._molecule[: self._n_contributions],
+            "fraction": self._fraction[: self._n_contributions],
+        }
+
+    def to_npz(self, file: Union[str, pathlib.PurePath, BinaryIO]):
+        """Write provenance to a compressed npz file.
+
+        Args:
+            file (Union[str, pathlib.PurePath, BinaryIO]): path or binary file
+                object
+        """
+        np.savez_compressed(file, allow_pickle=False, **self.columns())
+
+
+def spectrum_provenance(
+    provenance: Dict[str, np.ndarray], spec_id: int
+) -> List[List[Tuple[str, float]]]:
+    """Get the contributing molecules of all peaks of an MS1 spectrum.
+
+    Args:
+        provenance (Dict[str, np.ndarray]): columns, e.g. loaded with np.load
+        spec_id (int): id of the MS1 spectrum
+
+    Raises:
+        Exception: if spec_id is not an MS1 spectrum with provenance
+
+    Returns:
+        List[List[Tuple[str, float]]]: molecule and intensity fraction for
+            each peak
+    """
+    positions = np.flatnonzero(provenance["spec_id"] == spec_id)
+    if len(positions) == 0:
+        raise Exception(f"No provenance for spectrum {spec_id}")
+    n = positions[0]
+    molecules = provenance["molecules"]
+    peak_offset = provenance["peak_offset"]
+    peaks = []
+    for k in range(
+        provenance["spectrum_offset"][n], provenance["spectrum_offset"][n + 1]
+    ):
+        contribution_slice = slice(peak_offset[k], peak_offset[k + 1])
+        peaks.append(
+            list(
+                zip(
+                    molecules[provenance["molecule"][contribution_slice]].tolist(),
+                    provenance["fraction"][contribution_slice].tolist(),
+                )
+            )
+        )
+    return peaks
@@ -0,0 +1,279 @@
+"""Runs of the same molecules sharing one precomputed library.
+
+Technical replicates of a sample only differ in noise and small retention
+time and intensity jitter, parameter sweeps only in mzML params. The
+isotopologue library, interval tree and fragment spectra are built once in
+the parent process and shared read-only with the worker processes, which
+inherit them on fork (copy-on-write). Every run draws from its own random
+stream spawned from a single seed, so results do not depend on the number of
+workers.
+"""
+
+import multiprocessing
+import pathlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+from smiter.fragmentation_functions import AbstractFragmentor, CachedFragmentor
+from smiter.lib import check_mzml_params, split_path
+from smiter.noise_functions import AbstractNoiseInjector
+from smiter.peak_table import PeakTable
+from smiter.stage_cache import StageCache
+from smiter.synthetic_mzml import generate_interval_tree, prepare_stages, write_mzml
+
+# structures shared with the replicate workers, set by _init_worker
+_shared: dict = {}
+
+
+def replicate_path(file: Union[str, pathlib.PurePath], replicate: int) -> str:
+    """Get the path of a replicate, e.g. run.rep001.mzML for run.mzML.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): path of the run
+        replicate (int): replicate number
+
+    Returns:
+        str: replicate path
+    """
+    parent, stem, suffix = split_path(file)
+    return str(parent / f"{stem}.rep{replicate:03d}{suffix}")
+
+
+def _summary_path(file: str, summary_file: str) -> str:
+    parent, stem, _ = split_path(file)
+    suffix = ".parquet" if summary_file.endswith(".parquet") else ".csv"
+    return str(parent / f"{stem}.molecule_summary{suffix}")
+
+
+def _init_worker(shared: dict):
+    global _shared
+    _shared = shared
+
+
+def _jitter(
+    peak_properties: Dict[str, dict],
+    rng: np.random.Generator,
+    rt_jitter: float,
+    intensity_jitter: float,
+) -> Dict[str, dict]:
+    molecules = list(peak_properties)
+    start_times = np.array(
+        [peak_properties[mol]["scan_start_time"] for mol in molecules]
+    )
+    scaling_factors = np.array(
+        [peak_properties[mol].get("peak_scaling_factor", 1e3) for mol in molecules]
+    )
+    if rt_jitter > 0:
+        start_times = np.clip(
+            start_times + rng.normal(0, rt_jitter, len(molecules)), 0, None
+        )
+    if intensity_jitter > 0:
+        scaling_factors = scaling_factors * rng.lognormal(
+            0, intensity_jitter, len(molecules)
+        )
+    return {
+        mol: dict(
+            peak_properties[mol],
+            scan_start_time=float(start_times[n]),
+            peak_scaling_factor=float(scaling_factors[n]),
+        )
+        for n, mol in enumerate(molecules)
+    }
+
+
+def _simulate_shared(
+    file: str, seed_sequence: np.random.SeedSequence, params: dict
+) -> Tuple[str, float]:
+    peak_properties = _shared["peak_properties"]
+    library = _shared["library"]
+    rt_jitter = _shared["rt_jitter"]
+    intensity_jitter = _shared["intensity_jitter"]
+    start = time.perf_counter()
+    # noise injectors draw from the global numpy state
+    np.random.seed(seed_sequence.generate_state(1)[0])
+    if rt_jitter > 0 or intensity_jitter > 0:
+        rng = np.random.default_rng(seed_sequence)
+        peak_properties = _jitter(peak_properties, rng, rt_jitter, intensity_jitter)
+    if rt_jitter > 0:
+        library = dict(library, interval_tree=generate_interval_tree(peak_properties))
+    mzml_params = dict(_shared["mzml_params"], **params)
+    mzml_params["summary_file"] = _summary_path(file, mzml_params["summary_file"])
+    logger.info(f"Simulate {file}")
+    filename = write_mzml(
+        file,
+        peak_properties,
+        _shared["fragmentor"],
+        _shared["noise_injector"],
+        mzml_params,
+        library=library,
+    )
+    return filename, time.perf_counter() - start
+
+
+def prepare_shared(
+    peak_properties: Union[Dict[str, dict], PeakTable],
+    fragmentor: AbstractFragmentor,
+    noise_injector: AbstractNoiseInjector,
+    mzml_params: Dict[str, Union[int, float, str]],
+    rt_jitter: float = 0.0,
+    intensity_jitter: float = 0.0,
+    warm_fragments: bool = True,
+    cache: StageCache = None,
+) -> dict:
+    """Build the structures shared by all runs of the same molecules.
+
+    Args:
+        peak_properties (Union[Dict[str, dict], PeakTable]): peak properties of
+            all molecules
+        fragmentor (AbstractFragmentor): fragmentor, wrapped in a
+            :py:class:`smiter.fragmentation_functions.CachedFragmentor`
+        noise_injector (AbstractNoiseInjector): noise injector of all runs
+        mzml_params (Dict[str, Union[int, float, str]]): params of all runs
+        rt_jitter (float, optional): standard deviation of the per molecule
+            shift of scan_start_time
+        intensity_jitter (float, optional): sigma of the log-normal per
+            molecule factor on peak_scaling_factor
+        warm_fragments (bool, optional): fragment every molecule once before
+            starting the workers, so they share the fragment spectra
+        cache (StageCache, optional): cache of the shared stages, see
+            :py:func:`smiter.synthetic_mzml.prepare_stages`
+
+    Returns:
+        dict: shared structures, passed to :py:func:`run_shared`, and the
+            seconds spent building them by stage in timings
+    """
+    timings: Dict[str, float] = {}
+    peak_properties, library, fragmentor = prepare_stages(
+        peak_properties,
+        fragmentor,
+        cache=cache,
+        warm_fragments=warm_fragments,
+        timings=timings,
+    )
+    if not isinstance(fragmentor, CachedFragmentor):
+        fragmentor = CachedFragmentor(fragmentor)
+    return {
+        "peak_properties": peak_properties,
+        "library": library,
+        "fragmentor": fragmentor,
+        "noise_injector": noise_injector,
+        "mzml_params": check_mzml_params(mzml_params),
+        "rt_jitter": rt_jitter,
+        "intensity_jitter": intensity_jitter,
+        "timings": timings,
+    }
+
+
+def run_shared(
+    shared: dict,
+    files: Sequence[Union[str, pathlib.PurePath]],
+    seed: int = None,
+    params: List[dict] = None,
+    n_jobs: int = 1,
+) -> List[Tuple[str, float]]:
+    """Simulate runs of the shared molecules on a process pool.
+
+    Workers inherit the shared structures on fork, other start methods
+    pickle them once per worker. Every run draws from its own child of a
+    SeedSequence, so results do not depend on the number of workers.
+
+    Args:
+        shared (dict): structures returned by :py:func:`prepare_shared`
+        files (Sequence[Union[str, pathlib.PurePath]]): output path of every run
+        seed (int, optional): seed the run random streams are spawned from
+        params (List[dict], optional): mzml_params updates of every run
+        n_jobs (int, optional): number of worker processes
+
+    Raises:
+        Exception: if XIC sidecars or provenance of several runs would
+            overwrite each other
+
+    Returns:
+        List[Tuple[str, float]]: name and wall time in seconds of every run
+    """
+    paths = [str(file) for file in files]
+    if params is None:
+        params = [{} for _ in paths]
+    directories = [pathlib.Path(file).resolve().parent for file in paths]
+    sidecars = any(
+        dict(shared["mzml_params"], **run_params)["xic_output"] in ("sidecar", "both")
+        or dict(shared["mzml_params"], **run_params)["peak_provenance"]
+        for run_params in params
+    )
+    if sidecars and len(set(directories)) < len(directories):
+        raise Exception("XIC sidecars and peak provenance require a directory per run")
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(paths))
+    logger.info(f"Simulate {len(paths)} runs on {n_jobs} processes")
+    if n_jobs <= 1:
+        _init_worker(shared)
+        try:
+            return list(map(_simulate_shared, paths, seed_sequences, params))
+        finally:
+            _init_worker({})
+    context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(
+        max_workers=min(n_jobs, len(paths)),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(shared,),
+    ) as executor:
+        return list(executor.map(_simulate_shared, paths, seed_sequences, params))
+
+
+def simulate_replicates(
+    files: List[Union[str, pathlib.PurePath]],
+    peak_properties: Dict[str, dict],
+    fragmentor: AbstractFragmentor,
+    noise_injector: AbstractNoiseInjector,
+    mzml_params: Dict[str, Union[int, float, str]],
+    seed: int = None,
+    rt_jitter: float = 0.0,
+    intensity_jitter: float = 0.0,
+    n_jobs: int = 1,
+    warm_fragments: bool = True,
+) -> List[str]:
+    """Simulate technical replicates of the same molecules.
+
+    Molecule summaries are written to <stem>.molecule_summary.csv (or
+    .parquet) next to each replicate.
+
+    Args:
+        files (List[Union[str, pathlib.PurePath]]): output path of every
+            replicate, see :py:func:`replicate_path`
+        peak_properties (Dict[str, dict]): peak properties of all molecules
+        fragmentor (AbstractFragmentor): fragmentor of all replicates
+        noise_injector (AbstractNoiseInjector): noise injector of all
+            replicates
+        mzml_params (Dict[str, Union[int, float, str]]): params of all
+            replicates
+        seed (int, optional): seed the replicate random streams are spawned
+            from
+        rt_jitter (float, optional): standard deviation of the per molecule
+            shift of scan_start_time
+        intensity_jitter (float, optional): sigma of the log-normal per
+            molecule factor on peak_scaling_factor
+        n_jobs (int, optional): number of worker processes
+        warm_fragments (bool, optional): fragment every molecule once before
+            starting the workers
+
+    Returns:
+        List[str]: names of the written replicates
+    """
+    shared = prepare_shared(
+        peak_properties,
+        fragmentor,
+        noise_injector,
+        mzml_params,
+        rt_jitter=rt_jitter,
+        intensity_jitter=intensity_jitter,
+        warm_fragments=warm_fragments,
+    )
+    return [
+        filename for filename, _ in run_shared(shared, files, seed=seed, n_jobs=n_jobs)
+    ]
@@ -0,0 +1,193 @@
+"""Batched retention time predictors.
+
+Predictors take a batch of molecules and return one scan start time per
+molecule. Predictions are cached by molecule, so every molecule is only
+predicted once per predictor and start times of large peak tables are set with
+a single call of :py:func:`assign_retention_times`.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+from loguru import logger
+
+from smiter.peak_table import PeakTable
+
+# Retention coefficients of amino acids in reversed phase HPLC at pH 2,
+# Guo et al., J. Chromatogr. 359 (1986), 499-518
+GUO_RETENTION_COEFFICIENTS = {
+    "W": 8.8,
+    "F": 8.1,
+    "L": 8.1,
+    "I": 7.4,
+    "M": 5.5,
+    "V": 5.0,
+    "Y": 4.5,
+    "P": 2.0,
+    "T": 0.6,
+    "A": -0.1,
+    "G": -0.5,
+    "E": -0.7,
+    "N": -1.6,
+    "C": -2.2,
+    "Q": -2.5,
+    "D": -2.8,
+    "K": -3.2,
+    "H": -3.3,
+    "S": -3.7,
+    "R": -4.5,
+}
+
+
+class AbstractRTPredictor(ABC):
+    """Base class of retention time predictors."""
+
+    def __init__(self):
+        """Initialize prediction cache."""
+        self._cache: Dict[str, float] = {}
+
+    @abstractmethod
+    def _predict(self, molecules: List[str]) -> np.ndarray:
+        """Predict start times of molecules missing in the cache.
+
+        Args:
+            molecules (List[str]): unique molecules
+
+        Returns:
+            np.ndarray: one start time per molecule
+        """
+        pass  # pragma: no cover
+
+    def clear_cache(self):
+        """Forget all cached predictions, e.g. after recalibration."""
+        self._cache = {}
+
+    def predict(self, molecules: Union[Sequence[str], np.ndarray]) -> np.ndarray:
+        """Predict start times of a batch of molecules.
+
+        Only unique molecules without cached prediction are passed to the
+        predictor, in a single batch.
+
+        Args:
+            molecules (Union[Sequence[str], np.ndarray]): molecule keys, e.g.
+                peptide sequences
+
+        Returns:
+            np.ndarray: float64 start time of each molecule
+        """
+        keys = np.asarray(molecules, dtype=str)
+        if len(keys) == 0:
+            return np.empty(0, dtype=np.float64)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        unique = unique_keys.tolist()
+        missing = [mol for mol in unique if mol not in self._cache]
+        if len(missing) > 0:
+            logger.info(f"Predict retention times of {len(missing)} molecules")
+            predictions = np.asarray(self._predict(missing), dtype=np.float64)
+            if predictions.shape != (len(missing),):
+                raise Exception(
+                    f"{type(self).__name__} returned {predictions.shape} "
+                    f"predictions for {len(missing)} molecules"
+                )
+            self._cache.update(zip(missing, predictions.tolist()))
+        cached = np.array([self._cache[mol] for mol in unique], dtype=np.float64)
+        return cached[inverse.reshape(-1)]
+
+
+class HydrophobicityRTPredictor(AbstractRTPredictor):
+    """Linear retention time model of the peptide hydrophobicity index.
+
+    The index of a peptide is the sum of the retention coefficients of its
+    residues, unknown residues contribute 0. Start times are
+    ``intercept + slope * index``, clipped to ``[0, gradient_length]``.
+    """
+
+    def __init__(
+        self,
+        slope: float = 1.0,
+        intercept: float = 0.0,
+        gradient_length: float = None,
+        coefficients: Dict[str, float] = None,
+    ):
+        """Initialize predictor.
+
+        Args:
+            slope (float, optional): start time per unit hydrophobicity
+            intercept (float, optional): start time of index 0
+            gradient_length (float, optional): upper bound of start times,
+                unbounded if None
+            coefficients (Dict[str, float], optional): retention coefficient
+                per residue, defaults to GUO_RETENTION_COEFFICIENTS
+        """
+        super().__init__()
+        if coefficients is None:
+            coefficients = GUO_RETENTION_COEFFICIENTS
+        self.slope = slope
+        self.intercept = intercept
+        self.gradient_length = gradient_length
+        self._lookup = np.zeros(256, dtype=np.float64)
+        for residue, coefficient in coefficients.items():
+            self._lookup[ord(residue)] = coefficient
+
+    def hydrophobicity_index(self, peptides: Sequence[str]) -> np.ndarray:
+        """Compute the hydrophobicity index of all peptides at once.
+
+        Args:
+            peptides (Sequence[str]): peptide sequences
+
+        Returns:
+            np.ndarray: summed retention coefficients per peptide
+        """
+        sequences = np.asarray(peptides, dtype=bytes)
+        if sequences.itemsize == 0 or len(sequences) == 0:
+            return np.zeros(len(sequences), dtype=np.float64)
+        # padding null bytes look up coefficient 0
+        residues = sequences.view(np.uint8).reshape(len(sequences), -1)
+        return self._lookup[residues].sum(axis=1)
+
+    def fit(self, peptides: Sequence[str], retention_times: Sequence[float]):
+        """Calibrate slope and intercept by least squares.
+
+        Args:
+            peptides (Sequence[str]): peptides with measured retention times
+            retention_times (Sequence[float]): measured start times
+
+        Raises:
+            Exception: if fewer than two peptides are given
+
+        Returns:
+            HydrophobicityRTPredictor: self
+        """
+        if len(peptides) < 2:
+            raise Exception("At least two peptides are required for calibration")
+        index = self.hydrophobicity_index(peptides)
+        slope, intercept = np.polyfit(
+            index, np.asarray(retention_times, dtype=np.float64), 1
+        )
+        self.slope = float(slope)
+        self.intercept = float(intercept)
+        self.clear_cache()
+        return self
+
+    def _predict(self, molecules: List[str]) -> np.ndarray:
+        start_times = self.intercept + self.slope * self.hydrophobicity_index(molecules)
+        return np.clip(start_times, 0, self.gradient_length)
+
+
+def assign_retention_times(
+    peak_table: PeakTable, predictor: AbstractRTPredictor
+) -> PeakTable:
+    """Set the start times of all molecules with a single batched prediction.
+
+    Args:
+        peak_table (PeakTable): table, updated in place
+        predictor (AbstractRTPredictor): predictor keyed by trivial name
+
+    Returns:
+        PeakTable: peak_table
+    """
+    peak_table.columns["scan_start_time"] = predictor.predict(
+        peak_table.columns["trivial_name"]
+    )
+    return peak_table
@@ -0,0 +1,384 @@
+"""Split simulated runs into retention time shards and stitch them back.
+
+Every shard is a complete indexed mzML file containing the MS1 scans of one
+retention time range together with their MSn scans. Scan ids are assigned
+before sharding, so native ids are identical to an unsharded run. A json
+manifest lists the shards in retention time order, :py:func:`stitch_shards`
+combines them into a single indexedmzML using the shard offset indices.
+"""
+
+import gzip
+import json
+import os
+import pathlib
+import re
+from typing import TYPE_CHECKING, BinaryIO, Dict, List, Optional, Tuple, Union, cast
+from xml.etree import ElementTree
+
+import numpy as np
+from loguru import logger
+
+import smiter
+from smiter.lib import split_path
+from smiter.mzml_writer import (
+    ARRAY_TYPES,
+    CHROMATOGRAM_TYPES,
+    COMPRESSIONS,
+    ENCODINGS,
+    ID_FORMAT,
+    MzMLTemplateWriter,
+    decode_array,
+    read_index,
+)
+from smiter.parallel_gzip import ParallelGzipWriter, is_gzip_path
+
+if TYPE_CHECKING:  # pragma: no cover
+    # synthetic_mzml imports this module
+    from smiter.synthetic_mzml import Scan
+
+MANIFEST_FORMAT = "smiter mzML shards"
+MANIFEST_SUFFIX = ".shards.json"
+
+# bytes read at once while searching the end of an element
+_READ_CHUNK_SIZE = 2**16
+
+_ACCESSION_RE = re.compile(r'accession="([^"]+)"')
+_SPECTRUM_INDEX_RE = re.compile(rb'(<spectrum\b[^>]*?\bindex=")\d+(")')
+
+
+def _accession(cv_param: str) -> str:
+    match = _ACCESSION_RE.search(cv_param)
+    if match is None:
+        raise Exception(f"No accession in {cv_param}")
+    return match.group(1)
+
+
+_ARRAY_NAMES = {_accession(cv): name for name, cv in ARRAY_TYPES.items()}
+_CHROMATOGRAM_TYPE_NAMES = {
+    _accession(cv): name for name, cv in CHROMATOGRAM_TYPES.items()
+}
+# (dtype accession, compression accession): (encoding, compression)
+_DECODINGS = {
+    (_accession(dtype_cv), _accession(compression_cv)): (encoding, compression)
+    for encoding, (_, dtype_cv, algorithm) in ENCODINGS.items()
+    for (compression_algorithm, compression), compression_cv in COMPRESSIONS.items()
+    if compression_algorithm == algorithm
+}
+
+
+def shard_path(file: Union[str, pathlib.PurePath], shard: int) -> str:
+    """Get the path of a shard, e.g. run.shard001.mzML for run.mzML.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): path of the unsharded output
+        shard (int): shard number
+
+    Returns:
+        str: shard path
+    """
+    parent, stem, suffix = split_path(file)
+    return str(parent / f"{stem}.shard{shard:03d}{suffix}")
+
+
+def manifest_path(file: Union[str, pathlib.PurePath]) -> str:
+    """Get the manifest path, e.g. run.shards.json for run.mzML.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): path of the unsharded output
+
+    Returns:
+        str: manifest path
+    """
+    parent, stem, _ = split_path(file)
+    return str(parent / f"{stem}{MANIFEST_SUFFIX}")
+
+
+def split_scans(
+    scans: List[Tuple["Scan", List["Scan"]]],
+    n_shards: int,
+    rt_range: Tuple[float, float] = None,
+) -> Tuple[np.ndarray, List[List[Tuple["Scan", List["Scan"]]]]]:
+    """Partition scans into equally wide retention time ranges.
+
+    MSn scans always stay in the shard of their MS1 scan.
+
+    Args:
+        scans (List[Tuple[Scan, List[Scan]]]): MS1 scans and their MSn scans
+        n_shards (int): number of shards
+        rt_range (Tuple[float, float], optional): retention time range to
+            split, defaults to the range of the MS1 scans
+
+    Returns:
+        Tuple[np.ndarray, List[List[Tuple[Scan, List[Scan]]]]]: n_shards + 1
+            retention time edges and the scans of each shard
+    """
+    rts = np.array([scan.retention_time for scan, _ in scans], dtype=np.float64)
+    if rt_range is None:
+        rt_range = (rts.min(), rts.max()) if len(rts) > 0 else (0.0, 0.0)
+    edges = np.linspace(rt_range[0], rt_range[1], n_shards + 1)
+    # the last range includes its upper edge, scans outside are clipped
+    shard_of_scan = np.clip(
+        np.searchsorted(edges, rts, side="right") - 1, 0, n_shards - 1
+    )
+    shards: List[List[Tuple["Scan", List["Scan"]]]] = [[] for _ in range(n_shards)]
+    for shard, scan in zip(shard_of_scan, scans):
+        shards[shard].append(scan)
+    return edges, shards
+
+
+def split_chromatograms(
+    chromatograms: List[Tuple[str, np.ndarray, np.ndarray, str]], edges: np.ndarray
+) -> List[List[Tuple[str, np.ndarray, np.ndarray, str]]]:
+    """Split chromatograms at the retention time edges of the shards.
+
+    Args:
+        chromatograms (List[Tuple[str, np.ndarray, np.ndarray, str]]): id, time
+            array, intensity array and type of each chromatogram
+        edges (np.ndarray): retention time edges returned by
+            :py:func:`split_scans`
+
+    Returns:
+        List[List[Tuple[str, np.ndarray, np.ndarray, str]]]: chromatograms of
+            each shard, possibly with empty arrays
+    """
+    n_shards = len(edges) - 1
+    shards: List[List[Tuple[str, np.ndarray, np.ndarray, str]]] = [
+        [] for _ in range(n_shards)
+    ]
+    for chrom_id, time_array, intensity_array, chrom_type in chromatograms:
+        time_array = np.asarray(time_array)
+        intensity_array = np.asarray(intensity_array)
+        shard_of_point = np.clip(
+            np.searchsorted(edges, time_array, side="right") - 1, 0, n_shards - 1
+        )
+        for shard in range(n_shards):
+            mask = shard_of_point == shard
+            shards[shard].append(
+                (chrom_id, time_array[mask], intensity_array[mask], chrom_type)
+            )
+    return shards
+
+
+def write_manifest(
+    file: Union[str, pathlib.PurePath],
+    edges: np.ndarray,
+    shards: List[List[Tuple["Scan", List["Scan"]]]],
+    writer: str,
+) -> str:
+    """Write the json manifest describing all shards.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): path of the unsharded output
+        edges (np.ndarray): retention time edges of the shards
+        shards (List[List[Tuple[Scan, List[Scan]]]]): scans of each shard
+        writer (str): mzML writer used for the shards
+
+    Returns:
+        str: manifest path
+    """
+    shard_entries: List[dict] = []
+    for n, shard_scans in enumerate(shards):
+        scan_ids = [scan.id for scan, products in shard_scans] + [
+            prod.id for _, products in shard_scans for prod in products
+        ]
+        shard_entries.append(
+            {
+                "file": os.path.basename(shard_path(file, n)),
+                "rt_start": float(edges[n]),
+                "rt_end": float(edges[n + 1]),
+                "ms1_count": len(shard_scans),
+                "spectrum_count": len(scan_ids),
+                "first_scan_id": min(scan_ids) if scan_ids else None,
+                "last_scan_id": max(scan_ids) if scan_ids else None,
+            }
+        )
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "version": smiter.__version__,
+        "writer": writer,
+        "id_format": ID_FORMAT,
+        "spectrum_count": sum([entry["spectrum_count"] for entry in shard_entries]),
+        "shards": shard_entries,
+    }
+    path = manifest_path(file)
+    with open(path, "w") as fout:
+        json.dump(manifest, fout, indent=2)
+    return path
+
+
+def read_manifest(file: Union[str, pathlib.PurePath]) -> dict:
+    """Read a shard manifest and resolve the shard paths.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): path to the manifest
+
+    Raises:
+        Exception: if file is not a shard manifest
+
+    Returns:
+        dict: manifest, shard file entries are absolute paths
+    """
+    with open(file) as fin:
+        manifest = json.load(fin)
+    if manifest.get("format") != MANIFEST_FORMAT:
+        raise Exception(f"{file} is not a shard manifest")
+    parent = pathlib.Path(file).parent.resolve()
+    for entry in manifest["shards"]:
+        entry["file"] = str(parent / entry["file"])
+    return manifest
+
+
+def _open_shard(file: str) -> BinaryIO:
+    if file.endswith(".mzMLb"):
+        raise Exception(f"Can not stitch mzMLb shard {file}, only mzML is supported")
+    if is_gzip_path(file):
+        return cast(BinaryIO, gzip.open(file, "rb"))
+    return open(file, "rb")
+
+
+def _read_element(fin: BinaryIO, offset: int, tag: bytes) -> bytes:
+    """Read an element starting at offset up to its closing tag.
+
+    Args:
+        fin (BinaryIO): seekable binary file object
+        offset (int): offset of the opening tag
+        tag (bytes): element name, e.g. b"spectrum"
+
+    Raises:
+        Exception: if the closing tag is missing
+
+    Returns:
+        bytes: element xml
+    """
+    close_tag = b"</" + tag + b">"
+    fin.seek(offset)
+    data = bytearray()
+    while True:
+        chunk = fin.read(_READ_CHUNK_SIZE)
+        if len(chunk) == 0:
+            raise Exception(f"No closing {close_tag.decode()} for element at {offset}")
+        search_start = max(0, len(data) - len(close_tag))
+        data += chunk
+        end = data.find(close_tag, search_start)
+        if end >= 0:
+            return bytes(data[: end + len(close_tag)])
+
+
+def _decode_chromatogram(
+    xml: bytes,
+) -> Tuple[np.ndarray, np.ndarray, Optional[str]]:
+    """Decode time and intensity array of a chromatogram element.
+
+    Args:
+        xml (bytes): chromatogram element
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, Optional[str]]: time array, intensity
+            array and chromatogram type, None if unknown
+    """
+    element = ElementTree.fromstring(xml)
+    chrom_type = None
+    for param in element.findall("cvParam"):
+        accession = param.get("accession", "")
+        if accession in _CHROMATOGRAM_TYPE_NAMES:
+            chrom_type = _CHROMATOGRAM_TYPE_NAMES[accession]
+        elif param.get("name") in CHROMATOGRAM_TYPES:
+            # psims writes the parent term, e.g. MS:1000285 total ion current
+            chrom_type = param.get("name")
+    arrays = {}
+    for bda in element.iter("binaryDataArray"):
+        accessions = [param.get("accession", "") for param in bda.iter("cvParam")]
+        array_name = next(
+            _ARRAY_NAMES[acc] for acc in accessions if acc in _ARRAY_NAMES
+        )
+        encoding, compression = next(
+            _DECODINGS[(dtype_acc, compression_acc)]
+            for dtype_acc in accessions
+            for compression_acc in accessions
+            if (dtype_acc, compression_acc) in _DECODINGS
+        )
+        binary = (bda.findtext("binary") or "").encode("ascii")
+        arrays[array_name] = decode_array(binary, encoding, compression)
+    return arrays["time"], arrays["i"], chrom_type
+
+
+def stitch_shards(
+    manifest_file: Union[str, pathlib.PurePath],
+    file: Union[str, BinaryIO],
+    gzip_block_index: bool = False,
+    n_jobs: int = 1,
+) -> None:
+    """Combine the shards of a manifest into a single indexedmzML.
+
+    Spectra are copied without decoding, only their index attribute is
+    renumbered. Chromatograms with the same id are concatenated in shard
+    order, so the TIC and XICs cover the whole run.
+
+    Args:
+        manifest_file (Union[str, pathlib.PurePath]): path to the manifest
+        file (Union[str, BinaryIO]): output path or binary file object
+        gzip_block_index (bool, optional): write a block index next to .gz
+            output
+        n_jobs (int, optional): threads compressing .gz output
+
+    Raises:
+        Exception: if a shard does not contain the spectra of the manifest
+    """
+    manifest = read_manifest(manifest_file)
+    logger.info(
+        f"Stitch {len(manifest['shards'])} shards with "
+        f"{manifest['spectrum_count']} spectra"
+    )
+    gzip_writer = None
+    output: Union[str, BinaryIO] = file
+    if is_gzip_path(file):
+        gzip_writer = ParallelGzipWriter(
+            file, n_jobs=n_jobs, index_file=gzip_block_index or None
+        )
+        output = cast(BinaryIO, gzip_writer)
+    chromatograms: Dict[str, list] = {}
+    try:
+        with MzMLTemplateWriter(output) as writer:
+            writer.write_header(manifest["spectrum_count"])
+            for entry in manifest["shards"]:
+                with _open_shard(entry["file"]) as fin:
+                    index = read_index(fin)
+                    if len(index["spectrum"]) != entry["spectrum_count"]:
+                        raise Exception(
+                            f"{entry['file']} contains {len(index['spectrum'])} "
+                            f"spectra, expected {entry['spectrum_count']}"
+                        )
+                    for spec_id, offset in index["spectrum"].items():
+                        xml = _SPECTRUM_INDEX_RE.sub(
+                            rb"\g<1>%d\g<2>" % len(writer.spectrum_offsets),
+                            _read_element(fin, offset, b"spectrum"),
+                            count=1,
+                        )
+                        writer.write_spectrum_xml(spec_id, b"        " + xml + b"\n")
+                    for chrom_id, offset in index["chromatogram"].items():
+                        time_array, intensity_array, chrom_type = _decode_chromatogram(
+                            _read_element(fin, offset, b"chromatogram")
+                        )
+                        merged = chromatograms.setdefault(
+                            chrom_id, [[], [], chrom_type]
+                        )
+                        merged[0].append(time_array)
+                        merged[1].append(intensity_array)
+            writer.write_chromatograms(
+                [
+                    (
+                        chrom_id,
+                        np.concatenate(times),
+                        np.concatenate(intensities),
+                        chrom_type,
+                    )
+                    for chrom_id, (
+                        times,
+                        intensities,
+                        chrom_type,
+                    ) in chromatograms.items()
+                ]
+            )
+    finally:
+        if gzip_writer is not None:
+            gzip_writer.close()
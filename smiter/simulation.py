@@ -0,0 +1,275 @@
+"""Simulations described by TOML or YAML config files.
+
+A config names the peak table, the plugins and the outputs of a run::
+
+    peak_properties = "peaks.csv"
+
+    [mzml_params]
+    gradient_length = 30
+
+    [fragmentor]
+    name = "PeptideFragmentorPyteomics"
+
+    [noise_injector]
+    name = "UniformNoiseInjector"
+    kwargs = {dropout = 0.1, ppm_noise = 5e-6, intensity_noise = 0.1}
+
+    [outputs]
+    mzml = "run.mzML"
+    mgf = "run.mgf"
+
+An optional ``[sweep]`` table maps mzML params to lists of values for
+:py:func:`run_simulation_sweep`. Plugins are classes of
+:py:mod:`smiter.fragmentation_functions` and :py:mod:`smiter.noise_functions`
+or ``package.module:Class`` paths. Relative paths are resolved against the
+directory of the config file.
+"""
+
+import importlib
+import json
+import pathlib
+import random
+from typing import BinaryIO, Dict, List, Union
+
+import numpy as np
+from loguru import logger
+
+import smiter.fragmentation_functions
+import smiter.noise_functions
+from smiter.fragmentation_functions import AbstractFragmentor
+from smiter.metrics import MetricsCollector
+from smiter.noise_functions import AbstractNoiseInjector
+from smiter.output_sinks import AbstractSink, MGFSink, NpzSink, ParquetSink
+from smiter.peak_table import PeakTable, read_peak_table
+from smiter.stage_cache import StageCache, file_key
+from smiter.sweep import run_sweep
+from smiter.synthetic_mzml import write_mzml
+
+try:
+    import tomllib
+except ImportError:  # pragma: no cover
+    try:
+        import tomli as tomllib  # type: ignore[no-redef]
+    except ImportError:
+        tomllib = None  # type: ignore[assignment]
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover
+    yaml = None
+
+# outputs written by sinks next to the mzML
+SINKS = {"mgf": MGFSink, "npz": NpzSink, "parquet": ParquetSink}
+
+# mzML writer used if the config does not choose one, the fastest backend
+DEFAULT_WRITER = "native"
+
+
+def load_config(file: Union[str, pathlib.PurePath]) -> dict:
+    """Load a simulation config.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): .toml, .yaml or .yml file
+
+    Raises:
+        Exception: for unknown formats, missing parsers or missing keys
+
+    Returns:
+        dict: config with paths resolved against the config directory
+    """
+    path = pathlib.Path(file)
+    if path.suffix == ".toml":
+        if tomllib is None:
+            raise Exception("tomli is required to read TOML configs")
+        with open(path, "rb") as fin:
+            config = tomllib.load(fin)
+    elif path.suffix in (".yaml", ".yml"):
+        if yaml is None:
+            raise Exception("pyyaml is required to read YAML configs")
+        with open(path) as fin:
+            config = yaml.safe_load(fin)
+    else:
+        raise Exception(f"Unknown config format {path.suffix}, use .toml or .yaml")
+    for key in ("peak_properties", "fragmentor", "noise_injector"):
+        if key not in config:
+            raise Exception(f"{key} is missing in config {file}")
+    config.setdefault("mzml_params", {})
+    config.setdefault("outputs", {})
+    config["peak_properties"] = str(path.parent / config["peak_properties"])
+    config["outputs"] = {
+        name: str(path.parent / output) for name, output in config["outputs"].items()
+    }
+    return config
+
+
+def build_plugin(spec: Union[str, dict], module, base_class: type):
+    """Instantiate a fragmentor or noise injector.
+
+    Args:
+        spec (Union[str, dict]): class name or dict with name and kwargs
+        module (module): module searched for plain class names
+        base_class (type): required base class
+
+    Raises:
+        Exception: if the class does not exist or has the wrong base class
+
+    Returns:
+        object: plugin instance
+    """
+    if isinstance(spec, str):
+        spec = {"name": spec}
+    name = spec["name"]
+    if ":" in name:
+        module_name, name = name.split(":", 1)
+        module = importlib.import_module(module_name)
+    plugin_class = getattr(module, name, None)
+    if not isinstance(plugin_class, type) or not issubclass(plugin_class, base_class):
+        raise Exception(f"{spec['name']} is not a {base_class.__name__}")
+    return plugin_class(**spec.get("kwargs", {}))
+
+
+def build_sinks(outputs: Dict[str, str]) -> List[AbstractSink]:
+    """Create the sinks of all non-mzML outputs.
+
+    Args:
+        outputs (Dict[str, str]): path by output name, see :py:data:`SINKS`
+
+    Raises:
+        Exception: for unknown outputs
+
+    Returns:
+        List[AbstractSink]: sinks
+    """
+    sinks = []
+    for name, file in outputs.items():
+        if name == "mzml":
+            continue
+        if name not in SINKS:
+            raise Exception(
+                f"Unknown output {name}, choose mzml or one of {list(SINKS)}"
+            )
+        sinks.append(SINKS[name](file))
+    return sinks
+
+
+def load_peak_table(file: str, cache: StageCache = None) -> PeakTable:
+    """Read a peak table, reusing the parsed table cached in cache.
+
+    Args:
+        file (str): csv, parquet or arrow peak table
+        cache (StageCache, optional): stage cache, tables are keyed by the
+            content hash of the input
+
+    Returns:
+        PeakTable: validated table
+    """
+    if cache is None:
+        return read_peak_table(file)
+    return cache.get("peak_table", file_key(file), lambda: read_peak_table(file))
+
+
+def run_simulation(
+    config: dict,
+    n_jobs: int = None,
+    seed: int = None,
+    stream: BinaryIO = None,
+    cache_dir: str = None,
+    metrics: MetricsCollector = None,
+) -> str:
+    """Run the simulation described by a config.
+
+    Args:
+        config (dict): config, see :py:func:`load_config`
+        n_jobs (int, optional): writer threads, overrides writer_jobs
+        seed (int, optional): seed of the noise and selection random numbers
+        stream (BinaryIO, optional): write the mzML to this stream instead
+            of outputs.mzml
+        cache_dir (str, optional): directory of the
+            :py:class:`smiter.stage_cache.StageCache` of all stages preceding
+            scan generation
+        metrics (MetricsCollector, optional): records stage times and counts,
+            including reading the peak table
+
+    Raises:
+        Exception: if no mzML output is given
+
+    Returns:
+        str: name of the written mzML or shard manifest
+    """
+    mzml_params = dict(config["mzml_params"])
+    mzml_params.setdefault("mzml_writer", DEFAULT_WRITER)
+    if n_jobs is not None:
+        mzml_params["writer_jobs"] = n_jobs
+    if stream is None and "mzml" not in config["outputs"]:
+        raise Exception("outputs.mzml is missing in config")
+    logger.info(f"Run simulation with {json.dumps(mzml_params, default=str)}")
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    cache = None if cache_dir is None else StageCache(cache_dir)
+    if metrics is None:
+        metrics = MetricsCollector()
+    with metrics.stage("peak_table"):
+        peak_table = load_peak_table(config["peak_properties"], cache=cache)
+    fragmentor = build_plugin(
+        config["fragmentor"], smiter.fragmentation_functions, AbstractFragmentor
+    )
+    noise_injector = build_plugin(
+        config["noise_injector"], smiter.noise_functions, AbstractNoiseInjector
+    )
+    return write_mzml(
+        stream if stream is not None else config["outputs"]["mzml"],
+        peak_table,
+        fragmentor,
+        noise_injector,
+        mzml_params,
+        sinks=build_sinks(config["outputs"]),
+        cache=cache,
+        metrics=metrics,
+    )
+
+
+def run_simulation_sweep(
+    config: dict, n_jobs: int = 1, seed: int = None, cache_dir: str = None
+) -> str:
+    """Run the parameter sweep described by the sweep table of a config.
+
+    The sweep table maps mzML params to lists of values, all combinations
+    are simulated by :py:func:`smiter.sweep.run_sweep`. Sink outputs are not
+    written for sweeps.
+
+    Args:
+        config (dict): config, see :py:func:`load_config`
+        n_jobs (int, optional): number of worker processes
+        seed (int, optional): seed the grid point random streams are spawned
+            from
+        cache_dir (str, optional): directory of the stage cache
+
+    Raises:
+        Exception: if sweep or outputs.mzml is missing
+
+    Returns:
+        str: path of the sweep manifest
+    """
+    if "sweep" not in config:
+        raise Exception("sweep is missing in config")
+    if "mzml" not in config["outputs"]:
+        raise Exception("outputs.mzml is missing in config")
+    mzml_params = dict(config["mzml_params"])
+    mzml_params.setdefault("mzml_writer", DEFAULT_WRITER)
+    cache = None if cache_dir is None else StageCache(cache_dir)
+    return run_sweep(
+        config["outputs"]["mzml"],
+        load_peak_table(config["peak_properties"], cache=cache),
+        build_plugin(
+            config["fragmentor"], smiter.fragmentation_functions, AbstractFragmentor
+        ),
+        build_plugin(
+            config["noise_injector"], smiter.noise_functions, AbstractNoiseInjector
+        ),
+        mzml_params,
+        config["sweep"],
+        seed=seed,
+        n_jobs=n_jobs,
+        cache=cache,
+    )
@@ -0,0 +1,158 @@
+"""Content-hashed cache of simulation pipeline stages.
+
+Every stage output is stored as a pickle named ``<stage>-<key>.pkl``, where
+the key is the SHA-256 of the stage inputs and parameters. Files are touched
+on every hit and the least recently used files are evicted once the cache
+grows beyond its size limit. Writes go through a temporary file, so
+concurrent runs sharing a cache directory never read partial files.
+"""
+
+import hashlib
+import os
+import pathlib
+import pickle
+import tempfile
+from typing import Callable, TypeVar, Union
+
+from loguru import logger
+
+# bump to invalidate caches written by older versions of the stages
+CACHE_VERSION = 1
+
+DEFAULT_MAX_SIZE = 4 * 2**30
+
+CACHE_SUFFIX = ".pkl"
+
+# type of a stage output
+T = TypeVar("T")
+
+
+def content_key(*parts) -> str:
+    """Hash stage inputs and parameters.
+
+    Args:
+        *parts: picklable inputs, e.g. peak properties or keys of upstream
+            stages
+
+    Returns:
+        str: hex SHA-256 digest
+    """
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    for part in parts:
+        digest.update(pickle.dumps(part, protocol=4))
+    return digest.hexdigest()
+
+
+def file_key(file: Union[str, pathlib.PurePath], chunk_size: int = 2**20) -> str:
+    """Hash the content of a file.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): input file
+        chunk_size (int, optional): bytes read at once
+
+    Returns:
+        str: hex SHA-256 digest
+    """
+    digest = hashlib.sha256(str(CACHE_VERSION).encode())
+    with open(file, "rb") as fin:
+        for chunk in iter(lambda: fin.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StageCache(object):
+    """Directory of pickled stage outputs with LRU eviction."""
+
+    def __init__(
+        self, directory: Union[str, pathlib.PurePath], max_size: int = DEFAULT_MAX_SIZE
+    ):
+        """Initialize cache.
+
+        Args:
+            directory (Union[str, pathlib.PurePath]): cache directory, created
+                if missing
+            max_size (int, optional): size limit of all cached files in bytes
+        """
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, stage: str, key: str) -> pathlib.Path:
+        """Get the file of a stage output.
+
+        Args:
+            stage (str): stage name
+            key (str): content key of the stage inputs
+
+        Returns:
+            pathlib.Path: pickle file
+        """
+        return self.directory / f"{stage}-{key}{CACHE_SUFFIX}"
+
+    def get(self, stage: str, key: str, compute: Callable[[], T]) -> T:
+        """Load a stage output or compute and store it.
+
+        Args:
+            stage (str): stage name
+            key (str): content key of the stage inputs
+            compute (Callable[[], T]): computes the output on a miss
+
+        Returns:
+            T: stage output
+        """
+        path = self.path(stage, key)
+        try:
+            with open(path, "rb") as fin:
+                value = pickle.load(fin)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+        else:
+            logger.info(f"Stage {stage}: cache hit {key[:12]}")
+            self.hits += 1
+            os.utime(path)
+            return value
+        logger.info(f"Stage {stage}: cache miss {key[:12]}")
+        self.misses += 1
+        value = compute()
+        self.put(stage, key, value)
+        return value
+
+    def put(self, stage: str, key: str, value: object):
+        """Store a stage output and evict old outputs.
+
+        Args:
+            stage (str): stage name
+            key (str): content key of the stage inputs
+            value (object): picklable stage output
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fout:
+                pickle.dump(value, fout, protocol=4)
+            os.replace(tmp_path, self.path(stage, key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used outputs until the size limit is met."""
+        files = []
+        for path in self.directory.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in sorted(files, key=lambda file: file[0]):
+            if size <= self.max_size:
+                break
+            logger.info(f"Evict {path.name} from stage cache")
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            size -= file_size
@@ -0,0 +1,150 @@
+"""Molecule summary tables.
+
+The summary lists the peak properties of every molecule together with the
+realized simulation stats taken from the ``mol_scan_dict`` returned by
+:py:func:`smiter.synthetic_mzml.generate_scans`. Columns are built once and
+written in chunks as CSV or, if pyarrow is installed, as Parquet.
+"""
+
+import csv
+import itertools
+import pathlib
+from typing import IO, Dict, Union
+
+from loguru import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+DEFAULT_CHUNK_SIZE = 100000
+
+# write buffer of csv files
+_BUFFER_SIZE = 2**20
+
+_PARQUET_TYPES = {
+    "charge": "int64",
+    "scan_start_time": "float64",
+    "peak_width": "float64",
+    "peak_scaling_factor": "float64",
+    "first_scan": "int64",
+    "last_scan": "int64",
+    "ms1_scans": "int64",
+    "ms2_events": "int64",
+    "total_intensity": "float64",
+}
+
+
+def summary_columns(
+    peak_properties: Dict[str, dict], mol_scan_dict: Dict[str, dict] = None
+) -> Dict[str, list]:
+    """Collect the summary columns of all molecules.
+
+    Args:
+        peak_properties (Dict[str, dict]): peak properties by trivial name
+        mol_scan_dict (Dict[str, dict], optional): realized stats by trivial
+            name, stats columns are only added if given
+
+    Returns:
+        Dict[str, list]: values by column name
+    """
+    properties = list(peak_properties.values())
+    columns = {
+        "chemical_formula": [p.get("chemical_formula", "") for p in properties],
+        "trivial_name": list(peak_properties),
+        "charge": [p.get("charge", 2) for p in properties],
+        "scan_start_time": [p["scan_start_time"] for p in properties],
+        "peak_width": [p["peak_width"] for p in properties],
+        "peak_scaling_factor": [p.get("peak_scaling_factor", 1e3) for p in properties],
+        "peak_function": [p["peak_function"] for p in properties],
+        "peak_params": [
+            ",".join(f"{key}={val}" for key, val in p["peak_params"].items())
+            for p in properties
+        ],
+    }
+    if mol_scan_dict is not None:
+        empty: Dict[str, list] = {"ms1_scans": [], "ms2_scans": []}
+        stats = [mol_scan_dict.get(mol, empty) for mol in peak_properties]
+        scan_ids = [s["ms1_scans"] + s["ms2_scans"] for s in stats]
+        columns["first_scan"] = [min(ids) if ids else None for ids in scan_ids]
+        columns["last_scan"] = [max(ids) if ids else None for ids in scan_ids]
+        columns["ms1_scans"] = [len(s["ms1_scans"]) for s in stats]
+        columns["ms2_events"] = [s.get("frag_events", 0) for s in stats]
+        columns["total_intensity"] = [float(s.get("ms1_intensity", 0.0)) for s in stats]
+    return columns
+
+
+def _write_csv(columns: Dict[str, list], csv_file: IO[str], chunk_size: int):
+    writer = csv.writer(csv_file)
+    writer.writerow(list(columns))
+    rows = zip(*columns.values())
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if len(chunk) == 0:
+            break
+        writer.writerows(chunk)
+
+
+def _write_parquet(
+    columns: Dict[str, list],
+    file: Union[str, pathlib.PurePath, IO[bytes]],
+    chunk_size: int,
+):
+    if pa is None:
+        raise Exception("pyarrow is required to write Parquet summaries")
+    table = pa.table(
+        {
+            name: pa.array(values, type=_PARQUET_TYPES.get(name, "string"))
+            for name, values in columns.items()
+        }
+    )
+    if isinstance(file, pathlib.PurePath):
+        file = str(file)
+    pq.write_table(table, file, row_group_size=chunk_size)
+
+
+def write_molecule_summary(
+    file: Union[str, pathlib.PurePath, IO],
+    peak_properties: Dict[str, dict],
+    mol_scan_dict: Dict[str, dict] = None,
+    file_format: str = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> str:
+    """Write the molecule summary.
+
+    Args:
+        file (Union[str, pathlib.PurePath, IO]): output path, text file
+            object for csv or binary file object for parquet, csv file
+            objects are closed after writing
+        peak_properties (Dict[str, dict]): peak properties by trivial name
+        mol_scan_dict (Dict[str, dict], optional): realized stats returned by
+            :py:func:`smiter.synthetic_mzml.generate_scans`
+        file_format (str, optional): csv or parquet, parquet for paths ending
+            with .parquet if None
+        chunk_size (int, optional): rows per csv write or Parquet row group
+
+    Raises:
+        Exception: for unknown formats
+
+    Returns:
+        str: name of the written file
+    """
+    logger.info(f"Write molecule summary to {file}")
+    filename = str(getattr(file, "name", file))
+    if file_format is None:
+        file_format = "parquet" if filename.endswith(".parquet") else "csv"
+    if file_format not in ("csv", "parquet"):
+        raise Exception(f"Unknown summary format {file_format}, use csv or parquet")
+    columns = summary_columns(peak_properties, mol_scan_dict)
+    if file_format == "parquet":
+        _write_parquet(columns, file, chunk_size)
+    elif isinstance(file, (str, pathlib.PurePath)):
+        with open(file, "w", newline="", buffering=_BUFFER_SIZE) as fout:
+            _write_csv(columns, fout, chunk_size)
+    else:
+        with file:
+            _write_csv(columns, file, chunk_size)
+    return filename
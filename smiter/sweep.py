@@ -0,0 +1,145 @@
+"""Parameter sweeps over grids of mzML params.
+
+All grid points simulate the same molecules, so the parameter independent
+stages (peak properties, isotopologue library, interval tree and fragment
+spectra) are computed once by :py:func:`smiter.replicates.prepare_shared` and
+only scan generation and writing run per grid point. The runs are recorded
+in a JSON manifest::
+
+    {
+        "format": "smiter parameter sweep",
+        "mzml_params": {...},
+        "grid": {"dynamic_exclusion": [10, 30], ...},
+        "shared_seconds": {"library": 1.2, ...},
+        "runs": [{"file": "run.sweep000.mzML", "params": {...}, "seconds": 3.4}]
+    }
+"""
+
+import itertools
+import json
+import pathlib
+from typing import Dict, List, Union
+
+from loguru import logger
+
+from smiter.fragmentation_functions import AbstractFragmentor
+from smiter.lib import check_mzml_params, split_path
+from smiter.noise_functions import AbstractNoiseInjector
+from smiter.peak_table import PeakTable
+from smiter.replicates import prepare_shared, run_shared
+from smiter.stage_cache import StageCache
+
+MANIFEST_FORMAT = "smiter parameter sweep"
+MANIFEST_SUFFIX = ".sweep.json"
+
+
+def expand_grid(grid: Dict[str, list]) -> List[dict]:
+    """Get all combinations of a parameter grid.
+
+    Args:
+        grid (Dict[str, list]): values by mzML param
+
+    Returns:
+        List[dict]: params of every grid point, the last param varies fastest
+    """
+    names = list(grid)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+
+def sweep_path(file: Union[str, pathlib.PurePath], point: int) -> str:
+    """Get the path of a grid point, e.g. run.sweep001.mzML for run.mzML.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): base path of the sweep
+        point (int): grid point number
+
+    Returns:
+        str: path of the grid point
+    """
+    parent, stem, suffix = split_path(file)
+    return str(parent / f"{stem}.sweep{point:03d}{suffix}")
+
+
+def sweep_manifest_path(file: Union[str, pathlib.PurePath]) -> str:
+    """Get the manifest path, e.g. run.sweep.json for run.mzML.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): base path of the sweep
+
+    Returns:
+        str: manifest path
+    """
+    parent, stem, _ = split_path(file)
+    return str(parent / f"{stem}{MANIFEST_SUFFIX}")
+
+
+def run_sweep(
+    file: Union[str, pathlib.PurePath],
+    peak_properties: Union[Dict[str, dict], PeakTable],
+    fragmentor: AbstractFragmentor,
+    noise_injector: AbstractNoiseInjector,
+    mzml_params: Dict[str, Union[int, float, str]],
+    grid: Dict[str, list],
+    seed: int = None,
+    n_jobs: int = 1,
+    cache: StageCache = None,
+) -> str:
+    """Simulate every point of a parameter grid.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): base path, grid points are
+            written to :py:func:`sweep_path`
+        peak_properties (Union[Dict[str, dict], PeakTable]): peak properties of
+            all molecules
+        fragmentor (AbstractFragmentor): fragmentor of all grid points
+        noise_injector (AbstractNoiseInjector): noise injector of all grid
+            points
+        mzml_params (Dict[str, Union[int, float, str]]): params shared by all
+            grid points
+        grid (Dict[str, list]): values of the swept params
+        seed (int, optional): seed the random streams of the grid points are
+            spawned from
+        n_jobs (int, optional): number of worker processes
+        cache (StageCache, optional): cache of the shared stages
+
+    Raises:
+        Exception: if the grid is empty or a grid point has invalid params
+
+    Returns:
+        str: path of the manifest
+    """
+    points = expand_grid(grid)
+    if len(grid) == 0 or len(points) == 0:
+        raise Exception("Parameter grid is empty")
+    for point in points:
+        check_mzml_params(dict(mzml_params, **point))
+    logger.info(f"Sweep {len(points)} grid points of {list(grid)}")
+    shared = prepare_shared(
+        peak_properties, fragmentor, noise_injector, mzml_params, cache=cache
+    )
+    files = [sweep_path(file, n) for n in range(len(points))]
+    runs = run_shared(shared, files, seed=seed, params=points, n_jobs=n_jobs)
+    manifest_file = sweep_manifest_path(file)
+    manifest_dir = pathlib.Path(manifest_file).resolve().parent
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "mzml_params": shared["mzml_params"],
+        "grid": grid,
+        "seed": seed,
+        "shared_seconds": shared["timings"],
+        "runs": [
+            {
+                "file": str(pathlib.Path(filename).resolve().relative_to(manifest_dir)),
+                "params": point,
+                "seconds": seconds,
+            }
+            for (filename, seconds), point in zip(runs, points)
+        ],
+    }
+    with open(manifest_file, "w") as fout:
+        json.dump(manifest, fout, indent=2, default=str)
+    logger.info(f"Wrote sweep manifest {manifest_file}")
+    return manifest_file
@@ -3,8 +3,9 @@ import io
 import pathlib
 import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pformat
-from typing import Callable, Dict, List, Tuple, Union
+from typing import BinaryIO, Callable, Dict, List, Tuple, Union, cast
 from collections import Counter
 
 import numpy as np
@@ -16,15 +17,33 @@ from psims.mzml import MzMLWriter
 from tqdm import tqdm
 
 import smiter
-from smiter.fragmentation_functions import AbstractFragmentor
+from smiter.checkpoint import ScanCheckpoint
+from smiter.fragmentation_functions import AbstractFragmentor, CachedFragmentor
+from smiter.hooks import Hooks
+from smiter.hooks import hooks as default_hooks
 from smiter.lib import (
     calc_mz,
     check_mzml_params,
     check_peak_properties,
-    peak_properties_to_csv,
 )
+from smiter.metrics import MetricsCollector, metrics_path
+from smiter.mzml_writer import DEFAULT_ENCODINGS, ID_FORMAT, MzMLTemplateWriter
+from smiter.mzmlb_writer import MzMLbWriter
+from smiter.parallel_gzip import ParallelGzipWriter, is_gzip_path
 from smiter.noise_functions import AbstractNoiseInjector
+from smiter.output_sinks import AbstractSink, write_to_sinks
 from smiter.peak_distribution import distributions
+from smiter.peak_table import PeakTable
+from smiter.provenance import ProvenanceBuffer, match_peaks
+from smiter.sharding import (
+    shard_path,
+    split_chromatograms,
+    split_scans,
+    write_manifest,
+)
+from smiter.stage_cache import StageCache, content_key
+from smiter.summary import write_molecule_summary
+from smiter.xic import XICBuffer
 
 warnings.filterwarnings("ignore")
 
@@ -127,67 +146,275 @@ def generate_interval_tree(peak_properties):
     return tree
 
 
-# @profile
-def write_mzml(
-    file: Union[str, io.TextIOWrapper],
+def build_library(peak_properties: Dict[str, dict]) -> dict:
+    """Build the structures of a simulation that only depend on the molecules.
+
+    The library can be shared by all runs of the same peak properties, e.g.
+    replicates differing in noise or runs with different mzML params.
+
+    Args:
+        peak_properties (Dict[str, dict]): checked peak properties
+
+    Returns:
+        dict: isotopologue_lib and interval_tree
+    """
+    trivial_names = {}
+    charges = set()
+    for key, val in peak_properties.items():
+        trivial_names[val["chemical_formula"]] = key
+        charges.add(val["charge"])
+    # dicts are sorted, language specification since python 3.7+
+    isotopologue_lib = generate_molecule_isotopologue_lib(
+        peak_properties, trivial_names=trivial_names, charges=charges
+    )
+    return {
+        "isotopologue_lib": isotopologue_lib,
+        "interval_tree": generate_interval_tree(peak_properties),
+    }
+
+
+def _fragmentor_key(fragmentor: AbstractFragmentor) -> tuple:
+    name = f"{type(fragmentor).__module__}.{type(fragmentor).__qualname__}"
+    try:
+        return (name, content_key(fragmentor))
+    except Exception:
+        # fragmentors holding unpicklable engines are keyed by their arguments
+        return (
+            name,
+            repr(getattr(fragmentor, "args", ())),
+            repr(getattr(fragmentor, "kwargs", {})),
+        )
+
+
+# mzml_params only affecting how and where the scans are written
+_OUTPUT_PARAMS = (
+    "mzml_writer",
+    "writer_jobs",
+    "mz_encoding",
+    "intensity_encoding",
+    "binary_compression",
+    "gzip_block_index",
+    "mzml_shards",
+    "summary_file",
+    "metrics_report",
+    "checkpoint_interval",
+    "resume",
+)
+
+
+def _checkpoint_key(
     peak_properties: Dict[str, dict],
     fragmentor: AbstractFragmentor,
-    noise_injector: AbstractNoiseInjector,
     mzml_params: Dict[str, Union[int, float, str]],
+) -> str:
+    # params which do not change the generated scans may differ on resume
+    params = {
+        name: value for name, value in mzml_params.items() if name not in _OUTPUT_PARAMS
+    }
+    if isinstance(fragmentor, CachedFragmentor):
+        fragmentor = fragmentor.fragmentor
+    return content_key(peak_properties, params, _fragmentor_key(fragmentor))
+
+
+def prepare_stages(
+    peak_properties: Union[Dict[str, dict], PeakTable],
+    fragmentor: AbstractFragmentor,
+    cache: StageCache = None,
+    warm_fragments: bool = False,
+    timings: Dict[str, float] = None,
+    metrics: MetricsCollector = None,
+) -> Tuple[Dict[str, dict], dict, AbstractFragmentor]:
+    """Run the stages preceding scan generation.
+
+    With a cache, checked peak properties, library and fragment spectra of
+    every molecule are loaded from or stored in the cache, keyed by the
+    content of the peak properties and the fragmentor.
+
+    Args:
+        peak_properties (Union[Dict[str, dict], PeakTable]): peak properties or
+            table
+        fragmentor (AbstractFragmentor): fragmentor
+        cache (StageCache, optional): stage cache
+        warm_fragments (bool, optional): fragment every molecule, always done
+            with a cache
+        timings (Dict[str, float], optional): filled with the seconds spent
+            in each stage
+        metrics (MetricsCollector, optional): records wall and CPU time of
+            each stage
+
+    Returns:
+        Tuple[Dict[str, dict], dict, AbstractFragmentor]: checked peak
+            properties, library (see :py:func:`build_library`) and the
+            fragmentor, wrapped in a CachedFragmentor if fragments are warmed
+    """
+    if timings is None:
+        timings = {}
+    if metrics is None:
+        metrics = MetricsCollector()
+
+    def _stage(stage, key, compute):
+        start = time.perf_counter()
+        with metrics.stage(stage):
+            value = compute() if cache is None else cache.get(stage, key, compute)
+        timings[stage] = time.perf_counter() - start
+        return value
+
+    input_key = None if cache is None else content_key(peak_properties)
+    checked: Dict[str, dict] = _stage(
+        "peak_properties", input_key, lambda: check_peak_properties(peak_properties)
+    )
+    library = _stage("library", input_key, lambda: build_library(checked))
+    if cache is not None or warm_fragments:
+        if not isinstance(fragmentor, CachedFragmentor):
+            fragmentor = CachedFragmentor(fragmentor)
+
+        def _fragments():
+            fragmentor.warm(list(checked))
+            return fragmentor.cache
+
+        fragment_key = None
+        if cache is not None:
+            fragment_key = content_key(
+                input_key, _fragmentor_key(fragmentor.fragmentor)
+            )
+        fragmentor.cache = _stage("fragments", fragment_key, _fragments)
+    return checked, library, fragmentor
+
+
+def write_mzml(
+    file: Union[str, io.TextIOWrapper, BinaryIO],
+    peak_properties: Union[Dict[str, dict], PeakTable],
+    fragmentor: AbstractFragmentor,
+    noise_injector: AbstractNoiseInjector,
+    mzml_params: dict,
+    sinks: List[AbstractSink] = None,
+    library: dict = None,
+    cache: StageCache = None,
+    metrics: MetricsCollector = None,
 ) -> str:
     """Write mzML file with chromatographic peaks and fragment spectra for the given molecules.
 
     Args:
-        file (Union[str, io.TextIOWrapper]): Description
+        file (Union[str, io.TextIOWrapper, BinaryIO]): Description
         molecules (List[str]): Description
         fragmentation_function (Callable[[str], List[Tuple[float, float]]], optional): Description
-        peak_properties (Dict[str, dict], optional): Description
+        peak_properties (Union[Dict[str, dict], PeakTable]): Description
+        sinks (List[AbstractSink], optional): additional outputs, e.g.
+            :py:class:`smiter.output_sinks.MGFSink`, fed with the same scans
+        library (dict, optional): isotopologue library and interval tree
+            returned by :py:func:`build_library` for these peak properties,
+            built if None
+        cache (StageCache, optional): cache of the stages preceding scan
+            generation, see :py:func:`prepare_stages`
+        metrics (MetricsCollector, optional): records stage times and counts
+            of this run, the report is written next to the mzML if
+            mzml_params["metrics_report"]
     """
     # check params and raise Exception(s) if necessary
     logger.info("Start generating mzML")
     mzml_params = check_mzml_params(mzml_params)
-    peak_properties = check_peak_properties(peak_properties)
-
-    interval_tree = generate_interval_tree(peak_properties)
+    if metrics is None:
+        metrics = MetricsCollector()
+    if library is None:
+        peak_properties, library, fragmentor = prepare_stages(
+            peak_properties, fragmentor, cache=cache, metrics=metrics
+        )
+    else:
+        with metrics.stage("peak_properties"):
+            peak_properties = check_peak_properties(peak_properties)
+    isotopologue_lib = library["isotopologue_lib"]
+    interval_tree = library["interval_tree"]
 
-    filename = file if isinstance(file, str) else file.name
+    if isinstance(file, (str, pathlib.PurePath)):
+        filename = str(file)
+    else:
+        filename = getattr(file, "name", "")
+    if not isinstance(filename, str):
+        # streams like pipes have no path, the summary is written to the cwd
+        filename = ""
+    report_path = metrics_path(filename) if filename != "" else "metrics.json"
     scans = []
+    checkpoint = None
+    checkpoint_interval = float(mzml_params["checkpoint_interval"])
+    if checkpoint_interval > 0 or mzml_params["resume"]:
+        if filename == "" or not isinstance(file, (str, pathlib.PurePath)):
+            raise Exception("Checkpoints require a path, not a file object")
+        checkpoint = ScanCheckpoint(
+            filename,
+            interval=checkpoint_interval,
+            input_key=_checkpoint_key(peak_properties, fragmentor, mzml_params),
+        )
 
-    trivial_names = {}
-    charges = set()
-    for key, val in peak_properties.items():
-        trivial_names[val["chemical_formula"]] = key
-        charges.add(val["charge"])
-    # trivial_names = {
-    # val["chemical_formula"]: key for key, val in peak_properties.items()
-    # }
-    # dicts are sorted, language specification since python 3.7+
-
-    isotopologue_lib = generate_molecule_isotopologue_lib(
-        peak_properties, trivial_names=trivial_names, charges=charges
-    )
-    scans, scan_dict = generate_scans(
-        isotopologue_lib,
-        peak_properties,
-        interval_tree,
-        fragmentor,
-        noise_injector,
-        mzml_params,
+    xic_buffer = None
+    if mzml_params["xic_output"] != "none":
+        xic_buffer = XICBuffer(molecules=mzml_params["xic_molecules"])
+    provenance_buffer = None
+    if mzml_params["peak_provenance"]:
+        provenance_buffer = ProvenanceBuffer()
+    with metrics.stage("scans"):
+        scans, scan_dict = generate_scans(
+            isotopologue_lib,
+            peak_properties,
+            interval_tree,
+            fragmentor,
+            noise_injector,
+            mzml_params,
+            xic_buffer=xic_buffer,
+            provenance_buffer=provenance_buffer,
+            checkpoint=checkpoint,
+            metrics=metrics,
+        )
+    chromatograms = None
+    if xic_buffer is not None and mzml_params["xic_output"] in (
+        "chromatograms",
+        "both",
+    ):
+        chromatograms = xic_buffer.chromatograms()
+    write_kwargs = dict(
+        writer=mzml_params["mzml_writer"],
+        n_jobs=mzml_params["writer_jobs"],
+        encodings={
+            "mz": mzml_params["mz_encoding"],
+            "i": mzml_params["intensity_encoding"],
+        },
+        compression=mzml_params["binary_compression"],
+        gzip_block_index=mzml_params["gzip_block_index"],
+        chromatograms=chromatograms,
     )
-    logger.info("Delete interval tree")
-    del interval_tree
-    write_scans(file, scans)
-    if not isinstance(file, str):
-        file_path = file.name
-    else:
-        file_path = file
-    path = pathlib.Path(file_path)
-    summary_path = path.parent.resolve() / "molecule_summary.csv"
-    peak_properties_to_csv(peak_properties, summary_path)
+    with metrics.stage("write"):
+        if mzml_params["mzml_shards"] > 1:
+            if filename == "" or not isinstance(file, (str, pathlib.PurePath)):
+                raise Exception("Sharded output requires a path, not a file object")
+            filename = write_scans_sharded(
+                file,
+                scans,
+                n_shards=mzml_params["mzml_shards"],
+                rt_range=(0, mzml_params["gradient_length"]),
+                **write_kwargs,
+            )
+        else:
+            write_scans(file, scans, **write_kwargs)
+    if sinks:
+        with metrics.stage("sinks"):
+            write_to_sinks(scans, sinks)
+    path = pathlib.Path(filename)
+    summary_path: Union[str, pathlib.Path] = str(mzml_params["summary_file"])
+    if summary_path == "":
+        summary_path = path.parent.resolve() / "molecule_summary.csv"
+    with metrics.stage("summary"):
+        write_molecule_summary(summary_path, peak_properties, mol_scan_dict=scan_dict)
+    with metrics.stage("sidecars"):
+        if xic_buffer is not None and mzml_params["xic_output"] in ("sidecar", "both"):
+            xic_buffer.to_npz(path.parent.resolve() / "molecule_xic.npz")
+        if provenance_buffer is not None:
+            provenance_buffer.to_npz(path.parent.resolve() / "peak_provenance.npz")
+    if checkpoint is not None:
+        checkpoint.remove()
+    if mzml_params["metrics_report"]:
+        metrics.write(report_path, output=filename, mzml_params=mzml_params)
     return filename
 
 
-# @profile
 def rescale_intensity(
     i: float, rt: float, molecule: str, peak_properties: dict, isotopologue_lib: dict
 ):
@@ -256,6 +483,11 @@ def generate_scans(
     fragmentor: AbstractFragmentor,
     noise_injector: AbstractNoiseInjector,
     mzml_params: dict,
+    xic_buffer: XICBuffer = None,
+    provenance_buffer: ProvenanceBuffer = None,
+    checkpoint: ScanCheckpoint = None,
+    metrics: MetricsCollector = None,
+    hooks: Hooks = None,
 ):
     """Summary.
 
@@ -264,7 +496,24 @@ def generate_scans(
         peak_properties (TYPE): Description
         fragmentation_function (A): Description
         mzml_params (TYPE): Description
+        xic_buffer (XICBuffer, optional): records the summed isotopologue
+            intensity of every eluting molecule in each MS1 scan
+        provenance_buffer (ProvenanceBuffer, optional): records the molecules
+            contributing to every MS1 peak
+        checkpoint (ScanCheckpoint, optional): saves the state before MS1
+            cycles, generation resumes from it if mzml_params["resume"]
+        metrics (MetricsCollector, optional): counts scans, peaks, chimeric
+            spectra, dynamic exclusion skips and fragment cache hits
+        hooks (Hooks, optional): instrumentation hooks, see
+            :py:mod:`smiter.hooks`, the module level hooks if None
     """
+    if hooks is None:
+        hooks = default_hooks
+    # bind once, disabled hooks cost a None check per event
+    on_cycle = hooks.on_cycle
+    on_ms2_selected = hooks.on_ms2_selected
+    on_ms2_skipped = hooks.on_ms2_skipped
+    on_scan_written = hooks.on_scan_written
     logger.info("Initialize chimeric spectra counter")
     chimeric_count = 0
     chimeric = Counter()
@@ -274,15 +523,19 @@ def generate_scans(
     ms_rt_diff = mzml_params.get("ms_rt_diff", 0.03)
     t: float = 0
 
-    mol_scan_dict: Dict[str, Dict[str, list]] = {}
+    mol_scan_dict: Dict[str, dict] = {}
     scans: List[Tuple[Scan, List[Scan]]] = []
     # i: int = 0
     spec_id: int = 1
     de_tracker: Dict[str, int] = {}
     de_stats: dict = {}
+    # eluting molecules not selected for MS2 due to dynamic exclusion
+    de_skips = 0
+    cache_hits = getattr(fragmentor, "hits", 0)
 
     mol_scan_dict = {
-        mol: {"ms1_scans": [], "ms2_scans": []} for mol in isotopologue_lib
+        mol: {"ms1_scans": [], "ms2_scans": [], "ms1_intensity": 0.0}
+        for mol in isotopologue_lib
     }
     molecules = list(isotopologue_lib.keys())
 
@@ -291,9 +544,44 @@ def generate_scans(
         desc="Generating scans",
         bar_format="{desc}: {percentage:3.0f}%|{bar}| {n:.2f}/{total_fmt} [{elapsed}<{remaining}",
     )
+    if checkpoint is not None and mzml_params["resume"]:
+        state = checkpoint.load()
+        if state is not None:
+            t = state["t"]
+            spec_id = state["spec_id"]
+            de_tracker = state["de_tracker"]
+            de_stats = state["de_stats"]
+            chimeric_count = state["chimeric_count"]
+            chimeric = state["chimeric"]
+            de_skips = state["de_skips"]
+            mol_scan_dict = state["mol_scan_dict"]
+            scans = state["scans"]
+            # callers hold the buffers, restore them in place
+            if xic_buffer is not None:
+                vars(xic_buffer).update(vars(state["xic_buffer"]))
+            if provenance_buffer is not None:
+                vars(provenance_buffer).update(vars(state["provenance_buffer"]))
+            progress_bar.update(t)
     while t < gradient_length:
+        if checkpoint is not None and checkpoint.due():
+            checkpoint.save(
+                {
+                    "t": t,
+                    "spec_id": spec_id,
+                    "de_tracker": de_tracker,
+                    "de_stats": de_stats,
+                    "chimeric_count": chimeric_count,
+                    "chimeric": chimeric,
+                    "de_skips": de_skips,
+                    "mol_scan_dict": mol_scan_dict,
+                    "xic_buffer": xic_buffer,
+                    "provenance_buffer": provenance_buffer,
+                },
+                scans,
+            )
         scan_peaks: List[Tuple[float, float]] = []
         scan_peaks = {}
+        peak_contributions: Dict[float, List[Tuple[str, float]]] = {}
         mol_i = []
         mol_monoisotopic = {}
         candidates = interval_tree.at(t)
@@ -317,6 +605,8 @@ def generate_scans(
             )
 
             mz = mz[mask]
+            if xic_buffer is not None:
+                xic_buffer.add(mol, spec_id, t, intensity.sum())
             mol_peaks = list(zip(mz, intensity))
             mol_peaks = {round(mz, 6): _i for mz, _i in list(zip(mz, intensity))}
             # !FIXED! multiple molecules which share mz should have summed up intensityies for that shared mzs
@@ -328,7 +618,10 @@ def generate_scans(
                         scan_peaks[mz] += intensity
                     else:
                         scan_peaks[mz] = intensity
+                    if provenance_buffer is not None:
+                        peak_contributions.setdefault(mz, []).append((mol, intensity))
                 mol_scan_dict[mol]["ms1_scans"].append(spec_id)
+                mol_scan_dict[mol]["ms1_intensity"] += mol_i[-1][2]
                 highest_peak = max(mol_peaks.items(), key=lambda x: x[1])
                 mol_monoisotopic[mol] = {
                     "mz": highest_peak[0],
@@ -355,12 +648,28 @@ def generate_scans(
         sorting = s.mz.argsort()
         s.mz = s.mz[sorting]
         s.i = s.i[sorting]
+        if provenance_buffer is not None:
+            noise_free_mz = s.mz.copy()
+            noise_free_contributions = [peak_contributions[mz[k]] for k in sorting]
 
         # add noise
         s = noise_injector.inject_noise(s)
+        if provenance_buffer is not None:
+            provenance_buffer.add_spectrum(
+                s.id,
+                [
+                    noise_free_contributions[k] if k >= 0 else []
+                    for k in match_peaks(noise_free_mz, s.mz)
+                ],
+            )
 
         # i += 1
         scans.append((s, []))
+        mol_i = sorted(mol_i, key=lambda x: x[2], reverse=True)
+        if on_scan_written is not None:
+            on_scan_written(s)
+        if on_cycle is not None:
+            on_cycle(s, mol_i)
         t += ms_rt_diff
         progress_bar.update(ms_rt_diff)
 
@@ -372,23 +681,19 @@ def generate_scans(
         if len(mol_i) < max_ms2_spectra:
             max_ms2_spectra = len(mol_i)
         ms2_scan = None
-        mol_i = sorted(mol_i, key=lambda x: x[2], reverse=True)
-        logger.debug(f"All molecules eluting: {len(mol_i)}")
-        logger.debug(f"currently # fragment spectra {len(scans[-1][1])}")
 
+        n_eluting = len(mol_i)
         mol_i = [
             mol
             for mol in mol_i
             if (de_tracker.get(mol[0], None) is None)
             or (t - de_tracker[mol[0]]) > mzml_params["dynamic_exclusion"]
         ]
-        logger.debug(f"All molecules eluting after DE filtering: {len(mol_i)}")
+        de_skips += n_eluting - len(mol_i)
         while len(scans[-1][1]) != max_ms2_spectra:
-            logger.debug(f"Frag spec index {fragment_spec_index}")
             if fragment_spec_index > len(mol_i) - 1:
                 # we evaluated fragmentation for every potential mol
                 # and all will be skipped
-                logger.debug(f"All possible mol are skipped due to DE")
                 break
             mol = mol_i[fragment_spec_index][0]
             _mz = mol_i[fragment_spec_index][1]
@@ -441,7 +746,8 @@ def generate_scans(
                     de_tracker.get(mol, None) is None
                     or (t - de_tracker[mol]) > mzml_params["dynamic_exclusion"]
                 ):
-                    logger.debug("Generate Fragment spec")
+                    if on_ms2_selected is not None:
+                        on_ms2_selected(t, mol, all_mols_in_mz_and_rt_window)
                     de_tracker[mol] = t
                     if mol not in de_stats:
                         de_stats[mol] = {"frag_events": 0, "frag_spec_ids": []}
@@ -470,23 +776,25 @@ def generate_scans(
                     ms2_scan = noise_injector.inject_noise(ms2_scan)
                     ms2_scan.i *= 0.5
                 else:
-                    logger.debug(f"Skip {mol} due to dynamic exclusion")
+                    if on_ms2_skipped is not None:
+                        on_ms2_skipped(t, mol, "dynamic_exclusion")
+                    de_skips += 1
                     continue
                 t += ms_rt_diff
                 progress_bar.update(ms_rt_diff)
                 if t > gradient_length:
                     break
             else:
-                logger.debug(f"Skip {mol} since not in RT window")
+                if on_ms2_skipped is not None:
+                    on_ms2_skipped(t, mol, "rt_window")
                 continue
             if mol is not None:
-                mol_scan_dict[mol]["ms2_scans"].append(spec_id)
+                mol_scan_dict[mol]["ms2_scans"].append(ms2_scan.id)
             if ms2_scan is None:
                 # there are molecules in mol_i
                 # however all molecules are excluded from fragmentation_function
                 # => Don't do a scan and break the while loop
                 # => We should rather continue and try to fragment the next mol!
-                logger.debug(f"Continue and fragment next mol since MS2 scan is None")
                 continue
             if (
                 len(ms2_scan.mz) > -1
@@ -494,18 +802,32 @@ def generate_scans(
                 sorting = ms2_scan.mz.argsort()
                 ms2_scan.mz = ms2_scan.mz[sorting]
                 ms2_scan.i = ms2_scan.i[sorting]
-                logger.debug(f"Append MS2 scan with {mol}")
                 scans[-1][1].append(ms2_scan)
+                if on_scan_written is not None:
+                    on_scan_written(ms2_scan)
     progress_bar.close()
     t1 = time.time()
     logger.info("Finished generating scans")
     logger.info(f"Generating scans took {t1-t0:.2f} seconds")
     logger.info(f"Found {chimeric_count} chimeric scans")
+    for mol, stats in de_stats.items():
+        mol_scan_dict[mol]["frag_events"] = stats["frag_events"]
+    if metrics is not None:
+        metrics.count("ms1_scans", len(scans))
+        metrics.count("ms2_scans", sum(len(ms2_scans) for _, ms2_scans in scans))
+        metrics.count("ms1_peaks", sum(len(ms1.mz) for ms1, _ in scans))
+        metrics.count(
+            "ms2_peaks",
+            sum(len(ms2.mz) for _, ms2_scans in scans for ms2 in ms2_scans),
+        )
+        metrics.count("chimeric_spectra", chimeric_count)
+        metrics.count("dynamic_exclusion_skips", de_skips)
+        if isinstance(fragmentor, CachedFragmentor):
+            metrics.count("fragment_cache_hits", fragmentor.hits - cache_hits)
 
     return scans, mol_scan_dict
 
 
-# @profile
 def generate_molecule_isotopologue_lib(
     peak_properties: Dict[str, dict],
     charges: List[int] = None,
@@ -558,15 +880,40 @@ def generate_molecule_isotopologue_lib(
     return reduced_lib
 
 
-# @profile
 def write_scans(
-    file: Union[str, io.TextIOWrapper], scans: List[Tuple[Scan, List[Scan]]]
+    file: Union[str, io.TextIOWrapper, BinaryIO],
+    scans: List[Tuple[Scan, List[Scan]]],
+    writer: str = "psims",
+    n_jobs: int = 1,
+    encodings: Dict[str, str] = None,
+    compression: str = "zlib",
+    gzip_block_index: bool = False,
+    chromatograms: List[Tuple[str, np.ndarray, np.ndarray, str]] = None,
 ) -> None:
     """Generate given scans to mzML file.
 
+    The psims and native backends write an indexedmzML in a single pass, with
+    offsets and the SHA-1 checksum computed while streaming, so file can also
+    be a non-seekable stream. Paths ending with .gz are compressed in
+    independent blocks on n_jobs threads by
+    :py:class:`smiter.parallel_gzip.ParallelGzipWriter`.
+
     Args:
-        file (Union[str, io.TextIOWrapper]): Description
+        file (Union[str, io.TextIOWrapper, BinaryIO]): Description
         scans (List[Tuple[Scan, List[Scan]]]): Description
+        writer (str, optional): mzML backend, either psims (reference), native
+            or mzmlb (HDF5 based mzMLb, requires h5py)
+        n_jobs (int, optional): threads used by the native backend to encode
+            binary arrays and to gzip .gz output
+        encodings (Dict[str, str], optional): encoding of the mz and i arrays,
+            see :py:data:`smiter.mzml_writer.ENCODINGS`. float32 and numpress
+            encodings are only supported by the native backend
+        compression (str, optional): zlib or none
+        gzip_block_index (bool, optional): write a block index next to .gz
+            output for random access
+        chromatograms (List[Tuple[str, np.ndarray, np.ndarray, str]], optional):
+            id, time array, intensity array and type (total ion current or
+            selected ion current) of chromatograms written after the TIC
 
     Returns:
         None: Description
@@ -580,7 +927,204 @@ def write_scans(
         ms2_scans += len(s[1])
         ms2_scan_list.append(len(s[1]))
     logger.info("Write {0} MS1 and {1} MS2 scans".format(ms1_scans, ms2_scans))
-    id_format_str = "controllerType=0 controllerNumber=1 scan={i}"
+    if writer not in MZML_WRITERS:
+        raise Exception(
+            f"Unknown mzML writer {writer}, choose one of {list(MZML_WRITERS)}"
+        )
+    gzip_writer = None
+    output = file
+    if isinstance(file, (str, pathlib.PurePath)) and is_gzip_path(file):
+        if writer == "mzmlb":
+            raise Exception("mzMLb files are compressed by HDF5 and can not be gzipped")
+        gzip_writer = ParallelGzipWriter(
+            str(file), n_jobs=n_jobs, index_file=gzip_block_index or None
+        )
+        output = cast(BinaryIO, gzip_writer)
+    try:
+        MZML_WRITERS[writer](
+            output,
+            scans,
+            n_jobs=n_jobs,
+            encodings=encodings,
+            compression=compression,
+            chromatograms=chromatograms,
+        )
+    finally:
+        if gzip_writer is not None:
+            gzip_writer.close()
+    t1 = time.time()
+    logger.info(f"Writing mzML took {(t1-t0)/60:.2f} minutes")
+    return
+
+
+def write_scans_sharded(
+    file: Union[str, pathlib.PurePath],
+    scans: List[Tuple[Scan, List[Scan]]],
+    n_shards: int,
+    rt_range: Tuple[float, float] = None,
+    writer: str = "psims",
+    n_jobs: int = 1,
+    encodings: Dict[str, str] = None,
+    compression: str = "zlib",
+    gzip_block_index: bool = False,
+    chromatograms: List[Tuple[str, np.ndarray, np.ndarray, str]] = None,
+) -> str:
+    """Write scans into retention time shards, one indexed mzML per shard.
+
+    Shards are written concurrently on n_jobs threads, see
+    :py:mod:`smiter.sharding` for the file layout and
+    :py:func:`smiter.sharding.stitch_shards` to combine them.
+
+    Args:
+        file (Union[str, pathlib.PurePath]): path of the unsharded output,
+            shards and manifest are written next to it
+        scans (List[Tuple[Scan, List[Scan]]]): MS1 scans and their MSn scans
+        n_shards (int): number of equally wide retention time ranges
+        rt_range (Tuple[float, float], optional): retention time range to
+            split, defaults to the range of the MS1 scans
+        writer (str, optional): mzML backend, see :py:func:`write_scans`
+        n_jobs (int, optional): number of shards written at once
+        encodings (Dict[str, str], optional): encoding of the mz and i arrays
+        compression (str, optional): zlib or none
+        gzip_block_index (bool, optional): write block indices next to .gz
+            shards
+        chromatograms (List[Tuple[str, np.ndarray, np.ndarray, str]], optional):
+            chromatograms written after the TIC, split like the scans
+
+    Returns:
+        str: path of the manifest
+    """
+    edges, shards = split_scans(scans, n_shards, rt_range=rt_range)
+    shard_chromatograms = split_chromatograms(chromatograms or [], edges)
+    logger.info(f"Write {n_shards} shards on {n_jobs} threads")
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [
+            executor.submit(
+                write_scans,
+                shard_path(file, n),
+                shard_scans,
+                writer=writer,
+                encodings=encodings,
+                compression=compression,
+                gzip_block_index=gzip_block_index,
+                chromatograms=shard_chromatograms[n],
+            )
+            for n, shard_scans in enumerate(shards)
+        ]
+        for future in futures:
+            future.result()
+    return write_manifest(file, edges, shards, writer)
+
+
+def _write_scans_native(
+    file: Union[str, io.TextIOWrapper, BinaryIO],
+    scans: List[Tuple[Scan, List[Scan]]],
+    n_jobs: int = 1,
+    encodings: Dict[str, str] = None,
+    compression: str = "zlib",
+    chromatograms: List[Tuple[str, np.ndarray, np.ndarray, str]] = None,
+    writer_class: type = MzMLTemplateWriter,
+) -> None:
+    """Write scans using the templated :py:class:`MzMLTemplateWriter`.
+
+    Args:
+        file (Union[str, io.TextIOWrapper, BinaryIO]): Description
+        scans (List[Tuple[Scan, List[Scan]]]): Description
+        n_jobs (int, optional): number of threads encoding binary arrays
+        encodings (Dict[str, str], optional): encoding of the mz and i arrays
+        compression (str, optional): zlib or none
+        chromatograms (List[Tuple[str, np.ndarray, np.ndarray, str]], optional):
+            additional chromatograms written after the TIC
+        writer_class (type, optional): MzMLTemplateWriter or a subclass
+    """
+    time_array = []
+    intensity_array = []
+
+    def _spectra():
+        for scan, products in scans:
+            yield scan, None
+            time_array.append(scan.retention_time)
+            intensity_array.append(sum(scan.i))
+            precursor_id = ID_FORMAT.format(i=scan.id)
+            for prod in products:
+                yield prod, precursor_id
+
+    spectrum_count = len(scans) + sum([len(products) for _, products in scans])
+    with writer_class(
+        file, encodings=encodings, compression=compression, n_jobs=n_jobs
+    ) as writer:
+        writer.write_header(spectrum_count)
+        writer.write_spectra(_spectra())
+        writer.write_chromatograms(
+            [("TIC", time_array, intensity_array, "total ion current")]
+            + list(chromatograms or [])
+        )
+
+
+def _write_scans_mzmlb(
+    file: Union[str, io.TextIOWrapper, BinaryIO],
+    scans: List[Tuple[Scan, List[Scan]]],
+    n_jobs: int = 1,
+    encodings: Dict[str, str] = None,
+    compression: str = "zlib",
+    chromatograms: List[Tuple[str, np.ndarray, np.ndarray, str]] = None,
+) -> None:
+    """Write scans to an mzMLb file using :py:class:`MzMLbWriter`.
+
+    Args:
+        file (Union[str, io.TextIOWrapper, BinaryIO]): Description
+        scans (List[Tuple[Scan, List[Scan]]]): Description
+        n_jobs (int, optional): ignored, arrays are compressed by HDF5
+        encodings (Dict[str, str], optional): encoding of the mz and i arrays,
+            float64 or float32
+        compression (str, optional): zlib or none
+        chromatograms (List[Tuple[str, np.ndarray, np.ndarray, str]], optional):
+            additional chromatograms written after the TIC
+    """
+    _write_scans_native(
+        file,
+        scans,
+        encodings=encodings,
+        compression=compression,
+        chromatograms=chromatograms,
+        writer_class=MzMLbWriter,
+    )
+
+
+def _write_scans_psims(
+    file: Union[str, io.TextIOWrapper, BinaryIO],
+    scans: List[Tuple[Scan, List[Scan]]],
+    n_jobs: int = 1,
+    encodings: Dict[str, str] = None,
+    compression: str = "zlib",
+    chromatograms: List[Tuple[str, np.ndarray, np.ndarray, str]] = None,
+) -> None:
+    """Write scans using psims.
+
+    Args:
+        file (Union[str, io.TextIOWrapper, BinaryIO]): Description
+        scans (List[Tuple[Scan, List[Scan]]]): Description
+        n_jobs (int, optional): ignored, psims writes serially
+        encodings (Dict[str, str], optional): only the psims defaults are
+            supported
+        compression (str, optional): only zlib is supported
+        chromatograms (List[Tuple[str, np.ndarray, np.ndarray, str]], optional):
+            additional chromatograms written after the TIC
+
+    Raises:
+        Exception: if other than the default encodings are requested
+    """
+    if encodings is not None:
+        for array_name, encoding in encodings.items():
+            if DEFAULT_ENCODINGS[array_name] != encoding:
+                raise Exception(
+                    f"{encoding} encoding is only supported by the native writer"
+                )
+    if compression != "zlib":
+        raise Exception(
+            f"{compression} compression is only supported by the native writer"
+        )
+    id_format_str = ID_FORMAT
     with MzMLWriter(file) as writer:
         # Add default controlled vocabularies
         writer.controlled_vocabularies()
@@ -646,13 +1190,22 @@ def write_scans(
                                 "activation": ["HCD", {"collision energy": 25.0}],
                             },
                         )
-            with writer.chromatogram_list(count=1):
+            chromatograms = list(chromatograms or [])
+            with writer.chromatogram_list(count=1 + len(chromatograms)):
                 writer.write_chromatogram(
                     time_array,
                     intensity_array,
                     id="TIC",
                     chromatogram_type="total ion current",
                 )
-    t1 = time.time()
-    logger.info(f"Writing mzML took {(t1-t0)/60:.2f} minutes")
-    return
+                for chrom_id, chrom_time, chrom_i, chrom_type in chromatograms:
+                    writer.write_chromatogram(
+                        chrom_time, chrom_i, id=chrom_id, chromatogram_type=chrom_type
+                    )
+
+
+MZML_WRITERS = {
+    "psims": _write_scans_psims,
+    "native": _write_scans_native,
+    "mzmlb": _write_scans_mzmlb,
+}
@@ -0,0 +1,137 @@
+"""Ground truth extracted ion chromatograms.
+
+XICs are accumulated while MS1 scans are generated, so they never have to be
+recomputed from the written mzML.
+"""
+
+import pathlib
+from typing import BinaryIO, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+
+class XICBuffer(object):
+    """Columnar buffer accumulating extracted ion chromatograms.
+
+    Every MS1 intensity of a molecule is appended to growable columns
+    (molecule index, spectrum id, retention time and intensity). Capacity is
+    doubled when full, so appending is amortized O(1) and the columns are
+    only grouped by molecule once all scans are generated.
+    """
+
+    def __init__(self, molecules: Iterable[str] = None, capacity: int = 1024):
+        """Initialize buffer.
+
+        Args:
+            molecules (Iterable[str], optional): only record XICs of these
+                molecules, all molecules if None or empty
+            capacity (int, optional): initial number of rows
+        """
+        self.selected = set(molecules) if molecules else None
+        self.molecules: List[str] = []
+        self._molecule_index: Dict[str, int] = {}
+        self._size = 0
+        self._molecule = np.empty(capacity, dtype=np.int32)
+        self._spec_id = np.empty(capacity, dtype=np.int64)
+        self._rt = np.empty(capacity, dtype=np.float64)
+        self._i = np.empty(capacity, dtype=np.float64)
+
+    def __len__(self) -> int:
+        """Return the number of recorded data points."""
+        return self._size
+
+    def _grow(self):
+        capacity = max(2 * len(self._molecule), 1)
+        for name in ("_molecule", "_spec_id", "_rt", "_i"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[: self._size] = column[: self._size]
+            setattr(self, name, grown)
+
+    def add(self, molecule: str, spec_id: int, rt: float, intensity: float):
+        """Record the intensity of a molecule in an MS1 scan.
+
+        Args:
+            molecule (str): molecule name
+            spec_id (int): id of the MS1 scan
+            rt (float): retention time of the MS1 scan
+            intensity (float): summed intensity of all isotopologue peaks
+        """
+        if self.selected is not None and molecule not in self.selected:
+            return
+        index = self._molecule_index.get(molecule, None)
+        if index is None:
+            index = len(self.molecules)
+            self._molecule_index[molecule] = index
+            self.molecules.append(molecule)
+        if self._size == len(self._molecule):
+            self._grow()
+        self._molecule[self._size] = index
+        self._spec_id[self._size] = spec_id
+        self._rt[self._size] = rt
+        self._i[self._size] = intensity
+        self._size += 1
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Get all data points grouped by molecule.
+
+        Returns:
+            Dict[str, np.ndarray]: molecules, offset with one entry more than
+                there are molecules, spec_id, rt and i; the XIC of molecule
+                n is ``rt[offset[n]:offset[n + 1]]``
+        """
+        order = np.argsort(self._molecule[: self._size], kind="stable")
+        counts = np.bincount(
+            self._molecule[: self._size], minlength=len(self.molecules)
+        )
+        offset = np.zeros(len(self.molecules) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offset[1:])
+        return {
+            "molecules": np.array(self.molecules, dtype=str),
+            "offset": offset,
+            "spec_id": self._spec_id[: self._size][order],
+            "rt": self._rt[: self._size][order],
+            "i": self._i[: self._size][order],
+        }
+
+    def xics(self) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Get retention time and intensity arrays of every molecule.
+
+        Returns:
+            Dict[str, Tuple[np.ndarray, np.ndarray]]: rt and i by molecule
+        """
+        columns = self.columns()
+        offset = columns["offset"]
+        return {
+            mol: (
+                columns["rt"][offset[n] : offset[n + 1]],
+                columns["i"][offset[n] : offset[n + 1]],
+            )
+            for n, mol in enumerate(self.molecules)
+        }
+
+    def chromatograms(
+        self, prefix: str = "XIC_"
+    ) -> List[Tuple[str, np.ndarray, np.ndarray, str]]:
+        """Get XICs in the format expected by the mzML writers.
+
+        Args:
+            prefix (str, optional): prefix of the chromatogram ids
+
+        Returns:
+            List[Tuple[str, np.ndarray, np.ndarray, str]]: id, time array,
+                intensity array and chromatogram type for each molecule
+        """
+        return [
+            (f"{prefix}{mol}", rt, i, "selected ion current")
+            for mol, (rt, i) in self.xics().items()
+        ]
+
+    def to_npz(self, file: Union[str, pathlib.PurePath, BinaryIO]):
+        """Write all XICs to a compressed npz file, see :py:meth:`columns`.
+
+        Args:
+            file (Union[str, pathlib.PurePath, BinaryIO]): path or binary file
+                object
+        """
+        np.savez_compressed(file, allow_pickle=False, **self.columns())
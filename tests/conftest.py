@@ -0,0 +1,20 @@
+"""Fixtures shared by the tests."""
+
+import os
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from smiter.summary import write_molecule_summary
+
+from .helpers import CONFIG, make_peak_props
+
+
+@pytest.fixture
+def config_file():
+    with TemporaryDirectory() as tmp_dir:
+        write_molecule_summary(os.path.join(tmp_dir, "peaks.csv"), make_peak_props())
+        path = os.path.join(tmp_dir, "simulation.toml")
+        with open(path, "w") as fout:
+            fout.write(CONFIG)
+        yield path
@@ -0,0 +1,109 @@
+"""Molecules, scans and plugins shared by the tests."""
+
+import numpy as np
+
+from smiter.fragmentation_functions import AbstractFragmentor
+from smiter.noise_functions import UniformNoiseInjector
+from smiter.synthetic_mzml import Scan
+
+# params of a short native writer run of make_peak_props
+MZML_PARAMS = {"gradient_length": 3, "min_intensity": 0, "mzml_writer": "native"}
+
+CONFIG = """peak_properties = "peaks.csv"
+
+[mzml_params]
+gradient_length = 3
+min_intensity = 0
+
+[fragmentor]
+name = "tests.helpers:ConstantFragmentor"
+
+[noise_injector]
+name = "UniformNoiseInjector"
+kwargs = {dropout = 0.1, ppm_noise = 5e-6, intensity_noise = 0.1}
+
+[outputs]
+mzml = "run.mzML"
+mgf = "run.mgf"
+"""
+
+
+class ConstantFragmentor(AbstractFragmentor):
+    """Fragment every molecule to a single peak."""
+
+    def __init__(self):
+        pass
+
+    def fragment(self, mol):
+        return np.array([(200, 1e5)])
+
+
+def make_peak_props():
+    """Inosine and adenosine eluting from 0 to 2 and 1 to 3 seconds."""
+    peak_props = {}
+    for name, formula, start in (
+        ("inosine", "+C(10)H(12)N(4)O(5)", 0),
+        ("adenosine", "+C(10)H(13)N(5)O(4)", 1),
+    ):
+        peak_props[name] = {
+            "chemical_formula": formula,
+            "trivial_name": name,
+            "charge": 1,
+            "scan_start_time": start,
+            "peak_width": 2,
+            "peak_function": "gauss",
+            "peak_params": {"sigma": 0.5},
+        }
+    return peak_props
+
+
+def silent_noise_injector():
+    """Noise injector leaving spectra unchanged."""
+    return UniformNoiseInjector(dropout=0, ppm_noise=0, intensity_noise=0)
+
+
+def make_scans():
+    """Three MS1 scans with one MS2 each and an empty MS1 scan."""
+    result = []
+    spec_id = 1
+    for n in range(3):
+        ms1 = Scan(
+            {
+                "mz": np.array([100.0, 200.5, 300.25]) + n,
+                "i": np.array([1e5, 2e6, 3e4]),
+                "id": spec_id,
+                "rt": n * 0.09,
+                "ms_level": 1,
+            }
+        )
+        spec_id += 1
+        ms2 = Scan(
+            {
+                "mz": np.array([50.0, 75.5]),
+                "i": np.array([10.0, 20.0]),
+                "id": spec_id,
+                "rt": n * 0.09 + 0.03,
+                "precursor_mz": 200.5 + n,
+                "precursor_i": 2e6,
+                "precursor_charge": 2,
+                "ms_level": 2,
+            }
+        )
+        spec_id += 1
+        result.append((ms1, [ms2]))
+    # MS1 without any peaks
+    result.append(
+        (
+            Scan(
+                {
+                    "mz": np.array([]),
+                    "i": np.array([]),
+                    "id": spec_id,
+                    "rt": 0.27,
+                    "ms_level": 1,
+                }
+            ),
+            [],
+        )
+    )
+    return result
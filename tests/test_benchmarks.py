@@ -0,0 +1,92 @@
+"""Tests for the benchmark runner and baseline comparison."""
+
+import json
+import os
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from benchmarks import compare, run_benchmarks
+from benchmarks.bench_simulation import GenerateScans
+from benchmarks.workloads import count_peaks, make_peak_properties, simulate
+from smiter.estimate import coelution
+
+
+def _results(values):
+    return {
+        "format": run_benchmarks.RESULTS_FORMAT,
+        "results": {
+            name: {"value": value, "unit": ""} for name, value in values.items()
+        },
+    }
+
+
+def test_make_peak_properties():
+    peak_properties = make_peak_properties(200, 5, 100)
+    assert len(peak_properties) == 200
+    starts = np.array([p["scan_start_time"] for p in peak_properties.values()])
+    ends = starts + np.array([p["peak_width"] for p in peak_properties.values()])
+    eluting = coelution(starts, ends, np.linspace(10, 90, 81))
+    assert 3 < eluting.mean() < 7
+    assert peak_properties == make_peak_properties(200, 5, 100)
+
+
+def test_simulate_workload():
+    scans = simulate(10, 2, 3, 0.1)
+    n_spectra, n_peaks = count_peaks(scans)
+    # every spectrum takes one ms_rt_diff slot of the gradient
+    assert 29 <= n_spectra <= 31
+    assert n_peaks > 0
+
+
+def test_parameter_grid():
+    grid = run_benchmarks.parameter_grid(GenerateScans)
+    assert len(grid) == 32
+    assert run_benchmarks.parameter_grid(GenerateScans, quick=True) == [
+        (100, 5, 0.03, 120.0, "constant")
+    ]
+    assert run_benchmarks.case_name(GenerateScans, "time_x", (1, "a")) == (
+        "GenerateScans.time_x(1, a)"
+    )
+
+
+def test_compare():
+    baseline = {
+        "A.time_a()": {"value": 1.0},
+        "A.track_a()": {"value": 100.0},
+        "A.peakmem_a()": {"value": 100.0},
+    }
+    current = {
+        "A.time_a()": {"value": 1.5},
+        "A.track_a()": {"value": 150.0},
+        "A.peakmem_a()": {"value": 105.0},
+    }
+    status = {row[0]: row[4] for row in compare.compare(baseline, current)}
+    assert status == {
+        "A.time_a()": "regressed",
+        "A.track_a()": "improved",
+        "A.peakmem_a()": "unchanged",
+    }
+
+
+def test_compare_cli(capsys):
+    with TemporaryDirectory() as tmp_dir:
+        files = []
+        for n, value in enumerate([100.0, 50.0]):
+            files.append(os.path.join(tmp_dir, f"results{n}.json"))
+            with open(files[-1], "w") as fout:
+                json.dump(_results({"A.track_a()": value, f"B.time_{n}()": 1}), fout)
+        assert compare.main(files) == 1
+        assert compare.main([files[0], files[0]]) == 0
+    output = capsys.readouterr().out
+    assert "REGRESSED" in output
+    assert "only in baseline" in output
+
+
+def test_run_benchmarks():
+    results = run_benchmarks.run(pattern=r"^Fragment\.", quick=True, repeat=1)
+    assert set(results) == {
+        "Fragment.time_fragment(constant)",
+        "Fragment.track_spectra_per_second(constant)",
+    }
+    assert results["Fragment.track_spectra_per_second(constant)"]["value"] > 0
@@ -0,0 +1,173 @@
+"""Tests for checkpoint and resume of scan generation."""
+
+import os
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pytest
+
+from smiter.checkpoint import ScanCheckpoint
+from smiter.noise_functions import UniformNoiseInjector
+from smiter.synthetic_mzml import _checkpoint_key, write_mzml
+
+from .helpers import ConstantFragmentor, make_peak_props
+
+MZML_PARAMS = {
+    "gradient_length": 3,
+    "min_intensity": 0,
+    "mzml_writer": "native",
+    "xic_output": "both",
+}
+
+
+class _CrashingNoiseInjector(UniformNoiseInjector):
+    def __init__(self, crash_after, **kwargs):
+        super().__init__(**kwargs)
+        self.crash_after = crash_after
+        self.calls = 0
+
+    def inject_noise(self, spectrum):
+        self.calls += 1
+        if self.calls > self.crash_after:
+            raise KeyboardInterrupt("simulated crash")
+        return super().inject_noise(spectrum)
+
+
+def _noise_kwargs():
+    return {"dropout": 0.1, "ppm_noise": 5e-6, "intensity_noise": 0.1}
+
+
+def _read(path):
+    with open(path, "rb") as fin:
+        return fin.read()
+
+
+def test_resume_reproduces_uninterrupted_run():
+    with TemporaryDirectory() as tmp_dir:
+        file = os.path.join(tmp_dir, "run.mzML")
+        np.random.seed(1)
+        write_mzml(
+            file,
+            make_peak_props(),
+            ConstantFragmentor(),
+            UniformNoiseInjector(**_noise_kwargs()),
+            MZML_PARAMS,
+        )
+        expected = _read(file)
+        expected_xic = _read(os.path.join(tmp_dir, "molecule_xic.npz"))
+        os.remove(file)
+
+        np.random.seed(1)
+        with pytest.raises(KeyboardInterrupt):
+            write_mzml(
+                file,
+                make_peak_props(),
+                ConstantFragmentor(),
+                _CrashingNoiseInjector(crash_after=40, **_noise_kwargs()),
+                dict(MZML_PARAMS, checkpoint_interval=1e-9),
+            )
+        assert not os.path.exists(file)
+        assert os.path.exists(f"{file}.checkpoint")
+
+        np.random.seed(2)
+        write_mzml(
+            file,
+            make_peak_props(),
+            ConstantFragmentor(),
+            UniformNoiseInjector(**_noise_kwargs()),
+            dict(MZML_PARAMS, resume=True),
+        )
+        assert _read(file) == expected
+        assert _read(os.path.join(tmp_dir, "molecule_xic.npz")) == expected_xic
+        assert not os.path.exists(f"{file}.checkpoint")
+        assert not os.path.exists(f"{file}.checkpoint.scans")
+
+
+def test_resume_without_interval_does_not_save(monkeypatch):
+    saves = []
+    save = ScanCheckpoint.save
+    monkeypatch.setattr(
+        ScanCheckpoint,
+        "save",
+        lambda self, *args: saves.append(1) or save(self, *args),
+    )
+    with TemporaryDirectory() as tmp_dir:
+        file = os.path.join(tmp_dir, "run.mzML")
+        with pytest.raises(KeyboardInterrupt):
+            write_mzml(
+                file,
+                make_peak_props(),
+                ConstantFragmentor(),
+                _CrashingNoiseInjector(crash_after=40, **_noise_kwargs()),
+                dict(MZML_PARAMS, checkpoint_interval=1e-9),
+            )
+        n_saves = len(saves)
+        assert n_saves > 0
+        write_mzml(
+            file,
+            make_peak_props(),
+            ConstantFragmentor(),
+            UniformNoiseInjector(**_noise_kwargs()),
+            dict(MZML_PARAMS, resume=True),
+        )
+        assert len(saves) == n_saves
+        assert os.path.exists(file)
+
+
+def test_resume_rejects_other_inputs():
+    with TemporaryDirectory() as tmp_dir:
+        file = os.path.join(tmp_dir, "run.mzML")
+        with pytest.raises(KeyboardInterrupt):
+            write_mzml(
+                file,
+                make_peak_props(),
+                ConstantFragmentor(),
+                _CrashingNoiseInjector(crash_after=10, **_noise_kwargs()),
+                dict(MZML_PARAMS, checkpoint_interval=1e-9),
+            )
+        with pytest.raises(Exception, match="other inputs"):
+            write_mzml(
+                file,
+                make_peak_props(),
+                ConstantFragmentor(),
+                UniformNoiseInjector(**_noise_kwargs()),
+                dict(MZML_PARAMS, resume=True, dynamic_exclusion=5),
+            )
+
+
+def test_checkpoint_key_ignores_output_params():
+    key = _checkpoint_key(make_peak_props(), ConstantFragmentor(), MZML_PARAMS)
+    output_params = {
+        "mzml_writer": "mzmlb",
+        "mz_encoding": "numpress_linear",
+        "binary_compression": "none",
+        "gzip_block_index": True,
+        "mzml_shards": 3,
+        "summary_file": "summary.parquet",
+    }
+    assert key == _checkpoint_key(
+        make_peak_props(), ConstantFragmentor(), dict(MZML_PARAMS, **output_params)
+    )
+    assert key != _checkpoint_key(
+        make_peak_props(), ConstantFragmentor(), dict(MZML_PARAMS, xic_output="none")
+    )
+
+
+def test_load_without_checkpoint():
+    with TemporaryDirectory() as tmp_dir:
+        checkpoint = ScanCheckpoint(os.path.join(tmp_dir, "run.mzML"))
+        assert checkpoint.load() is None
+        checkpoint.remove()
+
+
+def test_checkpoint_requires_path():
+    with TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, "run.mzML"), "wb") as fout:
+            with pytest.raises(Exception, match="require a path"):
+                write_mzml(
+                    fout,
+                    make_peak_props(),
+                    ConstantFragmentor(),
+                    UniformNoiseInjector(**_noise_kwargs()),
+                    dict(MZML_PARAMS, checkpoint_interval=60),
+                )
@@ -0,0 +1,103 @@
+"""Tests for dry-run cost estimates."""
+
+import csv
+import json
+import os
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+
+import numpy as np
+from click.testing import CliRunner
+
+from smiter import cli
+from smiter.estimate import coelution, estimate
+from smiter.synthetic_mzml import write_mzml
+
+from .helpers import ConstantFragmentor, make_peak_props, silent_noise_injector
+
+
+def _peaks(windows):
+    return {
+        f"mol{n}": {"scan_start_time": start, "peak_width": width}
+        for n, (start, width) in enumerate(windows)
+    }
+
+
+def test_coelution():
+    starts = np.array([0.0, 1.0, 2.0])
+    ends = np.array([2.0, 3.0, 2.5])
+    eluting = coelution(starts, ends, np.array([0.0, 1.5, 2.0, 2.5, 3.0]))
+    assert eluting.tolist() == [1, 2, 2, 1, 0]
+
+
+def test_estimate_without_molecules():
+    costs = estimate({}, {"gradient_length": 3, "ms_rt_diff": 0.5})
+    assert costs["ms1_scans"] == 6
+    assert costs["ms2_scans"] == 0
+    assert costs["ms1_peaks"] == 0
+
+
+def test_estimate_dynamic_exclusion():
+    peaks = _peaks([(0, 10), (0, 10), (5, 10)])
+    params = {"gradient_length": 20, "ms_rt_diff": 0.5, "max_ms2_spectra": 1}
+    # every molecule is fragmented once while it elutes
+    costs = estimate(peaks, dict(params, dynamic_exclusion=30))
+    assert costs["ms2_scans"] == 3
+    assert costs["max_coeluting"] == 3
+    # and again after each dynamic exclusion
+    costs = estimate(peaks, dict(params, dynamic_exclusion=2))
+    assert 3 * 4 <= costs["ms2_scans"] <= 3 * 5
+    costs = estimate(peaks, dict(params, dynamic_exclusion=0))
+    assert costs["ms1_scans"] + costs["ms2_scans"] == 40
+
+
+def test_estimate_matches_simulation():
+    params = {"gradient_length": 3, "min_intensity": 0, "mzml_writer": "native"}
+    costs = estimate(make_peak_props(), params)
+    with TemporaryDirectory() as tmp_dir:
+        file = os.path.join(tmp_dir, "run.mzML")
+        write_mzml(
+            file,
+            make_peak_props(),
+            ConstantFragmentor(),
+            silent_noise_injector(),
+            params,
+        )
+        with open(os.path.join(tmp_dir, "molecule_summary.csv")) as fin:
+            rows = list(csv.DictReader(fin))
+        file_size = os.path.getsize(file)
+    ms1_molecules = sum(int(row["ms1_scans"]) for row in rows)
+    ms2_scans = sum(int(row["ms2_events"]) for row in rows)
+    assert costs["ms2_scans"] == ms2_scans
+    assert abs(costs["mean_coeluting"] * costs["ms1_scans"] - ms1_molecules) <= 2
+    assert 0.5 < costs["file_size"] / file_size < 2
+    assert costs["total_runtime"] > 0
+
+
+def test_estimate_cli(config_file):
+    try:
+        runner = CliRunner(mix_stderr=False)
+    except TypeError:  # click >= 8.2 always keeps stderr apart
+        runner = CliRunner()
+    result = runner.invoke(cli.main, ["estimate", config_file, "--json"])
+    assert result.exit_code == 0, result.output
+    costs = json.loads(result.stdout)
+    assert costs["molecules"] == 2
+    assert set(costs["runtime"]) == {"library", "scans", "write"}
+    result = runner.invoke(cli.main, ["estimate", config_file])
+    assert result.exit_code == 0, result.output
+    assert "MS1 scans" in result.output
+
+
+def test_estimate_console_script_json(config_file):
+    # run the real entry point, CliRunner swaps sys.stdout after the
+    # logging sinks are bound
+    result = subprocess.run(
+        [sys.executable, "-m", "smiter.cli", "estimate", config_file, "--json"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    assert json.loads(result.stdout)["molecules"] == 2
@@ -0,0 +1,97 @@
+"""Tests for the FASTA to peak properties pipeline."""
+
+import csv
+import os
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+from pyqms.chemical_composition import ChemicalComposition
+
+from smiter import cli
+from smiter.fasta import digest, fasta_to_peak_table, peptide_formula
+from smiter.rt_prediction import HydrophobicityRTPredictor
+
+FASTA = """>sp|P1|PROT1 first protein
+MKAAAAAAAAAAKGGGGGGGGGGGR
+PEPTIDEPEPTIDEK
+>sp|P2|PROT2 second protein
+AAAAAAAAAAKXXXXXXXXXXXXKGGGGGGGGGGGRSHORTK
+"""
+
+
+@pytest.fixture
+def fasta_file():
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "proteins.fasta")
+        with open(path, "w") as fout:
+            fout.write(FASTA)
+        yield path
+
+
+def test_digest():
+    peptides = digest(["MKAAAAAAAAAAKGGGGGGGGGGGR", "GGGGGGGGGGGRSAMEK"], min_length=5)
+    assert peptides == ["AAAAAAAAAAK", "GGGGGGGGGGGR", "SAMEK"]
+    peptides = digest(["MKAAAAAAAAAAKGGGGGGGGGGGR"], missed_cleavages=1)
+    assert "AAAAAAAAAAKGGGGGGGGGGGR" in peptides
+
+
+@pytest.mark.parametrize("peptide", ["PEPTIDEPEPTIDEK", "ACDEFGHIKLMNPQRSTVWY"])
+def test_peptide_formula(peptide):
+    cc = ChemicalComposition()
+    cc.use(peptide)
+    assert peptide_formula(peptide) == "+" + cc.hill_notation_unimod()
+
+
+def test_peptide_formula_unknown_residue():
+    assert peptide_formula("PEPTIDEX") is None
+
+
+def test_fasta_to_peak_table(fasta_file):
+    table = fasta_to_peak_table(fasta_file, 100, seed=1)
+    columns = table.columns
+    assert columns["trivial_name"].tolist() == [
+        "AAAAAAAAAAK",
+        "GGGGGGGGGGGR",
+        "PEPTIDEPEPTIDEK",
+    ]
+    assert columns["chemical_formula"][2] == peptide_formula("PEPTIDEPEPTIDEK")
+    assert np.all(
+        (columns["scan_start_time"] >= 0) & (columns["scan_start_time"] < 100)
+    )
+    assert set(columns["charge"]) <= {2, 3, 4}
+    peak_properties = table.to_peak_properties()
+    assert peak_properties["AAAAAAAAAAK"]["peak_params"] == {"sigma": 2.0}
+
+
+def test_fasta_to_peak_table_jobs(fasta_file):
+    table = fasta_to_peak_table(fasta_file, 100, seed=1)
+    parallel_table = fasta_to_peak_table(
+        fasta_file, 100, seed=1, n_jobs=2, chunk_size=1
+    )
+    assert table.columns.keys() == parallel_table.columns.keys()
+    for name, column in table.columns.items():
+        assert column.tolist() == parallel_table.columns[name].tolist()
+
+
+def test_cli_fasta(fasta_file):
+    output = os.path.join(os.path.dirname(fasta_file), "peptides.csv")
+    runner = CliRunner()
+    result = runner.invoke(cli.main, ["fasta", fasta_file, output, "--seed", "1"])
+    assert result.exit_code == 0
+    with open(output) as fin:
+        lines = list(csv.DictReader(fin))
+    assert [line["trivial_name"] for line in lines] == [
+        "AAAAAAAAAAK",
+        "GGGGGGGGGGGR",
+        "PEPTIDEPEPTIDEK",
+    ]
+
+
+def test_fasta_to_peak_table_rt_predictor(fasta_file):
+    predictor = HydrophobicityRTPredictor(intercept=20)
+    table = fasta_to_peak_table(fasta_file, 100, seed=1, rt_predictor=predictor)
+    assert table.columns["scan_start_time"] == pytest.approx(
+        20 + predictor.hydrophobicity_index(table.columns["trivial_name"])
+    )
@@ -0,0 +1,131 @@
+"""Tests for the scan generation hooks."""
+
+import os
+from tempfile import TemporaryDirectory
+
+import pytest
+from click.testing import CliRunner
+from loguru import logger
+
+from smiter import cli
+from smiter.hooks import HOOK_NAMES, Hooks, enable_debug_logging, hooks
+from smiter.synthetic_mzml import write_mzml
+
+from .helpers import ConstantFragmentor, make_peak_props, silent_noise_injector
+
+MZML_PARAMS = {
+    "gradient_length": 3,
+    "min_intensity": 0,
+    "mzml_writer": "native",
+    "dynamic_exclusion": 0.5,
+}
+
+
+def _write(tmp_dir):
+    write_mzml(
+        os.path.join(tmp_dir, "run.mzML"),
+        make_peak_props(),
+        ConstantFragmentor(),
+        silent_noise_injector(),
+        MZML_PARAMS,
+    )
+
+
+def test_register_and_unregister():
+    target = Hooks()
+    assert all(getattr(target, name) is None for name in HOOK_NAMES)
+    calls = []
+    first = target.register("on_scan_written", lambda scan: calls.append(1))
+    # a single listener is called directly
+    assert target.on_scan_written is first
+    second = target.register("on_scan_written", lambda scan: calls.append(2))
+    target.on_scan_written(None)
+    assert calls == [1, 2]
+    target.unregister("on_scan_written", first)
+    assert target.on_scan_written is second
+    target.clear()
+    assert target.on_scan_written is None
+    with pytest.raises(Exception):
+        target.register("on_scan", first)
+
+
+def test_generate_scans_hooks():
+    events = {name: [] for name in HOOK_NAMES}
+    listeners = {
+        "on_cycle": lambda scan, eluting: events["on_cycle"].append((scan, eluting)),
+        "on_ms2_selected": lambda t, mol, isolated: events["on_ms2_selected"].append(
+            mol
+        ),
+        "on_ms2_skipped": lambda t, mol, reason: events["on_ms2_skipped"].append(
+            reason
+        ),
+        "on_scan_written": lambda scan: events["on_scan_written"].append(scan),
+    }
+    for name, listener in listeners.items():
+        hooks.register(name, listener)
+    try:
+        with TemporaryDirectory() as tmp_dir:
+            _write(tmp_dir)
+    finally:
+        for name, listener in listeners.items():
+            hooks.unregister(name, listener)
+    assert all(getattr(hooks, name) is None for name in HOOK_NAMES)
+
+    ms1 = [scan for scan in events["on_scan_written"] if scan.ms_level == 1]
+    ms2 = [scan for scan in events["on_scan_written"] if scan.ms_level == 2]
+    assert len(ms1) + len(ms2) in (100, 101)
+    assert [scan for scan, _ in events["on_cycle"]] == ms1
+    assert len(events["on_ms2_selected"]) == len(ms2)
+    assert set(events["on_ms2_selected"]) == {"inosine", "adenosine"}
+    assert set(events["on_ms2_skipped"]) <= {"dynamic_exclusion", "rt_window"}
+    intensities = [i for _, eluting in events["on_cycle"] for _, _, i in eluting]
+    assert len(intensities) > 0
+    for _, eluting in events["on_cycle"]:
+        assert [i for _, _, i in eluting] == sorted(
+            (i for _, _, i in eluting), reverse=True
+        )
+
+
+def test_enable_debug_logging():
+    messages = []
+    handler = logger.add(messages.append, level="DEBUG", format="{message}")
+    logger.enable("smiter")
+    listeners = enable_debug_logging()
+    try:
+        with TemporaryDirectory() as tmp_dir:
+            _write(tmp_dir)
+    finally:
+        logger.remove(handler)
+        logger.disable("smiter")
+        for name, listener in listeners.items():
+            hooks.unregister(name, listener)
+    assert set(listeners) == set(HOOK_NAMES)
+    assert any(message.startswith("MS1 scan") for message in messages)
+    assert any(message.startswith("Append MS2 scan") for message in messages)
+
+
+def test_cli_simulate_profile(config_file):
+    import pstats
+
+    profile = os.path.join(os.path.dirname(config_file), "run.prof")
+    result = CliRunner().invoke(
+        cli.main, ["simulate", config_file, "--seed", "1", "--profile", profile]
+    )
+    assert result.exit_code == 0
+    stats = pstats.Stats(profile)
+    assert any(func[2] == "generate_scans" for func in stats.stats)
+
+
+def test_cli_simulate_debug(config_file):
+    try:
+        runner = CliRunner(mix_stderr=False)
+    except TypeError:  # click >= 8.2 always keeps stderr apart
+        runner = CliRunner()
+    try:
+        result = runner.invoke(cli.main, ["simulate", config_file, "--debug"])
+    finally:
+        hooks.clear()
+        logger.disable("smiter")
+    assert result.exit_code == 0
+    assert "Append MS2 scan" in result.stderr
+    assert "Append MS2 scan" not in result.stdout
@@ -1,17 +1,23 @@
 """Summary.
 """
+
 import csv
 import os
+import subprocess
+import sys
 from tempfile import NamedTemporaryFile
 
 import pytest
 
 from smiter.lib import (
+    PEAK_FUNCTIONS,
     check_mzml_params,
     check_peak_properties,
     csv_to_peak_properties,
     peak_properties_to_csv,
+    split_path,
 )
+from smiter.peak_distribution import distributions
 
 
 def test_check_mzml_params():
@@ -70,6 +76,42 @@ def test_check_peak_properties_missing_required():
         peak_props = check_peak_properties(peak_props)
 
 
+def test_check_peak_properties_reports_all_molecules():
+    peak_props = {
+        f"mol_{n}": {
+            "scan_start_time": 0,
+            "peak_width": 30,
+            "charge": 2,
+            "peak_function": "gauss",
+        }
+        for n in range(5)
+    }
+    peak_props["mol_1"]["peak_width"] = -1
+    peak_props["mol_3"]["peak_width"] = 0
+    peak_props["mol_2"]["peak_function"] = "lorentz"
+    peak_props["mol_4"]["charge"] = 1.5
+    del peak_props["mol_0"]["scan_start_time"]
+    with pytest.raises(Exception) as error:
+        check_peak_properties(peak_props)
+    message = str(error.value)
+    assert "scan_start_time is required by not set for mol_0" in message
+    assert "peak_width has to be > 0 for mol_1, mol_3" in message
+    assert "peak_function is not one of" in message
+    assert "for mol_2" in message
+    assert "charge is not an integer for mol_4" in message
+
+
+def test_check_mzml_params_reports_all_invalid():
+    mzml_params = {"ms_rt_diff": 0, "mzml_writer": "other", "writer_jobs": "2"}
+    with pytest.raises(Exception) as error:
+        check_mzml_params(mzml_params)
+    message = str(error.value)
+    assert "gradient_length is required" in message
+    assert "ms_rt_diff has to be > 0" in message
+    assert "mzml_writer is not one of" in message
+    assert "writer_jobs is not a number" in message
+
+
 def test_csv_to_peak_properties():
     csv_file = os.path.join(os.path.dirname(__file__), "data", "molecules_test.csv")
     peak_properties = csv_to_peak_properties(csv_file)
@@ -143,3 +185,21 @@ def test_peak_properties_to_csv():
     assert lines[1]["peak_width"] == "30"
     # default
     assert lines[0]["charge"] == "2"
+
+
+def test_split_path():
+    parent, stem, suffix = split_path("/data/run.mzML.gz")
+    assert (str(parent), stem, suffix) == ("/data", "run", ".mzML.gz")
+    assert split_path("run.mzML")[1:] == ("run", ".mzML")
+
+
+def test_peak_functions():
+    assert set(PEAK_FUNCTIONS) == set(distributions)
+
+
+def test_import_without_scipy_and_pyarrow():
+    code = (
+        "import sys, smiter.lib; "
+        "assert 'scipy' not in sys.modules and 'pyarrow' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,83 @@
+"""Tests for stage metrics of simulation runs."""
+
+import json
+import os
+from tempfile import TemporaryDirectory
+
+from smiter.fragmentation_functions import CachedFragmentor
+from smiter.metrics import MetricsCollector, metrics_path, peak_rss
+from smiter.synthetic_mzml import write_mzml
+
+from .helpers import ConstantFragmentor, make_peak_props, silent_noise_injector
+
+MZML_PARAMS = {
+    "gradient_length": 3,
+    "min_intensity": 0,
+    "mzml_writer": "native",
+    "dynamic_exclusion": 0.5,
+}
+
+
+def test_metrics_path():
+    assert metrics_path("/tmp/run.mzML") == "/tmp/run.metrics.json"
+    assert metrics_path("/tmp/run.mzML.gz") == "/tmp/run.metrics.json"
+
+
+def test_metrics_collector():
+    metrics = MetricsCollector()
+    for _ in range(2):
+        with metrics.stage("scans"):
+            sum(range(1000))
+    metrics.count("ms1_scans", 10)
+    metrics.count("ms1_scans")
+    report = metrics.report(config="test")
+    assert report["stages"]["scans"]["calls"] == 2
+    assert report["stages"]["scans"]["wall_seconds"] > 0
+    assert report["counts"] == {"ms1_scans": 11}
+    assert report["throughput"]["scans_per_second"] > 0
+    assert report["peak_rss"] == peak_rss() > 0
+    assert report["config"] == "test"
+
+
+def test_write_mzml_metrics():
+    metrics = MetricsCollector()
+    with TemporaryDirectory() as tmp_dir:
+        file = os.path.join(tmp_dir, "run.mzML")
+        write_mzml(
+            file,
+            make_peak_props(),
+            CachedFragmentor(ConstantFragmentor()),
+            silent_noise_injector(),
+            dict(MZML_PARAMS, metrics_report=True),
+            metrics=metrics,
+        )
+        with open(os.path.join(tmp_dir, "run.metrics.json")) as fin:
+            report = json.load(fin)
+    assert set(report["stages"]) == {
+        "peak_properties",
+        "library",
+        "scans",
+        "write",
+        "summary",
+        "sidecars",
+    }
+    counts = report["counts"]
+    assert counts == metrics.counts
+    assert counts["ms1_scans"] + counts["ms2_scans"] in (100, 101)
+    assert counts["ms2_peaks"] == counts["ms2_scans"]
+    assert counts["dynamic_exclusion_skips"] > 0
+    assert counts["fragment_cache_hits"] == counts["ms2_scans"] - 2
+    assert report["mzml_params"]["gradient_length"] == 3
+    assert report["output"] == file
+
+
+def test_metrics_report_disabled():
+    with TemporaryDirectory() as tmp_dir:
+        write_mzml(
+            os.path.join(tmp_dir, "run.mzML"),
+            make_peak_props(),
+            ConstantFragmentor(),
+            silent_noise_injector(),
+            MZML_PARAMS,
+        )
+        assert not os.path.exists(os.path.join(tmp_dir, "run.metrics.json"))
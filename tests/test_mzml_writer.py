@@ -0,0 +1,191 @@
+"""Tests for the templated mzML writer."""
+
+import base64
+import io
+import zlib
+from tempfile import NamedTemporaryFile
+
+import numpy as np
+import pymzml
+import pytest
+from psims.validation.validator import validate
+
+from smiter import numpress
+from smiter.mzml_writer import (
+    MzMLTemplateWriter,
+    encode_array,
+    encoding_accuracy_report,
+    read_index,
+    verify_checksum,
+)
+from smiter.synthetic_mzml import write_scans
+
+from .helpers import make_scans
+
+
+def test_encode_array_roundtrip():
+    data = np.array([1.5, 2.25, 1e6])
+    encoded = encode_array(data, "float64", "zlib")
+    decoded = np.frombuffer(zlib.decompress(base64.b64decode(encoded)), "<f8")
+    assert np.array_equal(decoded, data)
+    encoded = encode_array(data, "float32", "none")
+    decoded = np.frombuffer(base64.b64decode(encoded), "<f4")
+    assert np.allclose(decoded, data)
+
+
+def test_native_writer_readable_by_pymzml():
+    file = NamedTemporaryFile("wb", suffix=".mzML")
+    write_scans(file, make_scans(), writer="native")
+    reader = pymzml.run.Reader(file.name)
+    assert reader.get_spectrum_count() == 7
+    ms1 = reader[1]
+    assert ms1.ms_level == 1
+    assert np.allclose(ms1.mz, [100.0, 200.5, 300.25])
+    assert ms1.scan_time[0] == pytest.approx(0)
+    ms2 = reader[6]
+    assert ms2.ms_level == 2
+    assert ms2.selected_precursors[0]["mz"] == pytest.approx(202.5)
+    assert ms2.selected_precursors[0]["charge"] == 2
+    tic = reader["TIC"]
+    assert tic.peaks()[:, 1] == pytest.approx([2130000.0, 2130000.0, 2130000.0, 0.0])
+
+
+def test_native_writer_schema_valid():
+    file = NamedTemporaryFile("wb", suffix=".mzML")
+    write_scans(file, make_scans(), writer="native")
+    valid, schema = validate(file.name)
+    assert valid, schema.error_log
+
+
+def test_native_writer_matches_psims():
+    native = NamedTemporaryFile("wb", suffix=".mzML")
+    reference = NamedTemporaryFile("wb", suffix=".mzML")
+    write_scans(native, make_scans(), writer="native")
+    write_scans(reference, make_scans(), writer="psims")
+    native_specs = list(pymzml.run.Reader(native.name))
+    reference_specs = list(pymzml.run.Reader(reference.name))
+    assert len(native_specs) == len(reference_specs)
+    for n_spec, r_spec in zip(native_specs, reference_specs):
+        assert n_spec.ID == r_spec.ID
+        assert n_spec.ms_level == r_spec.ms_level
+        assert np.array_equal(n_spec.mz, r_spec.mz)
+        assert np.array_equal(n_spec.i, r_spec.i)
+
+
+def test_native_writer_index_offsets():
+    file = NamedTemporaryFile("wb", suffix=".mzML")
+    with MzMLTemplateWriter(file.name) as writer:
+        writer.write_header(2)
+        scans = make_scans()[0]
+        writer.write_spectrum(scans[0])
+        writer.write_spectrum(scans[1][0], precursor_id="scan=1")
+        writer.write_chromatograms([])
+    with open(file.name, "rb") as fin:
+        content = fin.read()
+    for spec_id, offset in writer.spectrum_offsets:
+        assert content[offset:].startswith(b"<spectrum ")
+        assert spec_id.encode() in content[offset : offset + 200]
+
+
+def test_unknown_writer():
+    file = NamedTemporaryFile("wb", suffix=".mzML")
+    with pytest.raises(Exception):
+        write_scans(file, make_scans(), writer="unknown")
+
+
+def test_parallel_encoding_byte_identical():
+    serial = NamedTemporaryFile("wb", suffix=".mzML")
+    parallel = NamedTemporaryFile("wb", suffix=".mzML")
+    scans = make_scans() * 20
+    write_scans(serial, scans, writer="native", n_jobs=1)
+    write_scans(parallel, scans, writer="native", n_jobs=4)
+    with open(serial.name, "rb") as s_in, open(parallel.name, "rb") as p_in:
+        assert s_in.read() == p_in.read()
+
+
+@pytest.mark.parametrize(
+    "encodings,compression,rel_tol",
+    [
+        ({"mz": "float32", "i": "float32"}, "zlib", 1e-7),
+        ({"mz": "numpress_linear", "i": "numpress_pic"}, "zlib", 1e-5),
+        ({"mz": "numpress_linear", "i": "numpress_slof"}, "none", 5e-4),
+    ],
+)
+def test_encodings_roundtrip(encodings, compression, rel_tol):
+    file = NamedTemporaryFile("wb", suffix=".mzML")
+    scans = make_scans()
+    write_scans(
+        file, scans, writer="native", encodings=encodings, compression=compression
+    )
+    valid, schema = validate(file.name)
+    assert valid, schema.error_log
+    report = encoding_accuracy_report(scans, encodings, compression)
+    assert report["mz"]["max_rel_error"] < rel_tol
+    assert report["i"]["max_rel_error"] < rel_tol
+
+
+def test_numpress_matches_reference():
+    pynumpress = pytest.importorskip("pynumpress")
+    mz = np.sort(np.random.uniform(100, 1600, 500))
+    intensity = np.random.uniform(0, 1e7, 500)
+    fixed_point = numpress.optimal_linear_fixed_point(mz)
+    encoded = numpress.encode_linear(mz, fixed_point)
+    assert np.allclose(numpress.decode_linear(encoded), mz)
+    assert np.allclose(
+        pynumpress.decode_linear(np.frombuffer(encoded, dtype=np.uint8)), mz
+    )
+    encoded = numpress.encode_pic(intensity)
+    assert np.array_equal(numpress.decode_pic(encoded), np.round(intensity))
+    encoded = numpress.encode_slof(intensity)
+    assert np.allclose(numpress.decode_slof(encoded), intensity, rtol=5e-4, atol=1)
+
+
+def test_psims_rejects_numpress():
+    file = NamedTemporaryFile("wb", suffix=".mzML")
+    with pytest.raises(Exception):
+        write_scans(
+            file, make_scans(), writer="psims", encodings={"mz": "numpress_linear"}
+        )
+
+
+class _NonSeekableStream(io.RawIOBase):
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+
+@pytest.mark.parametrize("writer", ["native", "psims"])
+def test_indexed_mzml_non_seekable_stream(writer):
+    stream = _NonSeekableStream()
+    write_scans(stream, make_scans(), writer=writer)
+    file = NamedTemporaryFile("wb", suffix=".mzML")
+    file.write(stream.data)
+    file.flush()
+    assert verify_checksum(file.name)
+    index = read_index(file.name)
+    assert len(index["spectrum"]) == 7
+    assert list(index["chromatogram"]) == ["TIC"]
+    for spec_id, offset in index["spectrum"].items():
+        assert stream.data[offset:].startswith(b"<spectrum ")
+        assert f'id="{spec_id}"'.encode() in stream.data[offset : offset + 200]
+    reader = pymzml.run.Reader(file.name)
+    assert reader[5].ms_level == 1
+    assert reader[6].selected_precursors[0]["mz"] == pytest.approx(202.5)
+
+
+def test_verify_checksum_detects_changes():
+    file = NamedTemporaryFile("wb", suffix=".mzML")
+    write_scans(file.name, make_scans(), writer="native")
+    with open(file.name, "r+b") as fio:
+        fio.seek(200)
+        fio.write(b"X")
+    assert not verify_checksum(file.name)
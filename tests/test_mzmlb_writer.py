@@ -0,0 +1,86 @@
+"""Tests for the mzMLb writer."""
+
+from tempfile import NamedTemporaryFile
+from xml.etree import ElementTree
+
+import numpy as np
+import pytest
+from psims.validation.validator import validate
+
+from smiter.mzml_writer import ID_FORMAT
+from smiter.synthetic_mzml import write_scans
+
+from .helpers import make_scans
+
+h5py = pytest.importorskip("h5py")
+
+NS = "{http://psi.hupo.org/ms/mzml}"
+
+
+def test_mzmlb_layout():
+    file = NamedTemporaryFile("wb", suffix=".mzMLb")
+    write_scans(file.name, make_scans(), writer="mzmlb")
+    with h5py.File(file.name, "r") as h5:
+        assert h5["mzML"].attrs["version"] == "mzMLb 1.0"
+        assert h5["spectrum_MS_1000514_float64"].compression == "gzip"
+        assert len(h5["spectrum_MS_1000515_float32"]) == 15
+        assert len(h5["mzML_spectrumIndex"]) == 8
+        ids = bytes(h5["mzML_spectrumIndex_idRef"][:]).split(b"\x00")
+        assert ids[0] == b"controllerType=0 controllerNumber=1 scan=1"
+        xml = bytes(h5["mzML"][:])
+        for offset in h5["mzML_spectrumIndex"][:-1]:
+            assert xml[offset:].startswith(b"<spectrum ")
+        assert xml.rstrip().endswith(b"</mzML>")
+
+
+def _read_mzmlb(path):
+    """Read spectra of an mzMLb file with h5py and ElementTree."""
+    spectra = {}
+    with h5py.File(path, "r") as h5:
+        root = ElementTree.fromstring(bytes(h5["mzML"][:]))
+        for spec in root.iter(f"{NS}spectrum"):
+            arrays = {}
+            for bda in spec.iter(f"{NS}binaryDataArray"):
+                params = {
+                    param.get("name"): param.get("value")
+                    for param in bda.iter(f"{NS}cvParam")
+                }
+                name = "mz" if "m/z array" in params else "i"
+                offset = int(params["external offset"])
+                length = int(params["external array length"])
+                dataset = h5[params["external HDF5 dataset"]]
+                arrays[name] = dataset[offset : offset + length]
+            spectra[spec.get("id")] = arrays
+    return spectra
+
+
+def test_mzmlb_roundtrip():
+    file = NamedTemporaryFile("wb", suffix=".mzMLb")
+    scans = make_scans()
+    write_scans(file.name, scans, writer="mzmlb", compression="none")
+    spectra = _read_mzmlb(file.name)
+    assert len(spectra) == 7
+    for scan, products in scans:
+        for spec in [scan] + products:
+            arrays = spectra[ID_FORMAT.format(i=spec.id)]
+            assert np.array_equal(arrays["mz"], spec.mz)
+            assert np.allclose(arrays["i"], spec.i)
+
+
+def test_mzmlb_xml_schema_valid():
+    file = NamedTemporaryFile("wb", suffix=".mzMLb")
+    write_scans(file.name, make_scans(), writer="mzmlb")
+    xml_file = NamedTemporaryFile("wb", suffix=".mzML")
+    with h5py.File(file.name, "r") as h5:
+        xml_file.write(bytes(h5["mzML"][:]))
+    xml_file.flush()
+    valid, schema = validate(xml_file.name)
+    assert valid, schema.error_log
+
+
+def test_mzmlb_rejects_numpress():
+    file = NamedTemporaryFile("wb", suffix=".mzMLb")
+    with pytest.raises(Exception):
+        write_scans(
+            file.name, make_scans(), writer="mzmlb", encodings={"mz": "numpress_linear"}
+        )
@@ -0,0 +1,82 @@
+"""Tests for output sinks."""
+
+import os
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pymzml
+import pytest
+from pyteomics import mgf
+
+from smiter.output_sinks import (
+    MGFSink,
+    MzMLSink,
+    NpzSink,
+    ParquetSink,
+    write_to_sinks,
+)
+
+from .helpers import make_scans
+
+
+def test_mgf_sink():
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "ms2.mgf")
+        write_to_sinks(make_scans(), [MGFSink(path)])
+        spectra = list(mgf.read(path))
+    assert len(spectra) == 3
+    params = spectra[2]["params"]
+    assert params["title"] == "controllerType=0 controllerNumber=1 scan=6"
+    assert params["pepmass"][0] == pytest.approx(202.5)
+    assert params["charge"] == [2]
+    assert params["rtinseconds"] == pytest.approx(0.21)
+    assert np.allclose(spectra[2]["m/z array"], [50.0, 75.5])
+    assert np.allclose(spectra[2]["intensity array"], [10.0, 20.0])
+
+
+def test_npz_sink():
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "spectra.npz")
+        write_to_sinks(make_scans(), [NpzSink(path)])
+        columns = dict(np.load(path))
+    assert columns["scan_id"].tolist() == [1, 2, 3, 4, 5, 6, 7]
+    assert columns["ms_level"].tolist() == [1, 2, 1, 2, 1, 2, 1]
+    assert columns["precursor_scan_id"].tolist() == [-1, 1, -1, 3, -1, 5, -1]
+    assert columns["peak_offset"].tolist() == [0, 3, 5, 8, 10, 13, 15, 15]
+    offset = columns["peak_offset"]
+    assert np.allclose(columns["mz"][offset[2] : offset[3]], [101.0, 201.5, 301.25])
+    assert columns["precursor_mz"][3] == pytest.approx(201.5)
+
+
+def test_parquet_sink():
+    pq = pytest.importorskip("pyarrow.parquet")
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "spectra.parquet")
+        write_to_sinks(make_scans(), [ParquetSink(path)])
+        table = pq.read_table(path).to_pydict()
+    assert table["scan_id"] == [1, 2, 3, 4, 5, 6, 7]
+    assert table["mz"][1] == [50.0, 75.5]
+    assert table["i"][6] == []
+
+
+def test_several_sinks_at_once():
+    scans = make_scans()
+    with TemporaryDirectory() as tmp_dir:
+        mzml_path = os.path.join(tmp_dir, "run.mzML.gz")
+        mgf_path = os.path.join(tmp_dir, "ms2.mgf")
+        npz_path = os.path.join(tmp_dir, "spectra.npz")
+        write_to_sinks(
+            scans,
+            [MzMLSink(mzml_path, n_jobs=2), MGFSink(mgf_path), NpzSink(npz_path)],
+        )
+        spectra = list(pymzml.run.Reader(mzml_path))
+        assert len(spectra) == 7
+        assert np.allclose(spectra[5].mz, [50.0, 75.5])
+        assert len(list(mgf.read(mgf_path))) == 3
+        assert len(np.load(npz_path)["scan_id"]) == 7
+
+
+def test_mzml_sink_rejects_psims():
+    with TemporaryDirectory() as tmp_dir:
+        with pytest.raises(Exception):
+            MzMLSink(os.path.join(tmp_dir, "run.mzML"), writer="psims")
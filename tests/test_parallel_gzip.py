@@ -0,0 +1,80 @@
+"""Tests for block-parallel gzip output."""
+
+import gzip
+import os
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pymzml
+import pytest
+
+from smiter.mzml_writer import read_index, verify_checksum
+from smiter.parallel_gzip import GzipBlockReader, ParallelGzipWriter
+from smiter.synthetic_mzml import write_scans
+
+from .helpers import make_scans
+
+
+def test_parallel_gzip_members():
+    data = os.urandom(5000) + b"spectrum " * 2000
+    with TemporaryDirectory() as tmp_dir:
+        outputs = []
+        for n_jobs in (1, 3):
+            path = os.path.join(tmp_dir, f"data_{n_jobs}.gz")
+            with ParallelGzipWriter(path, n_jobs=n_jobs, block_size=1000) as fout:
+                for start in range(0, len(data), 777):
+                    fout.write(data[start : start + 777])
+            assert len(fout.blocks) == 23
+            with open(path, "rb") as fin:
+                outputs.append(fin.read())
+        assert gzip.decompress(outputs[0]) == data
+        assert outputs[0] == outputs[1]
+
+
+def test_empty_gzip_is_valid():
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "empty.gz")
+        ParallelGzipWriter(path).close()
+        with gzip.open(path) as fin:
+            assert fin.read() == b""
+
+
+def test_gzip_block_reader_random_access():
+    data = bytes(range(256)) * 100
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "data.gz")
+        with ParallelGzipWriter(path, block_size=1000, index_file=True) as fout:
+            fout.write(data)
+        with GzipBlockReader(path) as reader:
+            reader.seek(2990)
+            assert reader.read(20) == data[2990:3010]
+            reader.seek(-5, os.SEEK_END)
+            assert reader.read() == data[-5:]
+            reader.seek(0)
+            assert reader.read() == data
+
+
+@pytest.mark.parametrize("writer", ["native", "psims"])
+def test_write_scans_gzip(writer):
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "simulated.mzML.gz")
+        write_scans(path, make_scans(), writer=writer, n_jobs=2, gzip_block_index=True)
+        reader = pymzml.run.Reader(path)
+        spectra = list(reader)
+        assert len(spectra) == 7
+        assert np.allclose(spectra[0].mz, [100.0, 200.5, 300.25])
+        with GzipBlockReader(path) as gz_reader:
+            assert verify_checksum(gz_reader)
+            offset = read_index(gz_reader)["spectrum"][
+                "controllerType=0 controllerNumber=1 scan=6"
+            ]
+            gz_reader.seek(offset)
+            assert gz_reader.read(200).startswith(b"<spectrum ")
+
+
+def test_mzmlb_can_not_be_gzipped():
+    with TemporaryDirectory() as tmp_dir:
+        with pytest.raises(Exception):
+            write_scans(
+                os.path.join(tmp_dir, "a.mzMLb.gz"), make_scans(), writer="mzmlb"
+            )
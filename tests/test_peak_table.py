@@ -0,0 +1,112 @@
+"""Tests for columnar peak tables."""
+
+import os
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pytest
+
+from smiter.lib import peak_properties_to_csv
+from smiter.peak_table import PeakTable, iter_peak_table, read_peak_table
+
+CSV = """chemical_formula,trivial_name,scan_start_time,peak_scaling_factor,peak_function,peak_params,charge
++C(10)H(15)N(3)O(5),a,10,1e6,gauss,sigma=3,1
++C(12)H(16)N(2)O(8),b,12,2e6,gamma,"a=5,scale=0.33",
++C(10)H(13)N(5)O(4),c,14,3e6,,,2
++C(10)H(12)N(4)O(5),d,16,4e6,gauss,,-1
++C(9)H(12)N(2)O(6),e,18,5e6,gauss_tail,sigma=1,3
+"""
+
+
+def _write_csv(tmp_dir, content=CSV):
+    path = os.path.join(tmp_dir, "peaks.csv")
+    with open(path, "w") as fout:
+        fout.write(content)
+    return path
+
+
+def test_read_csv_peak_table():
+    with TemporaryDirectory() as tmp_dir:
+        table = read_peak_table(_write_csv(tmp_dir))
+    assert len(table) == 5
+    assert table.columns["charge"].tolist() == [1, 2, 2, -1, 3]
+    assert table.columns["peak_function"].tolist() == [
+        "gauss",
+        "gamma",
+        "gauss_tail",
+        "gauss",
+        "gauss_tail",
+    ]
+    assert sorted(table.param_names) == ["a", "scale", "sigma"]
+    peak_properties = table.to_peak_properties()
+    assert peak_properties["a"]["peak_params"] == {"sigma": 3}
+    assert peak_properties["b"]["peak_params"] == {"a": 5, "scale": 0.33}
+    assert peak_properties["c"]["peak_params"] == {}
+    assert peak_properties["c"]["peak_width"] == 30
+
+
+def test_peak_table_chunks_and_csv_roundtrip():
+    with TemporaryDirectory() as tmp_dir:
+        chunks = list(iter_peak_table(_write_csv(tmp_dir), chunk_size=2))
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert [chunk.first_row for chunk in chunks] == [2, 4, 6]
+        peak_properties = PeakTable.concatenate(chunks).to_peak_properties()
+        path = os.path.join(tmp_dir, "roundtrip.csv")
+        peak_properties_to_csv(peak_properties, path)
+        assert read_peak_table(path).to_peak_properties() == peak_properties
+
+
+def test_peak_table_validation_reports_all_rows():
+    content = (
+        "chemical_formula,trivial_name,scan_start_time,peak_scaling_factor,charge\n"
+        "+C(1),a,x,1,0\n"
+        "+C(2),b,1,1,2\n"
+        ",c,,1,1.5\n"
+        "+C(4),a,1,1,2\n"
+    )
+    with TemporaryDirectory() as tmp_dir:
+        with pytest.raises(Exception) as error:
+            read_peak_table(_write_csv(tmp_dir, content))
+    message = str(error.value)
+    assert "chemical_formula is empty in rows 4" in message
+    assert "scan_start_time is missing or not numeric in rows 2, 4" in message
+    assert "charge is not a non-zero integer in rows 2, 4" in message
+    assert "trivial_name is not unique in rows 2, 5" in message
+
+
+def test_peak_table_missing_required_column():
+    with TemporaryDirectory() as tmp_dir:
+        with pytest.raises(Exception):
+            read_peak_table(_write_csv(tmp_dir, "trivial_name,charge\na,2\n"))
+
+
+def test_read_parquet_and_arrow_peak_table():
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    data = pa.table(
+        {
+            "chemical_formula": ["+C(1)", "+C(2)", "+C(3)"],
+            "trivial_name": ["a", "b", "c"],
+            "scan_start_time": [1.0, 2.0, 3.0],
+            "peak_scaling_factor": [1e6, 1e6, 1e6],
+            "charge": pa.array([1, None, 3], type=pa.int32()),
+            "peak_function": ["gauss", None, "gamma"],
+            "peak_params.sigma": [2.0, None, None],
+            "peak_params.a": [None, None, 5.0],
+        }
+    )
+    with TemporaryDirectory() as tmp_dir:
+        parquet_path = os.path.join(tmp_dir, "peaks.parquet")
+        pq.write_table(data, parquet_path)
+        arrow_path = os.path.join(tmp_dir, "peaks.arrow")
+        with pa.ipc.new_file(arrow_path, data.schema) as writer:
+            writer.write_table(data)
+        for path in (parquet_path, arrow_path):
+            chunks = list(iter_peak_table(path, chunk_size=2))
+            assert [len(chunk) for chunk in chunks] == [2, 1]
+            table = PeakTable.concatenate(chunks)
+            assert table.columns["charge"].tolist() == [1, 2, 3]
+            assert table.columns["peak_function"].tolist()[1] == "gauss_tail"
+            assert np.isnan(table.columns["peak_params.sigma"][2])
+            peak_properties = table.to_peak_properties()
+            assert peak_properties["c"]["peak_params"] == {"a": 5}
@@ -0,0 +1,105 @@
+"""Tests for MS1 peak provenance."""
+
+import os
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pymzml
+
+from smiter.noise_functions import JamssNoiseInjector, UniformNoiseInjector
+from smiter.provenance import ProvenanceBuffer, match_peaks, spectrum_provenance
+from smiter.synthetic_mzml import write_mzml
+
+from .helpers import ConstantFragmentor, make_peak_props
+
+
+def test_provenance_buffer_csr_layout():
+    buffer = ProvenanceBuffer(capacity=1)
+    buffer.add_spectrum(1, [[("a", 3.0), ("b", 1.0)], [("b", 2.0)]])
+    buffer.add_spectrum(3, [])
+    buffer.add_spectrum(5, [[("c", 0.0)], [("a", 1.0), ("c", 1.0)]])
+    assert len(buffer) == 4
+    columns = buffer.columns()
+    assert columns["molecules"].tolist() == ["a", "b", "c"]
+    assert columns["spectrum_offset"].tolist() == [0, 2, 2, 4]
+    assert columns["peak_offset"].tolist() == [0, 2, 3, 4, 6]
+    assert columns["molecule"].dtype == np.int32
+    assert columns["fraction"].dtype == np.float32
+    assert np.allclose(columns["fraction"], [0.75, 0.25, 1, 0, 0.5, 0.5])
+    assert spectrum_provenance(columns, 3) == []
+    assert spectrum_provenance(columns, 1) == [[("a", 0.75), ("b", 0.25)], [("b", 1)]]
+
+
+def test_match_peaks():
+    noise_free_mz = np.array([100.0, 200.0, 300.0])
+    assert match_peaks(noise_free_mz, noise_free_mz + 0.1).tolist() == [0, 1, 2]
+    mz = np.array([50.0, 100.001, 150.0, 199.99, 300.2, 400.0])
+    assert match_peaks(noise_free_mz, mz).tolist() == [-1, 0, -1, 1, 2, -1]
+    # unsorted noisy peaks and a shared closest peak
+    assert match_peaks(np.array([100.0, 100.01]), np.array([100.005])).tolist() == [0]
+    mz = np.array([300.0, 5.0, 99.9, 200.1])
+    assert match_peaks(noise_free_mz, mz).tolist() == [2, -1, 0, 1]
+    assert match_peaks(np.array([]), np.array([1.0, 2.0])).tolist() == [-1, -1]
+
+
+def test_write_mzml_peak_provenance():
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "provenance.mzML")
+        mzml_params = {
+            "gradient_length": 3,
+            "min_intensity": 0,
+            "mzml_writer": "native",
+            "peak_provenance": True,
+        }
+        write_mzml(
+            path,
+            make_peak_props(),
+            ConstantFragmentor(),
+            UniformNoiseInjector(),
+            mzml_params,
+        )
+        provenance = dict(np.load(os.path.join(tmp_dir, "peak_provenance.npz")))
+        assert sorted(provenance["molecules"].tolist()) == ["adenosine", "inosine"]
+        n_checked = 0
+        for spec in pymzml.run.Reader(path):
+            if spec.ms_level != 1:
+                continue
+            peaks = spectrum_provenance(provenance, spec.ID)
+            assert len(peaks) == len(spec.mz)
+            for peak in peaks:
+                assert sum([fraction for _, fraction in peak]) == 1
+            n_checked += 1
+        assert n_checked == len(provenance["spec_id"])
+
+
+def test_peak_provenance_with_added_noise_peaks():
+    np.random.seed(1)
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "provenance.mzML")
+        write_mzml(
+            path,
+            make_peak_props(),
+            ConstantFragmentor(),
+            JamssNoiseInjector(),
+            {
+                "gradient_length": 3,
+                "min_intensity": 0,
+                "mzml_writer": "native",
+                "peak_provenance": True,
+            },
+        )
+        provenance = dict(np.load(os.path.join(tmp_dir, "peak_provenance.npz")))
+        n_checked = 0
+        for spec in pymzml.run.Reader(path):
+            if spec.ms_level != 1:
+                continue
+            peaks = spectrum_provenance(provenance, spec.ID)
+            assert len(peaks) == len(spec.mz)
+            # 100 to 500 white noise peaks without contributions
+            noise_peaks = [peak for peak in peaks if peak == []]
+            assert 100 <= len(noise_peaks) <= 500
+            for peak in peaks:
+                if peak != []:
+                    assert np.isclose(sum(fraction for _, fraction in peak), 1)
+            n_checked += 1
+        assert n_checked == len(provenance["spec_id"])
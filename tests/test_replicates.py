@@ -0,0 +1,85 @@
+"""Tests for replicate simulations sharing one library."""
+
+import csv
+import os
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from smiter.fragmentation_functions import CachedFragmentor
+from smiter.noise_functions import UniformNoiseInjector
+from smiter.replicates import replicate_path, simulate_replicates
+
+from .helpers import MZML_PARAMS, ConstantFragmentor, make_peak_props
+
+
+def _read(path):
+    with open(path, "rb") as fin:
+        return fin.read()
+
+
+def test_replicate_path():
+    assert replicate_path("/tmp/run.mzML", 1) == "/tmp/run.rep001.mzML"
+    assert replicate_path("/tmp/run.mzML.gz", 12) == "/tmp/run.rep012.mzML.gz"
+
+
+def test_cached_fragmentor():
+    fragmentor = CachedFragmentor(ConstantFragmentor())
+    fragmentor.warm(["inosine", "adenosine"])
+    assert len(fragmentor.cache) == 2
+    peaks = fragmentor.fragment(["inosine"])
+    peaks *= 2
+    assert fragmentor.fragment("inosine").tolist() == [[200, 1e5]]
+    assert fragmentor.hits == 2
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_simulate_replicates(n_jobs):
+    with TemporaryDirectory() as tmp_dir:
+        files = [replicate_path(os.path.join(tmp_dir, "run.mzML"), n) for n in range(3)]
+        written = simulate_replicates(
+            files,
+            make_peak_props(),
+            ConstantFragmentor(),
+            UniformNoiseInjector(dropout=0, ppm_noise=5e-6, intensity_noise=0.1),
+            MZML_PARAMS,
+            seed=1,
+            rt_jitter=0.1,
+            intensity_jitter=0.1,
+            n_jobs=n_jobs,
+        )
+        assert written == files
+        outputs = [_read(file) for file in files]
+        summary = os.path.join(tmp_dir, "run.rep002.molecule_summary.csv")
+        with open(summary) as fin:
+            starts = {
+                line["trivial_name"]: float(line["scan_start_time"])
+                for line in csv.DictReader(fin)
+            }
+        # the same seed reproduces replicates independent of n_jobs
+        again = simulate_replicates(
+            files[:1],
+            make_peak_props(),
+            ConstantFragmentor(),
+            UniformNoiseInjector(dropout=0, ppm_noise=5e-6, intensity_noise=0.1),
+            MZML_PARAMS,
+            seed=1,
+            rt_jitter=0.1,
+            intensity_jitter=0.1,
+        )
+        assert _read(again[0]) == outputs[0]
+    assert len(set(outputs)) == 3
+    assert starts["adenosine"] != 1
+
+
+def test_simulate_replicates_sidecars():
+    with TemporaryDirectory() as tmp_dir:
+        files = [replicate_path(os.path.join(tmp_dir, "run.mzML"), n) for n in range(2)]
+        with pytest.raises(Exception, match="directory per run"):
+            simulate_replicates(
+                files,
+                make_peak_props(),
+                ConstantFragmentor(),
+                UniformNoiseInjector(),
+                dict(MZML_PARAMS, peak_provenance=True),
+            )
@@ -0,0 +1,84 @@
+"""Tests for retention time predictors."""
+
+import numpy as np
+import pytest
+
+from smiter.peak_table import PeakTable
+from smiter.rt_prediction import (
+    GUO_RETENTION_COEFFICIENTS,
+    AbstractRTPredictor,
+    HydrophobicityRTPredictor,
+    assign_retention_times,
+)
+
+
+class _CountingPredictor(AbstractRTPredictor):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def _predict(self, molecules):
+        self.batches.append(list(molecules))
+        return np.array([len(mol) for mol in molecules], dtype=float)
+
+
+def test_predict_caches_molecules():
+    predictor = _CountingPredictor()
+    rts = predictor.predict(["AAK", "GK", "AAK"])
+    assert rts.tolist() == [3, 2, 3]
+    rts = predictor.predict(["GK", "LLLK"])
+    assert rts.tolist() == [2, 4]
+    assert predictor.batches == [["AAK", "GK"], ["LLLK"]]
+    predictor.clear_cache()
+    predictor.predict(["GK"])
+    assert predictor.batches[-1] == ["GK"]
+
+
+def test_predict_wrong_shape():
+    class _BrokenPredictor(AbstractRTPredictor):
+        def _predict(self, molecules):
+            return np.zeros(1)
+
+    with pytest.raises(Exception, match="returned"):
+        _BrokenPredictor().predict(["AK", "GK"])
+
+
+def test_hydrophobicity_index():
+    predictor = HydrophobicityRTPredictor()
+    index = predictor.hydrophobicity_index(["WK", "PEPTIDEK", "AXK"])
+    coefficients = GUO_RETENTION_COEFFICIENTS
+    expected = [
+        sum(coefficients[aa] for aa in peptide if aa in coefficients)
+        for peptide in ["WK", "PEPTIDEK", "AXK"]
+    ]
+    assert index == pytest.approx(expected)
+    assert len(predictor.hydrophobicity_index([])) == 0
+
+
+def test_hydrophobicity_fit_and_clip():
+    peptides = ["LLLLLK", "GGGGGK", "WWFFK", "SSSSR"]
+    predictor = HydrophobicityRTPredictor()
+    index = predictor.hydrophobicity_index(peptides)
+    predictor.predict(peptides)
+    predictor.fit(peptides, 50 + 2 * index)
+    assert predictor.slope == pytest.approx(2)
+    assert predictor.intercept == pytest.approx(50)
+    assert predictor.predict(peptides) == pytest.approx(50 + 2 * index)
+    predictor = HydrophobicityRTPredictor(slope=10, gradient_length=100)
+    rts = predictor.predict(peptides)
+    assert rts.min() == 0
+    assert rts.max() == 100
+
+
+def test_assign_retention_times():
+    table = PeakTable(
+        {
+            "trivial_name": np.array(["LLLLLK", "GGGGGK"]),
+            "scan_start_time": np.zeros(2),
+        }
+    )
+    predictor = HydrophobicityRTPredictor(intercept=50)
+    assign_retention_times(table, predictor)
+    assert table.columns["scan_start_time"] == pytest.approx(
+        50 + predictor.hydrophobicity_index(["LLLLLK", "GGGGGK"])
+    )
@@ -0,0 +1,106 @@
+"""Tests for retention time sharded output."""
+
+import os
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pymzml
+import pytest
+from psims.validation.validator import validate
+
+from smiter.mzml_writer import read_index, verify_checksum
+from smiter.sharding import (
+    read_manifest,
+    split_chromatograms,
+    split_scans,
+    stitch_shards,
+)
+from smiter.noise_functions import UniformNoiseInjector
+from smiter.synthetic_mzml import write_mzml, write_scans, write_scans_sharded
+
+from .helpers import ConstantFragmentor, make_peak_props, make_scans
+
+
+def test_split_scans_keeps_products_with_ms1():
+    edges, shards = split_scans(make_scans(), 3, rt_range=(0, 0.3))
+    assert np.allclose(edges, [0, 0.1, 0.2, 0.3])
+    assert [len(shard) for shard in shards] == [2, 1, 1]
+    assert [prod.id for _, products in shards[1] for prod in products] == [6]
+    chromatograms = split_chromatograms(
+        [("TIC", [0.0, 0.09, 0.18, 0.27], [1, 2, 3, 4], "total ion current")], edges
+    )
+    assert [chroms[0][2].tolist() for chroms in chromatograms] == [[1, 2], [3], [4]]
+
+
+def test_stitch_native_shards_is_identical_to_unsharded():
+    with TemporaryDirectory() as tmp_dir:
+        reference = os.path.join(tmp_dir, "reference.mzML")
+        write_scans(reference, make_scans(), writer="native")
+        manifest_file = write_scans_sharded(
+            os.path.join(tmp_dir, "run.mzML"),
+            make_scans(),
+            n_shards=3,
+            rt_range=(0, 0.3),
+            writer="native",
+            n_jobs=3,
+        )
+        manifest = read_manifest(manifest_file)
+        assert [entry["spectrum_count"] for entry in manifest["shards"]] == [4, 2, 1]
+        for entry in manifest["shards"]:
+            assert verify_checksum(entry["file"])
+        shard_ids = list(read_index(manifest["shards"][1]["file"])["spectrum"])
+        assert shard_ids == [
+            "controllerType=0 controllerNumber=1 scan=5",
+            "controllerType=0 controllerNumber=1 scan=6",
+        ]
+        stitched = os.path.join(tmp_dir, "stitched.mzML")
+        stitch_shards(manifest_file, stitched)
+        with open(reference, "rb") as fin:
+            expected = fin.read()
+        with open(stitched, "rb") as fin:
+            assert fin.read() == expected
+
+
+@pytest.mark.parametrize("suffix", [".mzML", ".mzML.gz"])
+def test_stitch_psims_shards(suffix):
+    with TemporaryDirectory() as tmp_dir:
+        manifest_file = write_scans_sharded(
+            os.path.join(tmp_dir, "run" + suffix), make_scans(), n_shards=2
+        )
+        stitched = os.path.join(tmp_dir, "stitched.mzML")
+        stitch_shards(manifest_file, stitched)
+        valid, schema = validate(stitched)
+        assert valid, schema.error_log
+        assert verify_checksum(stitched)
+        spectra = list(pymzml.run.Reader(stitched))
+        assert [spec.ID for spec in spectra] == list(range(1, 8))
+        tic = pymzml.run.Reader(stitched)["TIC"]
+        assert len(tic.peaks()) == 4
+
+
+def test_write_mzml_sharded():
+    with TemporaryDirectory() as tmp_dir:
+        mzml_params = {
+            "gradient_length": 3,
+            "min_intensity": 0,
+            "mzml_writer": "native",
+            "writer_jobs": 2,
+            "mzml_shards": 3,
+            "xic_output": "chromatograms",
+        }
+        manifest_file = write_mzml(
+            os.path.join(tmp_dir, "run.mzML"),
+            make_peak_props(),
+            ConstantFragmentor(),
+            UniformNoiseInjector(),
+            mzml_params,
+        )
+        manifest = read_manifest(manifest_file)
+        assert [entry["rt_end"] for entry in manifest["shards"]] == [1, 2, 3]
+        stitched = os.path.join(tmp_dir, "stitched.mzML")
+        stitch_shards(manifest_file, stitched)
+        index = read_index(stitched)
+        assert len(index["spectrum"]) == manifest["spectrum_count"]
+        assert list(index["chromatogram"]) == ["TIC", "XIC_inosine", "XIC_adenosine"]
+        spectra = list(pymzml.run.Reader(stitched))
+        assert [spec.ID for spec in spectra] == list(range(1, len(spectra) + 1))
@@ -0,0 +1,95 @@
+"""Tests for config driven simulations."""
+
+import json
+import os
+from tempfile import TemporaryDirectory
+
+import pytest
+from click.testing import CliRunner
+
+import smiter.noise_functions
+from smiter import cli
+from smiter.fragmentation_functions import AbstractFragmentor
+from smiter.noise_functions import AbstractNoiseInjector, UniformNoiseInjector
+from smiter.simulation import build_plugin, load_config, run_simulation
+
+from .helpers import ConstantFragmentor
+
+
+def test_load_config(config_file):
+    tmp_dir = os.path.dirname(config_file)
+    config = load_config(config_file)
+    assert config["peak_properties"] == os.path.join(tmp_dir, "peaks.csv")
+    assert config["outputs"]["mgf"] == os.path.join(tmp_dir, "run.mgf")
+    assert config["mzml_params"]["gradient_length"] == 3
+
+
+def test_load_yaml_config():
+    pytest.importorskip("yaml")
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "simulation.yaml")
+        with open(path, "w") as fout:
+            fout.write(
+                "peak_properties: peaks.csv\n"
+                "fragmentor: PeptideFragmentorPyteomics\n"
+                "noise_injector: {name: GaussNoiseInjector, kwargs: {dropout: 0.5}}\n"
+            )
+        config = load_config(path)
+        assert config["noise_injector"]["kwargs"] == {"dropout": 0.5}
+        assert config["outputs"] == {}
+        with open(path, "w") as fout:
+            fout.write("peak_properties: peaks.csv\n")
+        with pytest.raises(Exception, match="fragmentor is missing"):
+            load_config(path)
+
+
+def test_build_plugin():
+    injector = build_plugin(
+        {"name": "UniformNoiseInjector", "kwargs": {"dropout": 0.2}},
+        smiter.noise_functions,
+        AbstractNoiseInjector,
+    )
+    assert isinstance(injector, UniformNoiseInjector)
+    assert injector.kwargs == {"dropout": 0.2}
+    fragmentor = build_plugin(
+        "tests.helpers:ConstantFragmentor", smiter.noise_functions, AbstractFragmentor
+    )
+    assert isinstance(fragmentor, ConstantFragmentor)
+    with pytest.raises(Exception, match="is not a AbstractNoiseInjector"):
+        build_plugin("calc_mz", smiter.noise_functions, AbstractNoiseInjector)
+
+
+def test_run_simulation_seed_and_cache(config_file):
+    tmp_dir = os.path.dirname(config_file)
+    cache_dir = os.path.join(tmp_dir, "cache")
+    config = load_config(config_file)
+    outputs = []
+    for _ in range(2):
+        filename = run_simulation(config, n_jobs=2, seed=1, cache_dir=cache_dir)
+        assert filename == config["outputs"]["mzml"]
+        with open(filename, "rb") as fin:
+            outputs.append(fin.read())
+    assert outputs[0] == outputs[1]
+    stages = {name.split("-")[0] for name in os.listdir(cache_dir)}
+    assert stages == {"peak_table", "peak_properties", "library", "fragments"}
+    assert os.path.getsize(config["outputs"]["mgf"]) > 0
+    assert os.path.exists(os.path.join(tmp_dir, "molecule_summary.csv"))
+
+
+def test_cli_simulate(config_file, monkeypatch):
+    # the summary of streamed runs is written to the working directory
+    monkeypatch.chdir(os.path.dirname(config_file))
+    runner = CliRunner()
+    result = runner.invoke(
+        cli.main, ["simulate", config_file, "--seed", "1", "--metrics"]
+    )
+    assert result.exit_code == 0
+    assert os.path.exists(os.path.join(os.path.dirname(config_file), "run.mzML"))
+    with open(os.path.join(os.path.dirname(config_file), "run.metrics.json")) as fin:
+        assert "peak_table" in json.load(fin)["stages"]
+    result = runner.invoke(
+        cli.main, ["simulate", config_file, "--seed", "1", "--stream"]
+    )
+    assert result.exit_code == 0
+    assert result.stdout_bytes.startswith(b"<?xml")
+    assert b"</indexedmzML>" in result.stdout_bytes
@@ -2,9 +2,14 @@
 
 """Tests for `smiter` package."""
 
+import subprocess
+import sys
+
 import pytest
 from click.testing import CliRunner
+from loguru import logger
 
+import smiter
 from smiter import cli, synthetic_mzml
 
 
@@ -13,7 +18,47 @@ def test_command_line_interface():
     runner = CliRunner()
     result = runner.invoke(cli.main)
     assert result.exit_code == 0
-    assert "smiter.cli.main" in result.output
+    assert result.output.startswith("Usage: main [OPTIONS] [COMMAND] [ARGS]...")
+    for command in ("estimate", "fasta", "simulate", "sweep"):
+        assert command in result.output.split("Commands:")[1]
     help_result = runner.invoke(cli.main, ["--help"])
     assert help_result.exit_code == 0
     assert "--help  Show this message and exit." in help_result.output
+
+
+def test_lazy_import():
+    code = (
+        "import sys, smiter; "
+        "assert 'smiter.synthetic_mzml' not in sys.modules; "
+        "assert 'psims' not in sys.modules and 'pandas' not in sys.modules; "
+        "import smiter.fragmentation_functions; "
+        "assert 'pyteomics' not in sys.modules and 'scipy' not in sys.modules; "
+        "assert smiter.synthetic_mzml.write_mzml"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+    assert "synthetic_mzml" in dir(smiter)
+    with pytest.raises(AttributeError):
+        smiter.no_such_module
+
+
+def test_setup_logging(tmp_path):
+    from smiter.metrics import MetricsCollector
+
+    messages = []
+    handler = logger.add(messages.append, format="{message}")
+    logger.disable("smiter")
+    MetricsCollector().write(tmp_path / "silent.json")
+    logger.remove(handler)
+    assert messages == []
+    handler_ids = smiter.setup_logging(
+        level="INFO", sink=messages.append, replace=False
+    )
+    try:
+        assert len(handler_ids) == 1
+        MetricsCollector().write(tmp_path / "logged.json")
+    finally:
+        for handler_id in handler_ids:
+            logger.remove(handler_id)
+        logger.disable("smiter")
+    assert len(messages) == 1
+    assert "logged.json" in messages[0]
@@ -0,0 +1,64 @@
+"""Tests for the stage cache."""
+
+import os
+import time
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from smiter.noise_functions import UniformNoiseInjector
+from smiter.stage_cache import StageCache, content_key
+from smiter.synthetic_mzml import write_mzml
+
+from .helpers import ConstantFragmentor, make_peak_props
+
+
+def test_content_key():
+    assert content_key({"a": 1}, "b") == content_key({"a": 1}, "b")
+    assert content_key({"a": 1}, "b") != content_key({"a": 2}, "b")
+
+
+def test_stage_cache_hit_and_lru_eviction():
+    with TemporaryDirectory() as tmp_dir:
+        cache = StageCache(tmp_dir, max_size=2500)
+        calls = []
+
+        def _compute(n):
+            calls.append(n)
+            return np.zeros(100, dtype=np.float64) + n
+
+        assert cache.get("stage", "a", lambda: _compute(1))[0] == 1
+        assert cache.get("stage", "a", lambda: _compute(2))[0] == 1
+        assert calls == [1]
+        assert (cache.hits, cache.misses) == (1, 1)
+        old = time.time() - 100
+        os.utime(cache.path("stage", "a"), (old, old))
+        cache.get("stage", "b", lambda: _compute(3))
+        # hits refresh the access time, so a is evicted last
+        os.utime(cache.path("stage", "b"), (old - 100, old - 100))
+        cache.get("stage", "a", lambda: _compute(4))
+        cache.get("stage", "c", lambda: _compute(5))
+        assert sorted(os.listdir(tmp_dir)) == ["stage-a.pkl", "stage-c.pkl"]
+
+
+def test_write_mzml_stage_cache():
+    mzml_params = {"gradient_length": 3, "min_intensity": 0, "mzml_writer": "native"}
+    outputs = []
+    with TemporaryDirectory() as tmp_dir:
+        cache = StageCache(os.path.join(tmp_dir, "cache"))
+        for run_cache in (None, cache, cache):
+            np.random.seed(1)
+            path = os.path.join(tmp_dir, "run.mzML")
+            write_mzml(
+                path,
+                make_peak_props(),
+                ConstantFragmentor(),
+                UniformNoiseInjector(),
+                mzml_params,
+                cache=run_cache,
+            )
+            with open(path, "rb") as fin:
+                outputs.append(fin.read())
+    assert outputs[0] == outputs[1] == outputs[2]
+    assert cache.misses == 3
+    assert cache.hits == 3
@@ -0,0 +1,100 @@
+"""Tests for the molecule summary writer."""
+
+import csv
+import os
+from tempfile import TemporaryDirectory
+
+import pymzml
+import pytest
+
+from smiter.noise_functions import UniformNoiseInjector
+from smiter.summary import write_molecule_summary
+from smiter.synthetic_mzml import write_mzml
+
+from .helpers import ConstantFragmentor, make_peak_props, silent_noise_injector
+
+
+def _read_csv(path):
+    with open(path) as fin:
+        return {line["trivial_name"]: line for line in csv.DictReader(fin)}
+
+
+def test_write_mzml_summary_stats():
+    with TemporaryDirectory() as tmp_dir:
+        summary_path = os.path.join(tmp_dir, "run_a.csv")
+        mzml_params = {
+            "gradient_length": 3,
+            "min_intensity": 0,
+            "mzml_writer": "native",
+            "summary_file": summary_path,
+        }
+        write_mzml(
+            os.path.join(tmp_dir, "run_a.mzML"),
+            make_peak_props(),
+            ConstantFragmentor(),
+            UniformNoiseInjector(),
+            mzml_params,
+        )
+        assert not os.path.exists(os.path.join(tmp_dir, "molecule_summary.csv"))
+        summary = _read_csv(summary_path)
+    assert list(summary) == ["inosine", "adenosine"]
+    inosine = summary["inosine"]
+    assert inosine["peak_params"] == "sigma=0.5"
+    assert int(inosine["first_scan"]) == 1
+    assert int(inosine["last_scan"]) > int(inosine["first_scan"])
+    assert int(inosine["ms1_scans"]) > 0
+    assert int(inosine["ms2_events"]) == 1
+    assert float(inosine["total_intensity"]) > 0
+    assert int(summary["adenosine"]["first_scan"]) > 1
+
+
+def test_summary_last_scan_is_written_ms2_scan():
+    peak_props = make_peak_props()
+    peak_props["inosine"]["peak_width"] = 0.05
+    with TemporaryDirectory() as tmp_dir:
+        summary_path = os.path.join(tmp_dir, "run.csv")
+        mzml_path = os.path.join(tmp_dir, "run.mzML")
+        mzml_params = {
+            "gradient_length": 3,
+            "min_intensity": 0,
+            "mzml_writer": "native",
+            "summary_file": summary_path,
+        }
+        write_mzml(
+            mzml_path,
+            peak_props,
+            ConstantFragmentor(),
+            silent_noise_injector(),
+            mzml_params,
+        )
+        summary = _read_csv(summary_path)
+        ms2_ids = [
+            spec.ID for spec in pymzml.run.Reader(mzml_path) if spec.ms_level == 2
+        ]
+    inosine = summary["inosine"]
+    assert int(inosine["ms2_events"]) == 1
+    # inosine elutes shortly, its only MS2 scan is its last scan
+    assert int(inosine["last_scan"]) == ms2_ids[0]
+
+
+def test_write_parquet_summary():
+    pq = pytest.importorskip("pyarrow.parquet")
+    mol_scan_dict = {
+        "inosine": {
+            "ms1_scans": [3, 5],
+            "ms2_scans": [4],
+            "ms1_intensity": 10.0,
+            "frag_events": 1,
+        },
+    }
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "summary.parquet")
+        write_molecule_summary(path, make_peak_props(), mol_scan_dict, chunk_size=1)
+        parquet_file = pq.ParquetFile(path)
+        assert parquet_file.metadata.num_row_groups == 2
+        table = parquet_file.read().to_pydict()
+    assert table["trivial_name"] == ["inosine", "adenosine"]
+    assert table["first_scan"] == [3, None]
+    assert table["last_scan"] == [5, None]
+    assert table["ms2_events"] == [1, 0]
+    assert table["total_intensity"] == [10.0, 0.0]
@@ -0,0 +1,96 @@
+"""Tests for parameter sweeps."""
+
+import csv
+import json
+import os
+from tempfile import TemporaryDirectory
+
+import pytest
+from click.testing import CliRunner
+
+from smiter import cli
+from smiter.mzml_writer import read_index
+from smiter.noise_functions import UniformNoiseInjector
+from smiter.summary import write_molecule_summary
+from smiter.sweep import expand_grid, run_sweep, sweep_manifest_path, sweep_path
+
+from .helpers import CONFIG, MZML_PARAMS, ConstantFragmentor, make_peak_props
+
+
+def test_expand_grid():
+    points = expand_grid({"dynamic_exclusion": [10, 30], "max_ms2_spectra": [1, 5]})
+    assert points == [
+        {"dynamic_exclusion": 10, "max_ms2_spectra": 1},
+        {"dynamic_exclusion": 10, "max_ms2_spectra": 5},
+        {"dynamic_exclusion": 30, "max_ms2_spectra": 1},
+        {"dynamic_exclusion": 30, "max_ms2_spectra": 5},
+    ]
+    assert sweep_path("/tmp/run.mzML", 3) == "/tmp/run.sweep003.mzML"
+    assert sweep_manifest_path("/tmp/run.mzML.gz") == "/tmp/run.sweep.json"
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_run_sweep(n_jobs):
+    with TemporaryDirectory() as tmp_dir:
+        manifest_file = run_sweep(
+            os.path.join(tmp_dir, "run.mzML"),
+            make_peak_props(),
+            ConstantFragmentor(),
+            UniformNoiseInjector(),
+            MZML_PARAMS,
+            {"ms_rt_diff": [0.03, 0.1], "max_ms2_spectra": [0, 1]},
+            seed=1,
+            n_jobs=n_jobs,
+        )
+        with open(manifest_file) as fin:
+            manifest = json.load(fin)
+        spectrum_counts = []
+        ms2_events = []
+        for n, run in enumerate(manifest["runs"]):
+            assert run["file"] == f"run.sweep{n:03d}.mzML"
+            assert run["seconds"] > 0
+            spectrum_counts.append(
+                len(read_index(os.path.join(tmp_dir, run["file"]))["spectrum"])
+            )
+            summary = os.path.join(tmp_dir, f"run.sweep{n:03d}.molecule_summary.csv")
+            with open(summary) as fin:
+                ms2_events.append(
+                    sum(int(line["ms2_events"]) for line in csv.DictReader(fin))
+                )
+    assert manifest["format"] == "smiter parameter sweep"
+    assert manifest["runs"][3]["params"] == {"ms_rt_diff": 0.1, "max_ms2_spectra": 1}
+    assert manifest["mzml_params"]["min_intensity"] == 0
+    assert "library" in manifest["shared_seconds"]
+    # smaller ms_rt_diff gives more scans
+    assert spectrum_counts[0] > spectrum_counts[2]
+    assert ms2_events[0] == 0
+    assert ms2_events[1] > 0
+
+
+def test_run_sweep_invalid_point():
+    with TemporaryDirectory() as tmp_dir:
+        with pytest.raises(Exception, match="Invalid mzML parameters"):
+            run_sweep(
+                os.path.join(tmp_dir, "run.mzML"),
+                make_peak_props(),
+                ConstantFragmentor(),
+                UniformNoiseInjector(),
+                MZML_PARAMS,
+                {"ms_rt_diff": [0.03, -1]},
+            )
+
+
+def test_cli_sweep():
+    with TemporaryDirectory() as tmp_dir:
+        write_molecule_summary(os.path.join(tmp_dir, "peaks.csv"), make_peak_props())
+        config_file = os.path.join(tmp_dir, "sweep.toml")
+        with open(config_file, "w") as fout:
+            fout.write(CONFIG + "\n[sweep]\ndynamic_exclusion = [1, 30]\n")
+        result = CliRunner().invoke(cli.main, ["sweep", config_file, "--seed", "1"])
+        assert result.exit_code == 0
+        with open(os.path.join(tmp_dir, "run.sweep.json")) as fin:
+            manifest = json.load(fin)
+    assert [run["params"] for run in manifest["runs"]] == [
+        {"dynamic_exclusion": 1},
+        {"dynamic_exclusion": 30},
+    ]
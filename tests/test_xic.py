@@ -0,0 +1,88 @@
+"""Tests for ground truth XIC accumulation."""
+
+import base64
+import os
+import zlib
+from tempfile import TemporaryDirectory
+from xml.etree import ElementTree
+
+import numpy as np
+import pytest
+
+from smiter.mzml_writer import read_index
+from smiter.noise_functions import UniformNoiseInjector
+from smiter.synthetic_mzml import write_mzml
+from smiter.xic import XICBuffer
+
+from .helpers import ConstantFragmentor, make_peak_props
+
+NS = "{http://psi.hupo.org/ms/mzml}"
+
+
+def _read_chromatograms(path):
+    """Read zlib compressed chromatograms with ElementTree."""
+    chromatograms = {}
+    for chrom in ElementTree.parse(path).getroot().iter(f"{NS}chromatogram"):
+        arrays = []
+        for bda in chrom.iter(f"{NS}binaryDataArray"):
+            names = [param.get("name") for param in bda.iter(f"{NS}cvParam")]
+            dtype = np.float64 if "64-bit float" in names else np.float32
+            data = zlib.decompress(base64.b64decode(bda.find(f"{NS}binary").text))
+            arrays.append(np.frombuffer(data, dtype=dtype))
+        chromatograms[chrom.get("id")] = arrays
+    return chromatograms
+
+
+def test_xic_buffer_grows_and_groups():
+    buffer = XICBuffer(capacity=2)
+    for spec_id in range(10):
+        buffer.add("a", spec_id, spec_id * 0.1, spec_id)
+        if spec_id % 2 == 0:
+            buffer.add("b", spec_id, spec_id * 0.1, -spec_id)
+    assert len(buffer) == 15
+    xics = buffer.xics()
+    assert list(xics) == ["a", "b"]
+    assert np.array_equal(xics["a"][1], np.arange(10))
+    assert np.allclose(xics["b"][0], [0.0, 0.2, 0.4, 0.6, 0.8])
+    columns = buffer.columns()
+    assert columns["offset"].tolist() == [0, 10, 15]
+    chromatograms = buffer.chromatograms()
+    assert chromatograms[1][0] == "XIC_b"
+    assert chromatograms[1][3] == "selected ion current"
+
+
+def test_xic_buffer_molecule_subset():
+    buffer = XICBuffer(molecules=["b"])
+    buffer.add("a", 1, 0.0, 1.0)
+    buffer.add("b", 1, 0.0, 2.0)
+    assert buffer.molecules == ["b"]
+    assert len(buffer) == 1
+
+
+@pytest.mark.parametrize("writer", ["native", "psims"])
+def test_write_mzml_xic(writer):
+    with TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "xic.mzML")
+        mzml_params = {
+            "gradient_length": 3,
+            "min_intensity": 0,
+            "mzml_writer": writer,
+            "xic_output": "both",
+            "xic_molecules": ["adenosine"],
+        }
+        write_mzml(
+            path,
+            make_peak_props(),
+            ConstantFragmentor(),
+            UniformNoiseInjector(),
+            mzml_params,
+        )
+        assert list(read_index(path)["chromatogram"]) == ["TIC", "XIC_adenosine"]
+        rt, intensity = _read_chromatograms(path)["XIC_adenosine"]
+        assert rt.min() >= 1
+        assert rt.max() <= 3
+        assert rt[np.argmax(intensity)] == pytest.approx(2, abs=0.1)
+        sidecar = np.load(os.path.join(tmp_dir, "molecule_xic.npz"))
+        assert sidecar["molecules"].tolist() == ["adenosine"]
+        assert np.allclose(sidecar["i"], intensity)
+        assert np.allclose(sidecar["rt"], rt)